@@ -7,6 +7,9 @@ import pickle
 from rest_framework.response import Response
 
 # Django
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.forms.models import ModelFormMetaclass
 from django.core.handlers.wsgi import WSGIRequest
 from django.db.models import QuerySet
@@ -17,6 +20,36 @@ from django.template import (
     Template,
 )
 
+class QueryBudgetExceeded(AssertionError):
+    """A view ran more SQL queries than it declared."""
+
+
+class QueryBudgetMixin:
+    """Fails requests that run more than `query_budget` SQL queries.
+
+    Enforced only when settings.QUERY_BUDGET_ENFORCE is on (by default
+    under `manage.py test`), so an N+1 regression breaks the test
+    suite instead of slowing down production. Put it first in the
+    bases so the session/user lookups are counted too.
+    """
+
+    query_budget: int | None = None
+
+    def dispatch(self, request: WSGIRequest, *args: Any, **kwargs: Any):
+        if self.query_budget is None or not settings.QUERY_BUDGET_ENFORCE:
+            return super().dispatch(request, *args, **kwargs)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = super().dispatch(request, *args, **kwargs)
+        if len(queries) > self.query_budget:
+            raise QueryBudgetExceeded(
+                f'{self.__class__.__name__} {request.method} ran '
+                f'{len(queries)} queries, budget is {self.query_budget}:\n'
+                + '\n'.join(query['sql'] for query in queries.captured_queries)
+            )
+        return response
+
+
 class ObjectMixin:
     """ObjectMixin."""
 
@@ -1,11 +1,30 @@
+# Python
+import json
+from base64 import (
+    urlsafe_b64decode,
+    urlsafe_b64encode
+)
+from datetime import datetime
+from typing import (
+    Any,
+    Iterator
+)
+
 # DRF
 from rest_framework.pagination import (
     PageNumberPagination,
     LimitOffsetPagination,
+    CursorPagination,
 )
 from rest_framework.response import Response
 from rest_framework.utils.serializer_helpers import ReturnList
 
+# Django
+from django.db.models import (
+    Q,
+    QuerySet
+)
+
 
 class AbstractPageNumberPagination(PageNumberPagination):
     """My AbstractPageNumberPagination."""
@@ -54,3 +73,192 @@ class AbstractLimitOffsetPagination(LimitOffsetPagination):
                 }
             )
         return response
+
+
+class CursorPage:
+    """One keyset page, exposes the same has_next/has_previous API
+    as django.core.paginator.Page plus opaque cursors."""
+
+    def __init__(
+        self,
+        object_list: list,
+        next_cursor: str | None,
+        previous_cursor: str | None
+    ) -> None:
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self) -> Iterator:
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset paginator over (timestamp, id), newest first.
+
+    Every page is a `WHERE (timestamp, id) < (last row) LIMIT n` query,
+    so there is no COUNT(*) and no OFFSET and page 1000 costs the same
+    as page 1. Cursors are opaque url-safe tokens.
+    """
+
+    def __init__(
+        self,
+        queryset: QuerySet,
+        per_page: int,
+        fields: tuple[str, str] = ('timestamp', 'id')
+    ) -> None:
+        self.queryset = queryset
+        self.per_page = per_page
+        self.fields = fields
+
+    def get_page(self, cursor: str | None) -> CursorPage:
+        """Page after/before `cursor`, the first page if it is invalid."""
+        position = self.decode_cursor(cursor) if cursor else None
+        key, pk = self.fields
+
+        if position is None:
+            reverse, rows = False, self._fetch(self.queryset, reverse=False)
+        else:
+            reverse, value, row_id = position
+            if reverse:
+                queryset = self.queryset.filter(
+                    Q(**{f'{key}__gt': value})
+                    | Q(**{key: value, f'{pk}__gt': row_id})
+                )
+            else:
+                queryset = self.queryset.filter(
+                    Q(**{f'{key}__lt': value})
+                    | Q(**{key: value, f'{pk}__lt': row_id})
+                )
+            rows = self._fetch(queryset, reverse=reverse)
+
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        return CursorPage(
+            rows,
+            self.encode_cursor(rows[-1], reverse=False)
+            if has_next and rows else None,
+            self.encode_cursor(rows[0], reverse=True)
+            if has_previous and rows else None
+        )
+
+    def _fetch(self, queryset: QuerySet, reverse: bool) -> list:
+        key, pk = self.fields
+        ordering = (key, pk) if reverse else (f'-{key}', f'-{pk}')
+        return list(queryset.order_by(*ordering)[:self.per_page + 1])
+
+    def encode_cursor(self, obj: Any, reverse: bool) -> str:
+        key, pk = self.fields
+        value = getattr(obj, key)
+        raw = json.dumps([
+            int(reverse),
+            value.isoformat() if isinstance(value, datetime) else value,
+            getattr(obj, pk),
+        ])
+        return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor: str) -> tuple[bool, Any, int] | None:
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            reverse, value, row_id = json.loads(urlsafe_b64decode(padded))
+            if isinstance(value, str):
+                value = datetime.fromisoformat(value)
+            return bool(reverse), value, int(row_id)
+        except (ValueError, TypeError):
+            return None
+
+
+class IdListPaginator:
+    """Pages over an already ordered list of ids, such as a cached
+    search result.
+
+    A page's rows are loaded with one `pk__in` query. Cursors name the
+    first/last id shown rather than an offset, so they stay in place
+    when the list is recomputed with rows added or removed around them.
+    """
+
+    def __init__(
+        self,
+        ids: list[int],
+        queryset: QuerySet,
+        per_page: int
+    ) -> None:
+        self.ids = ids
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def get_page(self, cursor: str | None) -> CursorPage:
+        """Page after/before `cursor`, the first page if it is invalid."""
+        position = self.decode_cursor(cursor) if cursor else None
+        start = 0
+        if position is not None and position[1] in self.ids:
+            reverse, row_id = position
+            index = self.ids.index(row_id)
+            start = max(index - self.per_page, 0) if reverse else index + 1
+
+        page_ids = self.ids[start:start + self.per_page]
+        rows = self.queryset.in_bulk(page_ids)
+        has_next = start + self.per_page < len(self.ids)
+        has_previous = start > 0
+        return CursorPage(
+            [rows[pk] for pk in page_ids if pk in rows],
+            self.encode_cursor(page_ids[-1], reverse=False)
+            if has_next and page_ids else None,
+            self.encode_cursor(page_ids[0], reverse=True)
+            if has_previous and page_ids else None
+        )
+
+    def encode_cursor(self, row_id: int, reverse: bool) -> str:
+        raw = json.dumps([int(reverse), row_id])
+        return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor: str) -> tuple[bool, int] | None:
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            reverse, row_id = json.loads(urlsafe_b64decode(padded))
+            return bool(reverse), int(row_id)
+        except (ValueError, TypeError):
+            return None
+
+
+class AbstractCursorPagination(CursorPagination):
+    """AbstractCursorPagination, keyset pages over (timestamp, id)."""
+
+    ordering: tuple = ('-timestamp', '-id')
+    page_size_query_param: str = 'size'
+    max_page_size: int = 10
+    page_size: int = 2
+
+    def get_paginated_response(
+        self,
+        data: ReturnList
+    ) -> Response:
+        response: Response = \
+            Response(
+                {
+                    'pagination': {
+                        'next': self.get_next_link(),
+                        'previous': self.get_previous_link()
+                    },
+                    'results': data
+                }
+            )
+        return response
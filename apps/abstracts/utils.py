@@ -1,10 +1,88 @@
 # Python
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 from datetime import (
     datetime,
     timedelta
 )
 
+# Django
+from django.conf import settings
+from django.db import (
+    close_old_connections,
+    transaction
+)
+
+logger = logging.getLogger(__name__)
+
 
 def get_eta_time(seconds: int) -> Any:
-    return datetime.utcnow() + timedelta(seconds=seconds)
\ No newline at end of file
+    return datetime.utcnow() + timedelta(seconds=seconds)
+
+
+_local_executor: ThreadPoolExecutor | None = None
+_local_executor_lock = threading.Lock()
+
+
+def get_local_executor() -> ThreadPoolExecutor:
+    """Lazily created in-process pool used when TASK_EXECUTOR='local'."""
+    global _local_executor
+
+    with _local_executor_lock:
+        if _local_executor is None:
+            _local_executor = ThreadPoolExecutor(
+                max_workers=settings.LOCAL_EXECUTOR_WORKERS,
+                thread_name_prefix='local-task'
+            )
+    return _local_executor
+
+
+def _run_local_task(task: Any, args: tuple) -> Any:
+    close_old_connections()
+    try:
+        return task(*args)
+    finally:
+        close_old_connections()
+
+
+def dispatch_task(task: Any, *args: Any, countdown: float = 0) -> Any:
+    """Run a celery task on the broker or in the local executor.
+
+    Tasks must only take json-serializable arguments (ids, not
+    model instances), both executors receive exactly the same call.
+    """
+    if settings.TASK_EXECUTOR != 'local':
+        return task.apply_async(args=args, countdown=countdown or None)
+
+    executor: ThreadPoolExecutor = get_local_executor()
+    if not countdown:
+        return executor.submit(_run_local_task, task, args)
+
+    timer = threading.Timer(
+        countdown,
+        executor.submit,
+        args=(_run_local_task, task, args)
+    )
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+def dispatch_task_on_commit(task: Any, *args: Any) -> None:
+    """dispatch_task() once the current transaction commits.
+
+    The rows the task works on are committed by then, so a failed
+    dispatch (broker down) is logged and not raised: the request still
+    succeeds and the periodic sweepers (main.tasks) pick up the work
+    whose task was lost.
+    """
+    def dispatch() -> None:
+        try:
+            dispatch_task(task, *args)
+        except Exception:
+            logger.exception(
+                'Could not dispatch %s%r', getattr(task, 'name', task), args)
+
+    transaction.on_commit(dispatch)
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+# email__istartswith compiles to UPPER("email"::text) LIKE UPPER('ab%')
+# on PostgreSQL. text_pattern_ops lets a B-tree serve that LIKE whatever
+# the database collation is.
+CREATE_INDEX = (
+    'CREATE INDEX auths_customuser_email_prefix_idx '
+    'ON auths_customuser (UPPER(email::text) text_pattern_ops)'
+)
+
+
+def create_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(CREATE_INDEX)
+
+
+def drop_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'DROP INDEX IF EXISTS auths_customuser_email_prefix_idx'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auths', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_index, drop_prefix_index),
+    ]
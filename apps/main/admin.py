@@ -5,17 +5,56 @@ from django_summernote.admin import SummernoteModelAdmin
 # Local
 from .models import (
     Post,
-    Email
+    Email,
+    DeadLetter,
+    ExportJob,
+    PostArchive,
+    EmailArchive
 )
 
 
 class PostAdmin(SummernoteModelAdmin):
     summernote_fields = ('message',)
+    list_select_related = ('sender',)
 
 
 class EmailAdmin(SummernoteModelAdmin):
     summernote_fields = ('body',)
 
+    def get_queryset(self, request):
+        # __str__ shows the sender and every recipient
+        return super().get_queryset(request).for_listing(with_body=False)
+
+
+class DeadLetterAdmin(admin.ModelAdmin):
+    list_display = ('post', 'attempts', 'last_error', 'created')
+    raw_id_fields = ('post',)
+
+
+class PostArchiveAdmin(admin.ModelAdmin):
+    list_display = ('id', 'sender', 'recipient', 'subject', 'timestamp')
+    list_select_related = ('sender',)
+    raw_id_fields = ('sender',)
+
+
+class EmailArchiveAdmin(admin.ModelAdmin):
+    list_display = ('id', 'sender', 'subject', 'timestamp')
+    list_select_related = ('sender',)
+    raw_id_fields = ('user', 'sender', 'recipients', 'deleted_by')
+
+
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'user', 'kind', 'file_format', 'status', 'rows', 'total',
+        'created', 'expires'
+    )
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Email, EmailAdmin)
+admin.site.register(DeadLetter, DeadLetterAdmin)
+admin.site.register(PostArchive, PostArchiveAdmin)
+admin.site.register(EmailArchive, EmailArchiveAdmin)
+admin.site.register(ExportJob, ExportJobAdmin)
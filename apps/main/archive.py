@@ -0,0 +1,195 @@
+# Python
+from datetime import timedelta
+from itertools import islice
+
+# Django
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+# Local
+from .models import (
+    Post,
+    PostArchive,
+    PostRecipient,
+    PostRecipientArchive,
+    DeliveryAttempt,
+    DeliveryAttemptArchive,
+    DeadLetter,
+    DeadLetterArchive,
+    Email,
+    EmailArchive,
+    SearchToken,
+    SearchTokenArchive
+)
+from .storage import attachment_storage
+
+POST_FIELDS = (
+    'id', 'sender', 'recipient', 'additional_recipient', 'subject',
+    'message', 'file', 'file_name', 'timestamp', 'status', 'error',
+    'attempt_count', 'sent_at',
+)
+# rows of a Post moved along with it: (model, archive model, fields)
+POST_CHILDREN = (
+    (
+        PostRecipient, PostRecipientArchive,
+        ('id', 'post', 'email', 'status', 'error', 'sent_at'),
+    ),
+    (
+        DeliveryAttempt, DeliveryAttemptArchive,
+        (
+            'id', 'post', 'number', 'started_at', 'duration_ms',
+            'succeeded', 'transient', 'error',
+        ),
+    ),
+    (
+        DeadLetter, DeadLetterArchive,
+        ('id', 'post', 'attempts', 'last_error', 'created'),
+    ),
+)
+EMAIL_FIELDS = (
+    'id', 'user', 'sender', 'subject', 'body', 'timestamp',
+    'attachment', 'attachment_name',
+)
+SEARCH_TOKEN_FIELDS = ('user', 'email', 'digest')
+
+
+def _copy_fields(obj, fields: tuple[str, ...]) -> dict:
+    # attnames, so foreign keys are copied as ids without a query
+    return {
+        obj._meta.get_field(field).attname:
+            getattr(obj, obj._meta.get_field(field).attname)
+        for field in fields
+    }
+
+
+def _copy_rows(
+    source,
+    target,
+    fields: tuple[str, ...],
+    batch_size: int,
+    **filters
+) -> None:
+    # a bulk Post can have many recipients and an Email many tokens,
+    # copied a batch at a time
+    rows = (
+        target(**_copy_fields(row, fields))
+        for row in source.objects.filter(**filters)
+        .order_by('id').only(*fields).iterator(chunk_size=batch_size)
+    )
+    while batch := list(islice(rows, batch_size)):
+        target.objects.bulk_create(batch)
+
+
+def get_archive_cutoff(days: int | None = None):
+    days = settings.MAIL_ARCHIVE_AFTER_DAYS if days is None else days
+    return timezone.now() - timedelta(days=days)
+
+
+def get_archivable_posts(before):
+    # Posts still being delivered stay where the workers look for them.
+    return Post.objects.filter(
+        timestamp__lt=before,
+        status__in=(Post.STATUS_SENT, Post.STATUS_DEAD)
+    )
+
+
+def get_archivable_emails(before):
+    return Email.objects.filter(timestamp__lt=before)
+
+
+def archive_posts(before, batch_size: int, max_batches: int) -> int:
+    """Move Posts older than `before` to PostArchive, oldest first.
+
+    Bulk recipients, delivery attempts and dead letters of a moved Post
+    go to their archive tables with it, same ids.
+    """
+    moved = 0
+    for _ in range(max_batches):
+        with transaction.atomic():
+            posts = list(
+                get_archivable_posts(before)
+                .select_for_update(skip_locked=True)
+                .order_by('timestamp', 'id')
+                .only(*POST_FIELDS)[:batch_size]
+            )
+            if not posts:
+                break
+            ids = [post.id for post in posts]
+            PostArchive.objects.bulk_create(
+                PostArchive(**_copy_fields(post, POST_FIELDS))
+                for post in posts
+            )
+            for source, target, fields in POST_CHILDREN:
+                _copy_rows(
+                    source, target, fields, batch_size, post_id__in=ids)
+            # the archive row takes over the attachment reference
+            attachment_storage.retain(post.file.name for post in posts)
+            Post.objects.filter(id__in=ids).delete()
+        moved += len(posts)
+    return moved
+
+
+def archive_emails(before, batch_size: int, max_batches: int) -> int:
+    """Move Emails older than `before` to EmailArchive, oldest first.
+
+    Recipients, deleted_by and search tokens travel along. The mailbox
+    entries are deleted, so archived mail leaves the inbox/outbox
+    listings and is read through Email.objects.archived() and
+    search(archived=True).
+    """
+    Recipients = Email.recipients.through
+    DeletedBy = Email.deleted_by.through
+    ArchivedRecipients = EmailArchive.recipients.through
+    ArchivedDeletedBy = EmailArchive.deleted_by.through
+
+    moved = 0
+    for _ in range(max_batches):
+        with transaction.atomic():
+            emails = list(
+                get_archivable_emails(before)
+                .select_for_update(skip_locked=True)
+                .order_by('timestamp', 'id')
+                .only(*EMAIL_FIELDS)[:batch_size]
+            )
+            if not emails:
+                break
+            ids = [email.id for email in emails]
+            EmailArchive.objects.bulk_create(
+                EmailArchive(**_copy_fields(email, EMAIL_FIELDS))
+                for email in emails
+            )
+            for source, target in (
+                (Recipients, ArchivedRecipients),
+                (DeletedBy, ArchivedDeletedBy),
+            ):
+                target.objects.bulk_create(
+                    target(emailarchive_id=email_id, customuser_id=user_id)
+                    for email_id, user_id in source.objects.filter(
+                        email_id__in=ids
+                    ).values_list('email_id', 'customuser_id')
+                )
+            _copy_rows(
+                SearchToken, SearchTokenArchive, SEARCH_TOKEN_FIELDS,
+                batch_size, email_id__in=ids
+            )
+            attachment_storage.retain(
+                email.attachment.name for email in emails
+            )
+            Email.objects.filter(id__in=ids).delete()
+        moved += len(emails)
+    return moved
+
+
+def archive_old_mail(
+    days: int | None = None,
+    batch_size: int | None = None,
+    max_batches: int | None = None
+) -> dict[str, int]:
+    before = get_archive_cutoff(days)
+    batch_size = batch_size or settings.MAIL_ARCHIVE_BATCH_SIZE
+    max_batches = max_batches or settings.MAIL_ARCHIVE_MAX_BATCHES
+    return {
+        'posts': archive_posts(before, batch_size, max_batches),
+        'emails': archive_emails(before, batch_size, max_batches),
+    }
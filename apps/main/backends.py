@@ -0,0 +1,343 @@
+# Python
+import atexit
+import smtplib
+import threading
+import time
+from collections import deque
+from typing import (
+    Any,
+    Callable,
+    Iterable
+)
+
+# Django
+from django.conf import settings
+from django.core.mail.backends.smtp import EmailBackend
+
+
+class SMTPPoolTimeout(smtplib.SMTPException):
+    """No pooled SMTP connection became free in time."""
+
+
+class SMTPConnectionPool:
+    """Bounded pool of authenticated SMTP connections.
+
+    Connections are handed out LIFO so the warmest one is reused and
+    the ones at the bottom age out after `max_idle` seconds.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], smtplib.SMTP],
+        max_size: int,
+        max_idle: float,
+        healthcheck_after: float,
+        timeout: float
+    ) -> None:
+        self.factory = factory
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.healthcheck_after = healthcheck_after
+        self.timeout = timeout
+        self._idle: deque = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._in_use = 0
+        self._stats = {
+            'created': 0,
+            'reused': 0,
+            'discarded': 0,
+            'healthcheck_failures': 0,
+            'wait_timeouts': 0,
+        }
+
+    def acquire(self) -> smtplib.SMTP:
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats['wait_timeouts'] += 1
+            raise SMTPPoolTimeout(
+                f'No SMTP connection free after {self.timeout} seconds'
+            )
+        try:
+            connection = self._take_idle()
+            if connection is None:
+                connection = self.factory()
+                with self._lock:
+                    self._stats['created'] += 1
+        except BaseException:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+        return connection
+
+    def release(self, connection: smtplib.SMTP, broken: bool = False) -> None:
+        with self._lock:
+            self._in_use -= 1
+            if not broken:
+                self._idle.append((connection, time.monotonic()))
+        if broken:
+            self._discard(connection)
+        self._slots.release()
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def get_metrics(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                **self._stats,
+            }
+
+    def _take_idle(self) -> smtplib.SMTP | None:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                connection, last_used = self._idle.pop()
+
+            idle_for = time.monotonic() - last_used
+            if idle_for > self.max_idle:
+                self._discard(connection)
+                continue
+            if idle_for > self.healthcheck_after \
+                    and not self._is_alive(connection):
+                with self._lock:
+                    self._stats['healthcheck_failures'] += 1
+                self._discard(connection)
+                continue
+
+            with self._lock:
+                self._stats['reused'] += 1
+            return connection
+
+    @staticmethod
+    def _is_alive(connection: smtplib.SMTP) -> bool:
+        try:
+            return connection.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _discard(self, connection: smtplib.SMTP) -> None:
+        with self._lock:
+            self._stats['discarded'] += 1
+        try:
+            connection.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.close()
+
+
+_pools: dict[tuple, SMTPConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool_metrics() -> dict[str, dict[str, int]]:
+    """Metrics of every pool in this process, keyed by 'user@host:port'."""
+    with _pools_lock:
+        pools = list(_pools.items())
+    return {
+        f'{key[2]}@{key[0]}:{key[1]}': pool.get_metrics()
+        for key, pool in pools
+    }
+
+
+@atexit.register
+def close_all_pools() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
+
+
+class PooledEmailBackend(EmailBackend):
+    """SMTP backend that borrows connections from a process-wide pool.
+
+    open() takes an authenticated connection from the pool and close()
+    hands it back instead of sending QUIT, so STARTTLS and login only
+    happen when the pool has to grow or replace a dead connection.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._broken = False
+
+    @property
+    def pool(self) -> SMTPConnectionPool:
+        key = (
+            self.host,
+            self.port,
+            self.username,
+            self.use_tls,
+            self.use_ssl,
+        )
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = SMTPConnectionPool(
+                    factory=self._connect,
+                    max_size=settings.EMAIL_POOL_SIZE,
+                    max_idle=settings.EMAIL_POOL_MAX_IDLE,
+                    healthcheck_after=settings.EMAIL_POOL_HEALTHCHECK_AFTER,
+                    timeout=settings.EMAIL_POOL_TIMEOUT
+                )
+        return pool
+
+    def _connect(self) -> smtplib.SMTP:
+        # Reuse Django's connect/STARTTLS/login sequence, then take
+        # the connection away from this backend instance.
+        backend = EmailBackend(
+            host=self.host,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            use_tls=self.use_tls,
+            use_ssl=self.use_ssl,
+            timeout=self.timeout,
+            ssl_keyfile=self.ssl_keyfile,
+            ssl_certfile=self.ssl_certfile
+        )
+        backend.open()
+        connection, backend.connection = backend.connection, None
+        return connection
+
+    def open(self) -> bool | None:
+        if self.connection:
+            return False
+        try:
+            self.connection = self.pool.acquire()
+        except (smtplib.SMTPException, OSError):
+            if not self.fail_silently:
+                raise
+            return None
+        self._broken = False
+        return True
+
+    def close(self) -> None:
+        if self.connection is None:
+            return
+        connection, self.connection = self.connection, None
+        self.pool.release(connection, broken=self._broken)
+
+    def send_raw(
+        self,
+        from_email: str,
+        recipients: list[str],
+        message: bytes
+    ) -> None:
+        """Send already rendered message bytes on the open connection."""
+        try:
+            self.connection.sendmail(from_email, recipients, message)
+        except smtplib.SMTPServerDisconnected:
+            self._broken = True
+            self.close()
+            self.open()
+            self.connection.sendmail(from_email, recipients, message)
+        except smtplib.SMTPException:
+            # Refused recipients and the like keep the session usable.
+            raise
+        except OSError:
+            self._broken = True
+            raise
+
+    def send_stream(
+        self,
+        from_email: str,
+        recipients: list[str],
+        chunks: Iterable[bytes]
+    ) -> dict:
+        """Send a message produced chunk by chunk on the open connection.
+
+        `chunks` must already be CRLF terminated and dot-stuffed (see
+        main.mime.iter_message_bytes). Mirrors smtplib.SMTP.sendmail,
+        which needs the whole message in memory.
+        """
+        connection = self.connection
+        try:
+            connection.ehlo_or_helo_if_needed()
+            code, response = connection.mail(from_email)
+            if code != 250:
+                connection.rset()
+                raise smtplib.SMTPSenderRefused(code, response, from_email)
+
+            refused = {}
+            for recipient in recipients:
+                code, response = connection.rcpt(recipient)
+                if code not in (250, 251):
+                    refused[recipient] = (code, response)
+            if len(refused) == len(recipients):
+                connection.rset()
+                raise smtplib.SMTPRecipientsRefused(refused)
+
+            code, response = connection.docmd('data')
+            if code != 354:
+                connection.rset()
+                raise smtplib.SMTPDataError(code, response)
+        except smtplib.SMTPServerDisconnected:
+            self._broken = True
+            raise
+        except smtplib.SMTPException:
+            raise
+        except OSError:
+            self._broken = True
+            raise
+
+        # Once DATA is accepted the server reads everything up to the
+        # final dot as the message. Whatever interrupts the stream (a
+        # socket error, a failing chunk generator, a timeout) leaves the
+        # session mid-message, so the connection is never reused.
+        try:
+            last = b''
+            for chunk in chunks:
+                if chunk:
+                    connection.send(chunk)
+                    last = chunk
+            connection.send(
+                b'.\r\n' if last.endswith(b'\r\n') else b'\r\n.\r\n'
+            )
+            code, response = connection.getreply()
+        except BaseException:
+            self._broken = True
+            raise
+        if code != 250:
+            try:
+                connection.rset()
+            except (smtplib.SMTPException, OSError):
+                self._broken = True
+            raise smtplib.SMTPDataError(code, response)
+        return refused
+
+    def _send(self, email_message: Any) -> bool:
+        fail_silently, self.fail_silently = self.fail_silently, False
+        try:
+            try:
+                return super()._send(email_message)
+            except smtplib.SMTPServerDisconnected:
+                # The server closed the connection while it was idle,
+                # retry once on a fresh one.
+                self._broken = True
+                self.close()
+                self.open()
+                return super()._send(email_message)
+        except smtplib.SMTPServerDisconnected:
+            self._broken = True
+            if not fail_silently:
+                raise
+            return False
+        except smtplib.SMTPException:
+            if not fail_silently:
+                raise
+            return False
+        except OSError:
+            self._broken = True
+            if not fail_silently:
+                raise
+            return False
+        finally:
+            self.fail_silently = fail_silently
@@ -0,0 +1,287 @@
+# Python
+import hashlib
+import json
+import time
+from collections import defaultdict
+from typing import (
+    Any,
+    Callable,
+    Iterable
+)
+
+# Django
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+# Third party
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+# Local
+from .codecs import get_cipher
+
+
+class MessageBodyCache:
+    """Decrypted Email bodies cached by message id.
+
+    A sent message never changes, so the body is decrypted once and
+    kept in the MAIL_BODY_CACHE alias (Redis, see settings.CACHES) for
+    MAIL_BODY_CACHE_TIMEOUT seconds. A page of messages is read with a
+    single get_many() round trip and the misses are written back with
+    one set_many(). Bodies over MAIL_BODY_CACHE_MAX_SIZE bytes are not
+    cached, so one huge message cannot evict a whole page of others.
+
+    On Redis the cached bytes are bounded by MAIL_BODY_CACHE_MAX_TOTAL_SIZE
+    whatever else shares the server: every body written is recorded
+    with its size and the oldest are evicted once the total is over.
+    Expired and deleted bodies count until they are evicted in turn, so
+    the total only ever overestimates. Listings defer the body column,
+    it is loaded for the cache misses only.
+    """
+
+    key_prefix = 'mail:body'
+    # hash of cache key -> body size, sorted set of cache keys by write
+    # time and the sum of the sizes
+    sizes_key = 'mail:body:sizes'
+    order_key = 'mail:body:order'
+    total_key = 'mail:body:total'
+    # cache keys evicted per round trip
+    evict_batch_size = 100
+
+    @property
+    def cache(self) -> Any:
+        return caches[settings.MAIL_BODY_CACHE]
+
+    @property
+    def redis(self) -> Any:
+        """Connection of the cache, None when it is not on Redis (the
+        local memory cache of tests has its own MAX_ENTRIES bound)."""
+        try:
+            return get_redis_connection(settings.MAIL_BODY_CACHE)
+        except NotImplementedError:
+            return None
+
+    def make_key(self, email_id: int) -> str:
+        return f'{self.key_prefix}:{email_id}'
+
+    def get_many(self, messages: Iterable[Any]) -> list[str]:
+        """Plain text bodies of `messages`, in the same order."""
+        messages = list(messages)
+        if not messages:
+            return []
+        keys = [self.make_key(message.id) for message in messages]
+        cached = self.cache.get_many(keys)
+
+        missing = [
+            (key, message) for key, message in zip(keys, messages)
+            if key not in cached
+        ]
+        if missing:
+            decrypted = get_cipher().decrypt_many(
+                self.load_bodies(message for _, message in missing)
+            )
+            found = {
+                key: body for (key, _), body in zip(missing, decrypted)
+            }
+            self.set_many(found)
+            cached.update(found)
+        return [cached[key] for key in keys]
+
+    def load_bodies(self, messages: Iterable[Any]) -> list[str]:
+        """Stored bodies of `messages`, one query per model for those
+        loaded without it."""
+        messages = list(messages)
+        deferred = defaultdict(dict)
+        for message in messages:
+            if 'body' in message.get_deferred_fields():
+                deferred[message._meta.concrete_model][message.id] = message
+        for model, by_id in deferred.items():
+            bodies = dict(
+                model._base_manager.filter(id__in=list(by_id)).values_list(
+                    'id', 'body')
+            )
+            for email_id, message in by_id.items():
+                # gone since the page was read, nothing to show
+                message.body = bodies.get(email_id, '')
+        return [message.body for message in messages]
+
+    def set(self, email_id: int, body: str) -> None:
+        self.set_many({self.make_key(email_id): body})
+
+    def set_many(self, bodies: dict[str, str]) -> None:
+        max_size = settings.MAIL_BODY_CACHE_MAX_SIZE
+        sizes = {
+            key: len(body.encode('utf-8')) for key, body in bodies.items()
+        }
+        bodies = {
+            key: body for key, body in bodies.items()
+            if sizes[key] <= max_size
+        }
+        if bodies:
+            self.cache.set_many(
+                bodies, timeout=settings.MAIL_BODY_CACHE_TIMEOUT
+            )
+            self.track({key: sizes[key] for key in bodies})
+
+    def track(self, sizes: dict[str, int]) -> None:
+        """Record bodies just written and evict the oldest while the
+        total is over MAIL_BODY_CACHE_MAX_TOTAL_SIZE."""
+        redis = self.redis
+        if redis is None:
+            return
+        try:
+            pipeline = redis.pipeline(transaction=False)
+            for key, size in sizes.items():
+                # a body rewritten by a concurrent miss is counted once
+                pipeline.hsetnx(self.sizes_key, key, size)
+            pipeline.zadd(self.order_key, dict.fromkeys(sizes, time.time()))
+            added = pipeline.execute()[:len(sizes)]
+            total = redis.incrby(self.total_key, sum(
+                size for size, new in zip(sizes.values(), added) if new
+            ))
+            excess = total - settings.MAIL_BODY_CACHE_MAX_TOTAL_SIZE
+            while excess > 0:
+                evicted = self.evict_oldest(redis)
+                if not evicted:
+                    break
+                excess -= evicted
+        except RedisError:
+            pass
+
+    def evict_oldest(self, redis: Any) -> int:
+        """Delete the evict_batch_size oldest bodies, returns the bytes
+        freed."""
+        oldest = [
+            key.decode()
+            for key, _ in redis.zpopmin(self.order_key, self.evict_batch_size)
+        ]
+        if not oldest:
+            return 0
+        freed = sum(
+            int(size) for size in redis.hmget(self.sizes_key, oldest)
+            if size is not None
+        )
+        self.cache.delete_many(oldest)
+        pipeline = redis.pipeline(transaction=False)
+        pipeline.hdel(self.sizes_key, *oldest)
+        pipeline.decrby(self.total_key, freed)
+        pipeline.execute()
+        return freed
+
+    def delete(self, email_id: int) -> None:
+        self.cache.delete(self.make_key(email_id))
+
+
+body_cache = MessageBodyCache()
+
+
+class SearchResultCache:
+    """Internal mail search results per user, query and filters.
+
+    An entry holds the ordered ids of the result and is tagged with the
+    user's mailbox version, a Redis counter that every send, delete or
+    recipient change touching the user increments after commit
+    (main.signals, main.deletion). An entry written under an older
+    version is never served, so the cache skips repeated searches
+    without ever returning stale results. A lookup is one MGET of the
+    version and the entry. Hits and misses are counted for
+    get_metrics(). Searches run uncached while Redis is down.
+    """
+
+    key_prefix = 'mail:search'
+    version_prefix = 'mail:version'
+    metrics_key = 'mail:search:metrics'
+
+    @property
+    def redis(self):
+        return get_redis_connection(settings.MAIL_SEARCH_CACHE)
+
+    def make_key(self, user_id: int, params: dict) -> str:
+        digest = hashlib.sha1(
+            json.dumps(params, sort_keys=True).encode()
+        ).hexdigest()
+        return f'{self.key_prefix}:{user_id}:{digest}'
+
+    def make_version_key(self, user_id: int) -> str:
+        return f'{self.version_prefix}:{user_id}'
+
+    def get_or_set(
+        self,
+        user_id: int,
+        params: dict,
+        compute: Callable[[], dict]
+    ) -> dict:
+        key = self.make_key(user_id, params)
+        try:
+            version, raw = self.redis.mget(
+                self.make_version_key(user_id), key)
+            if version is None:
+                version = self.init_version(user_id)
+        except RedisError:
+            return compute()
+
+        if raw is not None:
+            entry = json.loads(raw)
+            if entry['version'] == int(version):
+                self.count('hits')
+                return entry['result']
+        self.count('misses')
+        result = compute()
+        try:
+            self.redis.set(
+                key,
+                json.dumps({'version': int(version), 'result': result}),
+                ex=settings.MAIL_SEARCH_CACHE_TIMEOUT
+            )
+        except RedisError:
+            pass
+        return result
+
+    def init_version(self, user_id: int) -> int:
+        # A new or evicted version starts from the clock, never from a
+        # value an entry still in the cache can carry.
+        key = self.make_version_key(user_id)
+        pipeline = self.redis.pipeline()
+        pipeline.set(key, time.time_ns(), nx=True)
+        pipeline.get(key)
+        return int(pipeline.execute()[1])
+
+    def bump(self, user_ids: Iterable[int]) -> None:
+        """New mailbox version for `user_ids`, in one round trip."""
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        try:
+            pipeline = self.redis.pipeline(transaction=False)
+            for user_id in user_ids:
+                key = self.make_version_key(user_id)
+                pipeline.set(key, time.time_ns(), nx=True)
+                pipeline.incr(key)
+            pipeline.execute()
+        except RedisError:
+            pass
+
+    def bump_on_commit(self, user_ids: Iterable[int]) -> None:
+        user_ids = set(user_ids)
+        transaction.on_commit(lambda: self.bump(user_ids))
+
+    def count(self, outcome: str) -> None:
+        try:
+            self.redis.hincrby(self.metrics_key, outcome, 1)
+        except RedisError:
+            pass
+
+    def get_metrics(self) -> dict[str, int | float]:
+        raw = self.redis.hgetall(self.metrics_key)
+        hits = int(raw.get(b'hits', 0))
+        misses = int(raw.get(b'misses', 0))
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+search_cache = SearchResultCache()
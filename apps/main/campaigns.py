@@ -0,0 +1,315 @@
+# Python
+import copy
+import csv
+import io
+import smtplib
+import time
+from datetime import timedelta
+from typing import (
+    Any,
+    Callable,
+    Iterable
+)
+
+# Django
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.core.mail import get_connection
+from django.core.mail.message import sanitize_address
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import (
+    Count,
+    Exists,
+    OuterRef,
+    Q
+)
+from django.utils import timezone
+
+# Local
+from auths.models import CustomUser
+from .delivery import build_post_message
+from .mime import iter_message_bytes
+from .models import (
+    Post,
+    PostRecipient
+)
+
+
+def parse_recipients(
+    text: str = '',
+    csv_file: UploadedFile | None = None
+) -> tuple[list[str], list[str]]:
+    """Collect addresses from free text and/or a CSV upload.
+
+    The CSV may have an 'email' header column, otherwise the first
+    column is used. Returns (valid, invalid), duplicates removed.
+    """
+    candidates: list[str] = []
+    if text:
+        candidates.extend(
+            text.replace(',', '\n').replace(';', '\n').split()
+        )
+    if csv_file is not None:
+        candidates.extend(_read_csv_addresses(csv_file))
+
+    seen: set[str] = set()
+    valid: list[str] = []
+    invalid: list[str] = []
+    for address in candidates:
+        address = address.strip()
+        key = address.lower()
+        if not address or key in seen:
+            continue
+        seen.add(key)
+        try:
+            validate_email(address)
+        except ValidationError:
+            invalid.append(address)
+        else:
+            valid.append(address)
+    return valid, invalid
+
+
+def _read_csv_addresses(csv_file: UploadedFile) -> Iterable[str]:
+    csv_file.seek(0)
+    reader = csv.reader(
+        io.TextIOWrapper(csv_file, encoding='utf-8-sig', newline='')
+    )
+    column = 0
+    for index, row in enumerate(reader):
+        if not row:
+            continue
+        if index == 0:
+            header = [cell.strip().lower() for cell in row]
+            if 'email' in header:
+                column = header.index('email')
+                continue
+        if len(row) > column:
+            yield row[column]
+
+
+def create_campaign(
+    sender: CustomUser,
+    recipients: list[str],
+    subject: str,
+    message: str,
+    file: Any = None
+) -> Post:
+    """Store a bulk Post and one queued PostRecipient per address."""
+    with transaction.atomic():
+        post = Post.objects.create(
+            sender=sender,
+            recipient=recipients[0],
+            subject=subject,
+            message=message,
+            file=file
+        )
+        PostRecipient.objects.bulk_create(
+            (
+                PostRecipient(post=post, email=address)
+                for address in recipients
+            ),
+            batch_size=settings.BULK_SEND_BATCH_SIZE
+        )
+    return post
+
+
+def send_campaign(
+    post_id: int,
+    batch_size: int | None = None,
+    rate: float | None = None
+) -> dict[str, int]:
+    """Send every queued recipient of a bulk Post.
+
+    The MIME message is rendered once and the same bytes are handed to
+    the SMTP server for each recipient, in batches over one pooled
+    connection. Backends without send_raw() (locmem, stock SMTP) get
+    the regular message, one per recipient. An attachment is streamed
+    from storage for each recipient when the backend has send_stream(),
+    it is never held in memory whatever its size. `rate` caps messages
+    per second (0 disables it), messages are spaced evenly.
+
+    Post.heartbeat is refreshed after every batch, a Post whose worker
+    died is resumed by resume_stale_campaigns().
+    """
+    batch_size = batch_size or settings.BULK_SEND_BATCH_SIZE
+    rate = settings.BULK_SEND_RATE if rate is None else rate
+
+    claimed = Post.objects.filter(
+        id=post_id,
+        status__in=(Post.STATUS_QUEUED, Post.STATUS_FAILED)
+    ).update(
+        status=Post.STATUS_SENDING,
+        heartbeat=timezone.now(),
+        error=''
+    )
+    if not claimed:
+        return get_campaign_progress(post_id)
+
+    post = Post.objects.get(id=post_id)
+    connection = get_connection()
+    send = _get_sender(connection, post)
+    interval = 1 / rate if rate else 0
+    next_send = time.monotonic()
+    try:
+        connection.open()
+        last_id = 0
+        while True:
+            batch = list(
+                PostRecipient.objects.filter(
+                    post_id=post_id,
+                    status=PostRecipient.STATUS_QUEUED,
+                    id__gt=last_id
+                ).order_by('id').only('id', 'email')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            for delivery in batch:
+                if interval:
+                    pause = next_send - time.monotonic()
+                    if pause > 0:
+                        time.sleep(pause)
+                    next_send = max(next_send, time.monotonic()) + interval
+                _send_one(send, delivery)
+            PostRecipient.objects.bulk_update(
+                batch, ('status', 'error', 'sent_at')
+            )
+            Post.objects.filter(id=post_id).update(heartbeat=timezone.now())
+    except Exception as exc:
+        # Leave the remaining recipients queued so the job can resume.
+        Post.objects.filter(id=post_id).update(
+            status=Post.STATUS_FAILED,
+            error=str(exc)
+        )
+        raise
+    finally:
+        connection.close()
+
+    progress = get_campaign_progress(post_id)
+    Post.objects.filter(id=post_id).update(
+        status=(
+            Post.STATUS_SENT if progress['sent'] else Post.STATUS_FAILED
+        ),
+        sent_at=timezone.now()
+    )
+    return progress
+
+
+def _get_sender(connection: Any, post: Post) -> Callable[[str], Any]:
+    """Function sending `post` to one address over `connection`."""
+    if post.file and hasattr(connection, 'send_stream'):
+        return _get_stream_sender(connection, post)
+
+    mail = build_post_message(post, connection=connection)
+    if not hasattr(connection, 'send_raw'):
+        def send(address: str) -> None:
+            message = copy.copy(mail)
+            message.to = [address]
+            message.cc = []
+            message.send()
+        return send
+
+    encoding = mail.encoding or settings.DEFAULT_CHARSET
+    from_email = sanitize_address(mail.from_email, encoding)
+    mime = mail.message()
+    mime.replace_header('To', 'undisclosed-recipients:;')
+    payload = mime.as_bytes(linesep='\r\n')
+
+    def send(address: str) -> None:
+        connection.send_raw(
+            from_email, [sanitize_address(address, encoding)], payload)
+    return send
+
+
+def _get_stream_sender(
+    connection: Any,
+    post: Post
+) -> Callable[[str], Any]:
+    """Like _get_sender(), the attachment streamed from storage for
+    every recipient (as delivery.send_post does) instead of held in
+    memory for the whole campaign."""
+    mail = build_post_message(post, with_attachment=False)
+    encoding = mail.encoding or settings.DEFAULT_CHARSET
+    from_email = sanitize_address(mail.from_email, encoding)
+    # the envelope has the recipient, the header never names them
+    mail.to = []
+    mail.cc = []
+    mail.extra_headers['To'] = 'undisclosed-recipients:;'
+    filename = post.get_file_name()
+
+    def send(address: str) -> None:
+        # iter_message_bytes() attaches placeholders to the message
+        message = copy.copy(mail)
+        message.attachments = []
+        with post.file.open('rb') as attach:
+            connection.send_stream(
+                from_email,
+                [sanitize_address(address, encoding)],
+                iter_message_bytes(message, [attach], [filename])
+            )
+    return send
+
+
+def _send_one(send: Callable[[str], Any], delivery: PostRecipient) -> None:
+    try:
+        send(delivery.email)
+    except (smtplib.SMTPException, OSError) as exc:
+        delivery.status = PostRecipient.STATUS_FAILED
+        delivery.error = str(exc)
+    else:
+        delivery.status = PostRecipient.STATUS_SENT
+        delivery.error = ''
+        delivery.sent_at = timezone.now()
+
+
+def get_campaign_progress(post_id: int) -> dict[str, int]:
+    counts = dict(
+        PostRecipient.objects.filter(post_id=post_id)
+        .values_list('status')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    progress = {
+        status: counts.get(status, 0)
+        for status, _ in PostRecipient.STATUS_CHOICES
+    }
+    progress['total'] = sum(progress.values())
+    return progress
+
+
+def resume_stale_campaigns(stale_after: int | None = None) -> list[int]:
+    """Requeue bulk Posts whose task was lost, returns the ids to
+    dispatch again.
+
+    A Post is stale after `stale_after` seconds (BULK_SEND_STALE_AFTER)
+    without a heartbeat: stuck in 'sending' because its worker died, or
+    still 'queued' because the dispatch failed or the task was lost
+    before it ran. Recipients already marked sent are skipped, the
+    batch that was in flight is sent again. The heartbeat is set, so
+    the next sweep waits another `stale_after`.
+    """
+    stale_after = (
+        settings.BULK_SEND_STALE_AFTER if stale_after is None
+        else stale_after
+    )
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=stale_after)
+    stale = Post.objects.filter(
+        Exists(PostRecipient.objects.filter(post=OuterRef('pk'))),
+        Q(heartbeat__lt=cutoff)
+        | Q(heartbeat__isnull=True, status=Post.STATUS_SENDING)
+        | Q(heartbeat__isnull=True, timestamp__lt=cutoff),
+        status__in=(Post.STATUS_QUEUED, Post.STATUS_SENDING)
+    )
+    with transaction.atomic():
+        post_ids = list(
+            stale.select_for_update(skip_locked=True)
+            .values_list('id', flat=True)
+        )
+        Post.objects.filter(id__in=post_ids).update(
+            status=Post.STATUS_QUEUED, heartbeat=now)
+    return post_ids
@@ -0,0 +1,159 @@
+# Python
+from collections import Counter
+from typing import Iterable
+
+# Django
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Count,
+    Q
+)
+
+# Third party
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+# Local
+from auths.models import CustomUser
+from .models import MailboxEntry
+
+FIELDS = (
+    'inbox_total',
+    'inbox_unread',
+    'outbox_total',
+    'outbox_unread',
+)
+# set once a hash holds every field, see MailboxCounters.get()
+BUILT = 'built'
+
+
+def entry_deltas(
+    entries: Iterable[tuple[int, str, bool]],
+    sign: int = 1
+) -> Counter:
+    """Counter changes for (user_id, folder, is_read) entries."""
+    deltas: Counter = Counter()
+    for user_id, folder, is_read in entries:
+        deltas[user_id, f'{folder}_total'] += sign
+        if not is_read:
+            deltas[user_id, f'{folder}_unread'] += sign
+    return deltas
+
+
+class MailboxCounters:
+    """Total and unread counts per user and folder, in one Redis hash
+    per user.
+
+    Reads are a single HGETALL. Writers send HINCRBY deltas after
+    their transaction commits. A hash without the `built` field (new,
+    evicted or only partly incremented) is rebuilt from MailboxEntry on
+    the next read, and reconcile() periodically corrects any drift.
+    When Redis is down, reads fall back to counting in the database
+    and increments are dropped until the next reconcile.
+    """
+
+    key_prefix = 'mail:counters'
+
+    @property
+    def redis(self):
+        return get_redis_connection(settings.MAILBOX_COUNTERS_CACHE)
+
+    def make_key(self, user_id: int) -> str:
+        return f'{self.key_prefix}:{user_id}'
+
+    def get(self, user_id: int) -> dict[str, int]:
+        try:
+            raw = self.redis.hgetall(self.make_key(user_id))
+        except RedisError:
+            return self.count([user_id])[user_id]
+        values = {key.decode(): int(value) for key, value in raw.items()}
+        if BUILT not in values:
+            return self.rebuild([user_id])[user_id]
+        return {field: values.get(field, 0) for field in FIELDS}
+
+    def count(self, user_ids: list[int]) -> dict[int, dict[str, int]]:
+        """Counters of `user_ids` from the database, one GROUP BY."""
+        counts = {user_id: dict.fromkeys(FIELDS, 0) for user_id in user_ids}
+        rows = (
+            MailboxEntry.objects
+            .filter(user_id__in=user_ids, is_deleted=False)
+            .values_list('user_id', 'folder')
+            .annotate(
+                total=Count('id'),
+                unread=Count('id', filter=Q(is_read=False))
+            )
+            .order_by()
+        )
+        for user_id, folder, total, unread in rows:
+            counts[user_id][f'{folder}_total'] = total
+            counts[user_id][f'{folder}_unread'] = unread
+        return counts
+
+    def rebuild(self, user_ids: list[int]) -> dict[int, dict[str, int]]:
+        counts = self.count(user_ids)
+        try:
+            pipeline = self.redis.pipeline()
+            for user_id, values in counts.items():
+                key = self.make_key(user_id)
+                pipeline.delete(key)
+                pipeline.hset(key, mapping={**values, BUILT: 1})
+            pipeline.execute()
+        except RedisError:
+            pass
+        return counts
+
+    def apply(self, deltas: dict[tuple[int, str], int]) -> None:
+        """HINCRBY every non-zero delta, in one round trip."""
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        try:
+            pipeline = self.redis.pipeline(transaction=False)
+            for (user_id, field), delta in deltas.items():
+                pipeline.hincrby(self.make_key(user_id), field, delta)
+            pipeline.execute()
+        except RedisError:
+            pass
+
+    def apply_on_commit(self, deltas: dict[tuple[int, str], int]) -> None:
+        transaction.on_commit(lambda: self.apply(deltas))
+
+    def reconcile(self, batch_size: int = 500) -> int:
+        """Compare every user's hash with the database, fix the ones
+        that drifted. Returns the number of users corrected."""
+        fixed = 0
+        last_id = 0
+        while True:
+            user_ids = list(
+                CustomUser.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not user_ids:
+                return fixed
+            last_id = user_ids[-1]
+
+            counts = self.count(user_ids)
+            pipeline = self.redis.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipeline.hgetall(self.make_key(user_id))
+            drifted = []
+            for user_id, raw in zip(user_ids, pipeline.execute()):
+                values = {
+                    key.decode(): int(value) for key, value in raw.items()
+                }
+                if BUILT not in values:
+                    # rebuilt from the database on its next read anyway
+                    continue
+                if any(
+                    values.get(field, 0) != counts[user_id][field]
+                    for field in FIELDS
+                ):
+                    drifted.append(user_id)
+            if drifted:
+                self.rebuild(drifted)
+                fixed += len(drifted)
+
+
+mailbox_counters = MailboxCounters()
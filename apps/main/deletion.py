@@ -0,0 +1,113 @@
+# Python
+import time
+from typing import Iterable
+
+# Django
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Exists,
+    OuterRef
+)
+
+# Local
+from auths.models import CustomUser
+from .cache import search_cache
+from .counters import (
+    entry_deltas,
+    mailbox_counters
+)
+from .models import (
+    Email,
+    MailboxEntry
+)
+
+
+def soft_delete(user: CustomUser, email_ids: Iterable[int]) -> int:
+    """Delete mail for `user` only, other participants keep it.
+
+    Whatever the number of ids, this is one UPDATE of the user's
+    mailbox entries and one INSERT into deleted_by. Returns the number
+    of emails that were deleted.
+    """
+    email_ids = set(email_ids)
+    with transaction.atomic():
+        entries = list(
+            MailboxEntry.objects.select_for_update().filter(
+                user=user,
+                email_id__in=email_ids,
+                is_deleted=False
+            ).values_list('id', 'email_id', 'folder', 'is_read')
+        )
+        if not entries:
+            return 0
+        MailboxEntry.objects.filter(
+            id__in=[entry_id for entry_id, _, _, _ in entries]
+        ).update(is_deleted=True)
+
+        deleted_ids = {email_id for _, email_id, _, _ in entries}
+        DeletedBy = Email.deleted_by.through
+        DeletedBy.objects.bulk_create(
+            (
+                DeletedBy(email_id=email_id, customuser_id=user.id)
+                for email_id in deleted_ids
+            ),
+            ignore_conflicts=True
+        )
+        mailbox_counters.apply_on_commit(entry_deltas(
+            (
+                (user.id, folder, is_read)
+                for _, _, folder, is_read in entries
+            ),
+            sign=-1
+        ))
+        search_cache.bump_on_commit([user.id])
+    return len(deleted_ids)
+
+
+def get_purgeable_emails():
+    """Emails every participant has deleted."""
+    return Email.objects.filter(
+        ~Exists(
+            MailboxEntry.objects.filter(
+                email=OuterRef('pk'),
+                is_deleted=False
+            )
+        )
+    )
+
+
+def purge_deleted_emails(
+    batch_size: int | None = None,
+    max_batches: int | None = None,
+    pause: float | None = None
+) -> int:
+    """Physically delete emails nobody sees any more.
+
+    Works in short transactions of `batch_size` emails, sleeping
+    `pause` seconds in between so row locks are held briefly and
+    other writers get through. Stops after `max_batches`, the next run
+    picks up where this one stopped. Returns the number of emails
+    deleted.
+    """
+    batch_size = batch_size or settings.MAIL_PURGE_BATCH_SIZE
+    max_batches = max_batches or settings.MAIL_PURGE_MAX_BATCHES
+    pause = settings.MAIL_PURGE_PAUSE if pause is None else pause
+
+    purged = 0
+    last_id = 0
+    for _ in range(max_batches):
+        ids = list(
+            get_purgeable_emails().filter(id__gt=last_id)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        last_id = ids[-1]
+        with transaction.atomic():
+            # checked again, someone may have been added meanwhile
+            _, deleted = get_purgeable_emails().filter(id__in=ids).delete()
+        purged += deleted.get(Email._meta.label, 0)
+        if pause and len(ids) == batch_size:
+            time.sleep(pause)
+    return purged
@@ -0,0 +1,296 @@
+# Python
+import mimetypes
+import os
+import random
+import smtplib
+import time
+from datetime import timedelta
+from typing import (
+    Any,
+    Callable
+)
+
+# Django
+from django.conf import settings
+from django.core.mail import (
+    EmailMessage,
+    get_connection
+)
+from django.core.mail.message import sanitize_address
+from django.db import transaction
+from django.db.models import (
+    Exists,
+    F,
+    OuterRef,
+    Q,
+    QuerySet
+)
+from django.utils import timezone
+
+# Local
+from settings import base
+from .backends import SMTPPoolTimeout
+from .mime import iter_message_bytes
+from .models import (
+    Post,
+    PostRecipient,
+    DeliveryAttempt,
+    DeadLetter
+)
+
+
+def build_post_message(
+    post: Post,
+    connection: Any = None,
+    with_attachment: bool = True
+) -> EmailMessage:
+    """Build the outgoing message for a stored Post.
+
+    The attachment is read into memory, unless `with_attachment` is
+    false: streamed senders add it with iter_message_bytes().
+    """
+    mail = EmailMessage(
+        post.subject,
+        post.message,
+        base.EMAIL_HOST_USER,
+        post.get_recipient_list(),
+        connection=connection
+    )
+    if post.file and with_attachment:
+        filename = post.get_file_name()
+        content_type, _ = mimetypes.guess_type(filename)
+        with post.file.open('rb') as attach:
+            mail.attach(filename, attach.read(), content_type)
+    return mail
+
+
+def send_post(post: Post) -> None:
+    """Send a Post, streaming its attachment from storage when possible.
+
+    Backends without send_stream() (console, locmem...) get the
+    regular in-memory message.
+    """
+    connection = get_connection()
+    if not post.file or not hasattr(connection, 'send_stream'):
+        build_post_message(post, connection=connection).send()
+        return
+
+    mail = build_post_message(post, with_attachment=False)
+    encoding = mail.encoding or settings.DEFAULT_CHARSET
+    from_email = sanitize_address(mail.from_email, encoding)
+    recipients = [
+        sanitize_address(address, encoding)
+        for address in mail.recipients()
+    ]
+    with post.file.open('rb') as attach:
+        connection.open()
+        try:
+            connection.send_stream(
+                from_email,
+                recipients,
+                iter_message_bytes(mail, [attach], [post.get_file_name()])
+            )
+        finally:
+            connection.close()
+
+
+def is_transient_error(exc: Exception) -> bool:
+    """Whether retrying the send later can succeed."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(
+            400 <= code < 500 for code, _ in exc.recipients.values()
+        )
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 400 <= exc.smtp_code < 500
+    if isinstance(exc, (
+        smtplib.SMTPServerDisconnected,
+        SMTPPoolTimeout,
+    )):
+        return True
+    # smtplib.SMTPException subclasses OSError, the ones left here
+    # are socket level errors: refused connections, timeouts...
+    return isinstance(exc, OSError) \
+        and not isinstance(exc, smtplib.SMTPException)
+
+
+def get_retry_delay(attempt: int) -> float:
+    """Exponential backoff with jitter: half fixed, half random."""
+    delay = min(
+        settings.MAIL_RETRY_MAX_DELAY,
+        settings.MAIL_RETRY_BASE_DELAY * 2 ** (attempt - 1)
+    )
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def deliver_post(
+    post_id: int,
+    retry: Callable[[float], Any] | None = None
+) -> str | None:
+    """Send a queued Post and record the attempt.
+
+    Transient SMTP errors call `retry(countdown)` until
+    MAIL_RETRY_MAX_ATTEMPTS is reached, after that (or on a permanent
+    error) the Post is moved to the dead letter table.
+    """
+    # Claiming the row makes a duplicate delivery of the same id a no-op.
+    claimed = Post.objects.filter(
+        id=post_id,
+        status__in=(Post.STATUS_QUEUED, Post.STATUS_RETRYING)
+    ).update(
+        status=Post.STATUS_SENDING,
+        attempt_count=F('attempt_count') + 1,
+        heartbeat=timezone.now()
+    )
+    if not claimed:
+        return None
+
+    post = Post.objects.get(id=post_id)
+    started_at = timezone.now()
+    started = time.perf_counter()
+    try:
+        send_post(post)
+    except Exception as exc:
+        transient = is_transient_error(exc)
+        DeliveryAttempt.objects.create(
+            post=post,
+            number=post.attempt_count,
+            started_at=started_at,
+            duration_ms=int((time.perf_counter() - started) * 1000),
+            transient=transient,
+            error=str(exc)
+        )
+        if transient and retry is not None \
+                and post.attempt_count < settings.MAIL_RETRY_MAX_ATTEMPTS:
+            Post.objects.filter(id=post_id).update(
+                status=Post.STATUS_RETRYING,
+                error=str(exc)
+            )
+            retry(get_retry_delay(post.attempt_count))
+            return Post.STATUS_RETRYING
+
+        with transaction.atomic():
+            Post.objects.filter(id=post_id).update(
+                status=Post.STATUS_DEAD,
+                error=str(exc)
+            )
+            DeadLetter.objects.update_or_create(
+                post=post,
+                defaults={
+                    'attempts': post.attempt_count,
+                    'last_error': str(exc)
+                }
+            )
+        return Post.STATUS_DEAD
+
+    DeliveryAttempt.objects.create(
+        post=post,
+        number=post.attempt_count,
+        started_at=started_at,
+        duration_ms=int((time.perf_counter() - started) * 1000),
+        succeeded=True
+    )
+    Post.objects.filter(id=post_id).update(
+        status=Post.STATUS_SENT,
+        sent_at=timezone.now(),
+        error=''
+    )
+    return Post.STATUS_SENT
+
+
+def requeue_stale_deliveries(stale_after: int | None = None) -> list[int]:
+    """Recover Posts whose delivery task was lost, returns the ids to
+    dispatch again.
+
+    Staleness is `stale_after` seconds (MAIL_DELIVERY_STALE_AFTER) without
+    a heartbeat:
+
+    - 'queued' Posts never claimed, because the dispatch failed (broker
+      down when the request committed) or the task died with a worker
+      before it ran. They are dispatched again and their heartbeat is
+      set, so the next sweep waits another `stale_after`; the claim in
+      deliver_post makes a duplicate task a no-op.
+    - 'sending' Posts whose worker died mid-send (the heartbeat is set
+      when deliver_post claims them). The lost attempt is recorded as a
+      transient failure; Posts with attempts left go back to
+      'retrying' and are dispatched again, the others are
+      dead-lettered.
+
+    Bulk Posts are left to main.campaigns.resume_stale_campaigns.
+    """
+    stale_after = (
+        settings.MAIL_DELIVERY_STALE_AFTER if stale_after is None
+        else stale_after
+    )
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=stale_after)
+    error = 'The worker stopped during delivery.'
+    single = ~Exists(PostRecipient.objects.filter(post=OuterRef('pk')))
+    queued = Post.objects.filter(
+        single,
+        Q(heartbeat__lt=cutoff)
+        | Q(heartbeat__isnull=True, timestamp__lt=cutoff),
+        status=Post.STATUS_QUEUED
+    )
+    stale = Post.objects.filter(
+        single,
+        Q(heartbeat__lt=cutoff) | Q(heartbeat__isnull=True),
+        status=Post.STATUS_SENDING
+    )
+    with transaction.atomic():
+        requeued = list(
+            queued.select_for_update(skip_locked=True)
+            .values_list('id', flat=True)
+        )
+        Post.objects.filter(id__in=requeued).update(heartbeat=now)
+
+        posts = list(
+            stale.select_for_update(skip_locked=True)
+            .only('id', 'attempt_count', 'heartbeat')
+        )
+        DeliveryAttempt.objects.bulk_create(
+            DeliveryAttempt(
+                post=post,
+                number=post.attempt_count,
+                started_at=post.heartbeat or now,
+                duration_ms=0,
+                transient=True,
+                error=error
+            )
+            for post in posts
+        )
+        retried = []
+        dead = []
+        for post in posts:
+            if post.attempt_count < settings.MAIL_RETRY_MAX_ATTEMPTS:
+                retried.append(post.id)
+            else:
+                dead.append(post.id)
+                DeadLetter.objects.update_or_create(
+                    post=post,
+                    defaults={
+                        'attempts': post.attempt_count,
+                        'last_error': error
+                    }
+                )
+        Post.objects.filter(id__in=retried).update(
+            status=Post.STATUS_RETRYING, error=error, heartbeat=now)
+        Post.objects.filter(id__in=dead).update(
+            status=Post.STATUS_DEAD, error=error)
+    return requeued + retried
+
+
+def replay_dead_letters(queryset: QuerySet) -> list[int]:
+    """Requeue the Posts of the given dead letters, return their ids."""
+    with transaction.atomic():
+        post_ids = list(
+            queryset.select_for_update().values_list('post_id', flat=True)
+        )
+        Post.objects.filter(id__in=post_ids).update(
+            status=Post.STATUS_QUEUED,
+            attempt_count=0,
+            error='',
+            # dispatched by the caller, not stale yet
+            heartbeat=timezone.now()
+        )
+        DeadLetter.objects.filter(post_id__in=post_ids).delete()
+    return post_ids
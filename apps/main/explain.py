@@ -0,0 +1,72 @@
+# Python
+import json
+from datetime import timedelta
+from typing import Iterator
+
+# Django
+from django.db import (
+    connection,
+    transaction
+)
+from django.db.models import QuerySet
+from django.utils import timezone
+
+# Local
+from auths.models import CustomUser
+from .models import (
+    Post,
+    Email,
+    MailboxEntry
+)
+
+PAGE_SIZE = 6
+
+
+def get_listing_queries(user: CustomUser) -> dict[str, QuerySet]:
+    """The list queries the mailbox pages run, as the views build them."""
+    since = timezone.now() - timedelta(days=7)
+    return {
+        'post_outbox': Post.objects.for_listing()
+        .order_by('-timestamp', '-id')[:PAGE_SIZE],
+        'post_by_sender': Post.objects.for_listing()
+        .filter(sender=user).order_by('-timestamp', '-id')[:PAGE_SIZE],
+        'post_by_recipient': Post.get_inbox_messages(user.email)
+        .order_by('-timestamp', '-id')[:PAGE_SIZE],
+        'post_by_timestamp': Post.objects.filter(timestamp__gte=since)
+        .order_by('-timestamp', '-id')[:PAGE_SIZE],
+        'email_inbox': MailboxEntry.get_folder(
+            user, MailboxEntry.FOLDER_INBOX)[:PAGE_SIZE],
+        'email_outbox': MailboxEntry.get_folder(
+            user, MailboxEntry.FOLDER_OUTBOX)[:PAGE_SIZE],
+        'email_export_inbox': Email.get_inbox_messages(user)
+        .order_by('-timestamp', '-id')[:PAGE_SIZE],
+        'email_by_recipient': Email.objects.filter(recipients=user)
+        .order_by('-id')[:PAGE_SIZE],
+        'email_deleted_by': Email.objects.filter(deleted_by=user)
+        .order_by('-id')[:PAGE_SIZE],
+        'email_by_timestamp': Email.objects.filter(timestamp__gte=since)
+        .order_by('-timestamp', '-id')[:PAGE_SIZE],
+    }
+
+
+def iter_plan_nodes(node: dict) -> Iterator[dict]:
+    yield node
+    for child in node.get('Plans', ()):
+        yield from iter_plan_nodes(child)
+
+
+def find_seq_scans(queryset: QuerySet) -> list[str]:
+    """Tables `queryset` can only read with a sequential scan.
+
+    Sequential scans are disabled for the EXPLAIN, so the planner picks
+    any usable index however small the table is. One that remains
+    means no index matches the query. PostgreSQL only.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = json.loads(queryset.explain(format='json'))
+    return [
+        node['Relation Name']
+        for node in iter_plan_nodes(plan[0]['Plan'])
+        if node['Node Type'] == 'Seq Scan'
+    ]
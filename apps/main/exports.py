@@ -0,0 +1,354 @@
+# Python
+import csv
+import tempfile
+from datetime import timedelta
+from itertools import chain
+from operator import attrgetter
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator
+)
+
+# Django
+from django.conf import settings
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import (
+    Q,
+    QuerySet
+)
+from django.utils import timezone
+
+# Third party
+import openpyxl
+import pytz
+
+# Local
+from auths.models import CustomUser
+from .codecs import get_cipher
+from .models import (
+    Email,
+    ExportJob,
+    Post
+)
+
+Formatter = Callable[[Any], Any]
+
+
+def as_is() -> Formatter:
+    return lambda value: value
+
+
+def local_time() -> Formatter:
+    """Naive local time, Excel has no time zones."""
+    tz = pytz.timezone(settings.TIME_ZONE)
+    return lambda value: value.astimezone(tz).replace(tzinfo=None)
+
+
+def decrypted() -> Formatter:
+    """Plain text of a stored internal mail body."""
+    return get_cipher().decrypt
+
+
+def joined_emails() -> Formatter:
+    """Addresses of a prefetched to-many relation, comma separated."""
+    return lambda manager: ', '.join(user.email for user in manager.all())
+
+
+class Column:
+    """One exported column: its header, the field path read from each
+    object (`sender__email`) and a formatter factory.
+
+    The factory runs once per export and returns the function applied to
+    every value, so time zones, ciphers and the like are looked up once
+    and not per row.
+    """
+
+    def __init__(
+        self,
+        header: str,
+        path: str,
+        formatter: Callable[[], Formatter] = as_is
+    ) -> None:
+        self.header = header
+        self.path = path
+        self.formatter = formatter
+
+    def get_reader(self) -> Formatter:
+        get_value = attrgetter(self.path.replace('__', '.'))
+        format_value = self.formatter()
+        if self.formatter is as_is:
+            return get_value
+        return lambda obj: format_value(get_value(obj))
+
+
+def iter_xlsx(export: 'Export', rows: Iterable[list]) -> Iterator[bytes]:
+    """XLSX file of `rows`.
+
+    The write-only workbook keeps only the row being appended in memory
+    (with lxml installed, the stdlib fallback of openpyxl builds the whole
+    sheet tree), sheet XML goes to a temporary file, the zip is assembled
+    in another one and read back in EXPORT_CHUNK_SIZE pieces. Nothing is
+    written to the working directory, concurrent exports don't collide.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(export.headers)
+    for row in rows:
+        sheet.append(row)
+    with tempfile.TemporaryFile() as file:
+        workbook.save(file)
+        file.seek(0)
+        while chunk := file.read(settings.EXPORT_CHUNK_SIZE):
+            yield chunk
+
+
+class LineBuffer:
+    """File-like target of csv.writer that keeps the last line only."""
+
+    def write(self, line: str) -> str:
+        return line
+
+
+def iter_lines(lines: Iterable[str]) -> Iterator[bytes]:
+    """`lines` encoded and joined into pieces of about EXPORT_CHUNK_SIZE."""
+    chunk = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= settings.EXPORT_CHUNK_SIZE:
+            yield ''.join(chunk).encode()
+            chunk = []
+            size = 0
+    if chunk:
+        yield ''.join(chunk).encode()
+
+
+def iter_csv(export: 'Export', rows: Iterable[list]) -> Iterator[bytes]:
+    writer = csv.writer(LineBuffer())
+    return iter_lines(
+        writer.writerow(row) for row in chain([export.headers], rows)
+    )
+
+
+def iter_ndjson(export: 'Export', rows: Iterable[list]) -> Iterator[bytes]:
+    """One JSON object per row, keyed by the field paths like the
+    streamed search results."""
+    keys = [column.path for column in export.columns]
+    encoder = DjangoJSONEncoder()
+    return iter_lines(
+        encoder.encode(dict(zip(keys, row))) + '\n' for row in rows
+    )
+
+
+# format: (file extension, content type, renderer)
+FORMATS = {
+    'xlsx': (
+        'xlsx',
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        iter_xlsx
+    ),
+    'csv': ('csv', 'text/csv', iter_csv),
+    'ndjson': ('ndjson', 'application/x-ndjson', iter_ndjson),
+}
+
+
+class Export:
+    """Columns of one kind of export, the name of its file and the mail
+    of a user it covers.
+
+    Any format of FORMATS is rendered from the same columns. Objects are
+    read EXPORT_QUERY_CHUNK_SIZE at a time, prefetch_related() of the
+    queryset runs per chunk.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        columns: Iterable[Column],
+        get_queryset: Callable[[CustomUser], QuerySet]
+    ) -> None:
+        self.filename = filename
+        self.columns = tuple(columns)
+        self.headers = [column.header for column in self.columns]
+        self.get_queryset = get_queryset
+
+    def get_filename(self, file_format: str) -> str:
+        extension, _, _ = FORMATS[file_format]
+        return f'{self.filename}.{extension}'
+
+    def iter_rows(
+        self,
+        queryset: QuerySet,
+        progress: Callable[[int], Any] | None = None
+    ) -> Iterator[list]:
+        """Rows of `queryset`, `progress` is called with the number of
+        rows read after every chunk."""
+        readers = [column.get_reader() for column in self.columns]
+        chunk_size = settings.EXPORT_QUERY_CHUNK_SIZE
+        count = 0
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            yield [read(obj) for read in readers]
+            count += 1
+            if progress and count % chunk_size == 0:
+                progress(count)
+        if progress:
+            progress(count)
+
+    def render(
+        self,
+        queryset: QuerySet,
+        file_format: str,
+        progress: Callable[[int], Any] | None = None
+    ) -> Iterator[bytes]:
+        _, _, renderer = FORMATS[file_format]
+        return renderer(self, self.iter_rows(queryset, progress))
+
+
+EMAIL_COLUMNS = (
+    Column('Sender', 'sender__email'),
+    Column('Recipients', 'recipients', joined_emails),
+    Column('Subject', 'subject'),
+    Column('Message', 'body', decrypted),
+    Column('Time', 'timestamp', local_time),
+)
+
+inbox_export = Export(
+    'inbox_messages', EMAIL_COLUMNS, Email.get_inbox_messages)
+outbox_export = Export(
+    'outbox_messages', EMAIL_COLUMNS, Email.get_outbox_messages)
+post_export = Export(
+    'outbox_external_messages',
+    (
+        Column('To mail', 'recipient'),
+        Column('Additional mail', 'additional_recipient'),
+        Column('From', 'sender__email'),
+        Column('Subject', 'subject'),
+        Column('Message', 'message'),
+        Column('Time', 'timestamp', local_time),
+    ),
+    # the external outbox page lists every Post
+    lambda user: Post.objects.for_listing()
+)
+
+EXPORTS = {
+    ExportJob.KIND_INBOX: inbox_export,
+    ExportJob.KIND_OUTBOX: outbox_export,
+    ExportJob.KIND_POSTS: post_export,
+}
+
+
+def run_export_job(job_id: int) -> dict[str, Any]:
+    """Write the file of a queued ExportJob into the default storage.
+
+    `rows` and the heartbeat are updated after every
+    EXPORT_QUERY_CHUNK_SIZE rows, so the status page can show progress
+    and requeue_stale_exports() can tell a dead worker. Finished and
+    failed jobs expire after EXPORT_JOB_EXPIRY seconds.
+    """
+    claimed = ExportJob.objects.filter(
+        id=job_id, status=ExportJob.STATUS_QUEUED
+    ).update(status=ExportJob.STATUS_RUNNING, heartbeat=timezone.now())
+    if not claimed:
+        return get_export_progress(job_id)
+
+    job = ExportJob.objects.select_related('user').get(id=job_id)
+    export = EXPORTS[job.kind]
+    queryset = export.get_queryset(job.user).order_by('-timestamp', '-id')
+    jobs = ExportJob.objects.filter(id=job_id)
+    jobs.update(total=queryset.count())
+    expiry = timedelta(seconds=settings.EXPORT_JOB_EXPIRY)
+    try:
+        with tempfile.TemporaryFile() as file:
+            for chunk in export.render(
+                queryset,
+                job.file_format,
+                progress=lambda rows: jobs.update(
+                    rows=rows, heartbeat=timezone.now())
+            ):
+                file.write(chunk)
+            file.seek(0)
+            job.file.save(
+                export.get_filename(job.file_format), File(file), save=False)
+    except Exception as exc:
+        now = timezone.now()
+        jobs.update(
+            status=ExportJob.STATUS_FAILED,
+            error=str(exc),
+            finished=now,
+            expires=now + expiry
+        )
+        raise
+
+    now = timezone.now()
+    jobs.update(
+        status=ExportJob.STATUS_DONE,
+        file=job.file.name,
+        finished=now,
+        expires=now + expiry
+    )
+    return get_export_progress(job_id)
+
+
+def get_export_progress(job_id: int) -> dict[str, Any]:
+    return ExportJob.objects.filter(id=job_id).values(
+        'status', 'rows', 'total').get()
+
+
+def requeue_stale_exports(stale_after: int | None = None) -> list[int]:
+    """Recover ExportJobs whose task was lost, returns the ids to
+    dispatch again.
+
+    Staleness is `stale_after` seconds (EXPORT_JOB_STALE_AFTER) without
+    a heartbeat:
+
+    - 'running' jobs whose worker died mid-export are failed and expire
+      like any finished job, so their page stops polling and
+      purge_expired_exports() removes them. The file is only stored
+      once complete, there is nothing to clean up.
+    - 'queued' jobs never claimed, because the dispatch failed or the
+      task died with a worker before it ran, are dispatched again.
+      Their heartbeat is set, so the next sweep waits another
+      `stale_after`; the claim makes a duplicate task a no-op.
+    """
+    stale_after = (
+        settings.EXPORT_JOB_STALE_AFTER if stale_after is None
+        else stale_after
+    )
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=stale_after)
+    stale = ExportJob.objects.filter(
+        Q(heartbeat__lt=cutoff)
+        | Q(heartbeat__isnull=True, created__lt=cutoff)
+    )
+    with transaction.atomic():
+        stale.filter(status=ExportJob.STATUS_RUNNING).update(
+            status=ExportJob.STATUS_FAILED,
+            error='The worker stopped during the export.',
+            finished=now,
+            expires=now + timedelta(seconds=settings.EXPORT_JOB_EXPIRY)
+        )
+        job_ids = list(
+            stale.filter(status=ExportJob.STATUS_QUEUED)
+            .select_for_update(skip_locked=True)
+            .values_list('id', flat=True)
+        )
+        ExportJob.objects.filter(id__in=job_ids).update(heartbeat=now)
+    return job_ids
+
+
+def purge_expired_exports() -> int:
+    """Delete expired ExportJobs and their files."""
+    purged = 0
+    for job in ExportJob.objects.filter(
+        expires__lte=timezone.now()
+    ).only('id', 'file').iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        purged += 1
+    return purged
@@ -1,6 +1,8 @@
 # Django
 from django import forms
+from django.conf import settings
 from django.shortcuts import render
+from django.urls import reverse_lazy
 from django_summernote.widgets import SummernoteWidget
 
 # Local
@@ -27,12 +29,43 @@ class PostForm(forms.ModelForm):
         ]
 
 
+class RecipientAutocompleteWidget(forms.SelectMultiple):
+    """Multiple select filled from the recipient autocomplete endpoint.
+
+    Only the selected users are rendered as options, looked up in one
+    query, instead of every user of the field's queryset.
+    """
+
+    class Media:
+        js = ('js/recipient_autocomplete.js',)
+
+    def __init__(self, attrs: dict | None = None) -> None:
+        attrs = {
+            'data-autocomplete-url': reverse_lazy('recipient_autocomplete'),
+            'data-autocomplete-min-length':
+                settings.MAIL_AUTOCOMPLETE_MIN_LENGTH,
+            **(attrs or {}),
+        }
+        super().__init__(attrs)
+
+    def optgroups(self, name, value, attrs=None):
+        ids = [pk for pk in value if str(pk).isdigit()]
+        users = CustomUser.objects.filter(
+            pk__in=ids).values_list('id', 'email')
+        return [
+            (None, [self.create_option(
+                name, user_id, email, True, index, attrs=attrs
+            )], index)
+            for index, (user_id, email) in enumerate(users)
+        ]
+
+
 class EmailForm(forms.ModelForm):
     """Email form."""
 
     recipients = forms.ModelMultipleChoiceField(
         queryset=CustomUser.objects.all(),
-        widget=forms.SelectMultiple,
+        widget=RecipientAutocompleteWidget,
     )
 
     class Meta:
@@ -44,3 +77,29 @@ class EmailForm(forms.ModelForm):
             'attachment'
         ]
         widgets = {'body': SummernoteWidget()}
+
+
+class BulkPostForm(forms.Form):
+    """Bulk post form, recipients typed in or uploaded as CSV."""
+
+    recipients = forms.CharField(
+        widget=forms.Textarea,
+        required=False,
+        help_text='One address per line, or separated by commas.'
+    )
+    recipients_file = forms.FileField(
+        label='Recipients CSV',
+        required=False
+    )
+    subject = forms.CharField(max_length=100)
+    message = forms.CharField(widget=SummernoteWidget())
+    file = forms.FileField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('recipients') \
+                and not cleaned_data.get('recipients_file'):
+            raise forms.ValidationError(
+                'Add recipients or upload a CSV file.'
+            )
+        return cleaned_data
@@ -0,0 +1,115 @@
+# Python
+from typing import Iterable
+
+# Django
+from django.conf import settings
+from django.db import transaction
+
+# Local
+from .codecs import get_cipher
+from .models import (
+    Email,
+    EmailArchive,
+    SearchToken,
+    SearchTokenArchive
+)
+from .search import (
+    get_token_digests,
+    tokenize
+)
+
+
+# indexed mail and the model of its tokens
+INDEXED_MODELS = (
+    (Email, SearchToken),
+    (EmailArchive, SearchTokenArchive),
+)
+
+
+def build_tokens(
+    email_id: int,
+    body: str,
+    user_ids: Iterable[int],
+    token_model: type[SearchToken | SearchTokenArchive] = SearchToken
+) -> list[SearchToken | SearchTokenArchive]:
+    words = tokenize(body, limit=settings.MAIL_SEARCH_MAX_WORDS)
+    return [
+        token_model(user_id=user_id, email_id=email_id, digest=digest)
+        for user_id in set(user_ids)
+        for digest in get_token_digests(user_id, words)
+    ]
+
+
+def index_email(
+    email: Email,
+    user_ids: Iterable[int],
+    body: str | None = None
+) -> int:
+    """Blind index the body of `email` for `user_ids`.
+
+    `body` is the plain text, decrypted from email.body when not given.
+    """
+    if body is None:
+        body = get_cipher().decrypt(email.body)
+    tokens = SearchToken.objects.bulk_create(
+        build_tokens(email.id, body, user_ids),
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+    return len(tokens)
+
+
+def rebuild_search_tokens(batch_size: int | None = None) -> int:
+    """Re-index every Email body, archived ones included, oldest first.
+
+    For mail sent before the index existed and after a change of
+    MAIL_SEARCH_INDEX_KEY. Each batch replaces its tokens in one
+    transaction, search keeps working meanwhile.
+    """
+    batch_size = batch_size or settings.MAIL_SEARCH_REBUILD_BATCH_SIZE
+    return sum(
+        rebuild_model_tokens(model, token_model, batch_size)
+        for model, token_model in INDEXED_MODELS
+    )
+
+
+def rebuild_model_tokens(
+    model: type[Email | EmailArchive],
+    token_model: type[SearchToken | SearchTokenArchive],
+    batch_size: int
+) -> int:
+    Recipients = model.recipients.through
+    recipients_field = model.recipients.field.m2m_field_name()
+    cipher = get_cipher()
+
+    indexed = 0
+    last_id = 0
+    while True:
+        emails = list(
+            model.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'sender_id', 'body')[:batch_size]
+        )
+        if not emails:
+            break
+        last_id = emails[-1][0]
+        ids = [email_id for email_id, _, _ in emails]
+        participants = {
+            email_id: {sender_id} for email_id, sender_id, _ in emails
+        }
+        for email_id, user_id in Recipients.objects.filter(
+            **{f'{recipients_field}__in': ids}
+        ).values_list(recipients_field, 'customuser_id'):
+            participants[email_id].add(user_id)
+
+        bodies = cipher.decrypt_many(body for _, _, body in emails)
+        tokens = []
+        for email_id, body in zip(ids, bodies):
+            tokens.extend(build_tokens(
+                email_id, body, participants[email_id], token_model))
+        with transaction.atomic():
+            token_model.objects.filter(email_id__in=ids).delete()
+            token_model.objects.bulk_create(
+                tokens, batch_size=1000, ignore_conflicts=True)
+        indexed += len(emails)
+    return indexed
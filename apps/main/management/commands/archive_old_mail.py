@@ -0,0 +1,46 @@
+# Python
+from typing import Any
+
+# Django
+from django.core.management.base import (
+    BaseCommand,
+    CommandParser
+)
+
+# Local
+from main.archive import (
+    archive_old_mail,
+    get_archivable_emails,
+    get_archivable_posts,
+    get_archive_cutoff
+)
+
+
+class Command(BaseCommand):
+    help = 'Move old Posts and Emails to the archive tables.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--days', type=int,
+                            help='Archive mail older than this.')
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--max-batches', type=int)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['dry_run']:
+            before = get_archive_cutoff(options['days'])
+            self.stdout.write(
+                f'{get_archivable_posts(before).count()} Posts and '
+                f'{get_archivable_emails(before).count()} Emails '
+                f'older than {before:%Y-%m-%d} can be archived.'
+            )
+            return
+
+        moved = archive_old_mail(
+            days=options['days'],
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{moved["posts"]} Posts and {moved["emails"]} Emails archived.'
+        ))
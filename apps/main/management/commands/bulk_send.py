@@ -0,0 +1,105 @@
+# Python
+import os
+from typing import Any
+
+# Django
+from django.core.files import File
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser
+)
+
+# Local
+from auths.models import CustomUser
+from main.campaigns import (
+    parse_recipients,
+    create_campaign,
+    send_campaign
+)
+
+
+class Command(BaseCommand):
+    help = 'Send one message to a list of recipients in throttled batches.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--sender', required=True,
+                            help='Email of the sending CustomUser.')
+        parser.add_argument('--subject', required=True)
+        message = parser.add_mutually_exclusive_group(required=True)
+        message.add_argument('--message')
+        message.add_argument('--message-file',
+                             help='Path to a text file with the body.')
+        parser.add_argument('--recipients', default='',
+                            help='Comma separated addresses.')
+        parser.add_argument('--csv',
+                            help='CSV file, "email" column or first column.')
+        parser.add_argument('--attach', help='Path to an attachment.')
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--rate', type=float,
+                            help='Messages per second, 0 disables it.')
+        parser.add_argument('--resume', type=int, metavar='POST_ID',
+                            help='Continue a stopped bulk post.')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['resume']:
+            post_id = options['resume']
+        else:
+            post_id = self._create(options)
+
+        progress = send_campaign(
+            post_id,
+            batch_size=options['batch_size'],
+            rate=options['rate']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Post {post_id}: {progress["sent"]} sent, '
+            f'{progress["failed"]} failed, {progress["queued"]} queued '
+            f'of {progress["total"]}.'
+        ))
+
+    def _create(self, options: dict) -> int:
+        try:
+            sender = CustomUser.objects.get(email=options['sender'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f'Unknown sender {options["sender"]}')
+
+        if options['csv']:
+            with open(options['csv'], 'rb') as csv_file:
+                recipients, invalid = parse_recipients(
+                    options['recipients'], File(csv_file)
+                )
+        else:
+            recipients, invalid = parse_recipients(options['recipients'])
+        for address in invalid:
+            self.stderr.write(f'Skipping invalid address {address}')
+        if not recipients:
+            raise CommandError('No valid recipients.')
+
+        message = options['message']
+        if options['message_file']:
+            with open(options['message_file'], encoding='utf-8') as body:
+                message = body.read()
+
+        attachment = None
+        if options['attach']:
+            attachment = File(
+                open(options['attach'], 'rb'),
+                name=os.path.basename(options['attach'])
+            )
+        try:
+            post = create_campaign(
+                sender=sender,
+                recipients=recipients,
+                subject=options['subject'],
+                message=message,
+                file=attachment
+            )
+        finally:
+            if attachment is not None:
+                attachment.close()
+
+        self.stdout.write(
+            f'Post {post.id} created for {len(recipients)} recipients.'
+        )
+        return post.id
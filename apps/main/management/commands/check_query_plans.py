@@ -0,0 +1,56 @@
+# Python
+from typing import Any
+
+# Django
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser
+)
+from django.db import connection
+
+# Local
+from auths.models import CustomUser
+from main.explain import (
+    find_seq_scans,
+    get_listing_queries
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN the mailbox list queries and fail on any that needs '
+        'a sequential scan.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--user',
+                            help='Email of the user to build queries for.')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if connection.vendor != 'postgresql':
+            raise CommandError('Query plans are only checked on PostgreSQL.')
+
+        if options['user']:
+            user = CustomUser.objects.filter(email=options['user']).first()
+        else:
+            user = CustomUser.objects.order_by('id').first()
+        if user is None:
+            raise CommandError('No user to build the queries for.')
+
+        failed = []
+        for name, queryset in get_listing_queries(user).items():
+            tables = find_seq_scans(queryset)
+            if tables:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(
+                    f'{name}: sequential scan on {", ".join(tables)}'
+                ))
+            else:
+                self.stdout.write(f'{name}: ok')
+
+        if failed:
+            raise CommandError(
+                f'{len(failed)} list queries have no matching index.'
+            )
+        self.stdout.write(self.style.SUCCESS('Every list query uses an index.'))
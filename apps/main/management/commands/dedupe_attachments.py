@@ -0,0 +1,121 @@
+# Python
+import os
+from typing import Any
+
+# Django
+from django.core.management.base import (
+    BaseCommand,
+    CommandParser
+)
+from django.db import transaction
+
+# Local
+from main.models import (
+    Post,
+    Email,
+    PostArchive,
+    EmailArchive,
+    AttachmentBlob
+)
+from main.storage import (
+    BLOB_DIR,
+    attachment_storage
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Move attachments saved before deduplication into the '
+        'content-addressed blob store and delete the old copies, and '
+        'rename blobs stored under their first uploader\'s filename to '
+        'their hash.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--keep-files',
+            action='store_true',
+            help='Do not delete the old files after moving them.'
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        blobs_before = AttachmentBlob.objects.count()
+        moved: set[str] = set()
+        rows = 0
+        for model, field in ((Post, 'file'), (Email, 'attachment')):
+            legacy = model.objects.exclude(
+                **{f'{field}__isnull': True}
+            ).exclude(
+                **{field: ''}
+            ).exclude(
+                **{f'{field}__startswith': f'{BLOB_DIR}/'}
+            ).values_list('id', field)
+
+            for obj_id, name in legacy.iterator(chunk_size=500):
+                if not attachment_storage.exists(name):
+                    self.stderr.write(f'Missing file {name} ({model.__name__} {obj_id})')
+                    continue
+                with transaction.atomic():
+                    with attachment_storage.open(name, 'rb') as content:
+                        blob_name = attachment_storage.save(
+                            name, content, max_length=255
+                        )
+                    model.objects.filter(id=obj_id).update(
+                        **{field: blob_name}
+                    )
+                moved.add(name)
+                rows += 1
+
+        if not options['keep_files']:
+            for name in moved:
+                attachment_storage.delete(name)
+
+        blobs_created = AttachmentBlob.objects.count() - blobs_before
+        self.stdout.write(self.style.SUCCESS(
+            f'{rows} attachments moved into {blobs_created} new blobs, '
+            f'{rows - blobs_created} duplicates removed.'
+        ))
+        renamed = self.rename_blobs()
+        self.stdout.write(self.style.SUCCESS(f'{renamed} blobs renamed.'))
+
+    def rename_blobs(self) -> int:
+        renamed = 0
+        for blob in AttachmentBlob.objects.iterator(chunk_size=500):
+            name = attachment_storage.get_blob_name(blob.sha256)
+            if blob.name == name:
+                continue
+            if not attachment_storage.exists(blob.name):
+                self.stderr.write(f'Missing file {blob.name}')
+                continue
+            old_path = attachment_storage.path(blob.name)
+            new_path = attachment_storage.path(name)
+            # the old blobs/<2 hex>/<sha256>/ directory is where the
+            # file goes, move the file out of it first
+            moving_path = f'{new_path}.moving'
+            os.replace(old_path, moving_path)
+            try:
+                os.rmdir(os.path.dirname(old_path))
+            except OSError:
+                os.replace(moving_path, old_path)
+                self.stderr.write(f'Cannot rename {blob.name}')
+                continue
+            os.replace(moving_path, new_path)
+            try:
+                with transaction.atomic():
+                    for model, field in (
+                        (Post, 'file'),
+                        (PostArchive, 'file'),
+                        (Email, 'attachment'),
+                        (EmailArchive, 'attachment'),
+                    ):
+                        model.objects.filter(
+                            **{field: blob.name}).update(**{field: name})
+                    AttachmentBlob.objects.filter(pk=blob.pk).update(
+                        name=name)
+            except Exception:
+                os.replace(new_path, moving_path)
+                os.makedirs(os.path.dirname(old_path))
+                os.replace(moving_path, old_path)
+                raise
+            renamed += 1
+        return renamed
@@ -0,0 +1,39 @@
+# Python
+from typing import Any
+
+# Django
+from django.core.management.base import (
+    BaseCommand,
+    CommandParser
+)
+
+# Local
+from main.deletion import (
+    get_purgeable_emails,
+    purge_deleted_emails
+)
+
+
+class Command(BaseCommand):
+    help = 'Physically delete internal mail every participant deleted.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--max-batches', type=int)
+        parser.add_argument('--pause', type=float,
+                            help='Seconds to sleep between batches.')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['dry_run']:
+            self.stdout.write(
+                f'{get_purgeable_emails().count()} emails can be purged.'
+            )
+            return
+
+        purged = purge_deleted_emails(
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+            pause=options['pause']
+        )
+        self.stdout.write(self.style.SUCCESS(f'{purged} emails purged.'))
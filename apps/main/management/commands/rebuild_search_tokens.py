@@ -0,0 +1,24 @@
+# Python
+from typing import Any
+
+# Django
+from django.core.management.base import (
+    BaseCommand,
+    CommandParser
+)
+
+# Local
+from main.indexing import rebuild_search_tokens
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the blind search index of internal mail bodies.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        indexed = rebuild_search_tokens(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{indexed} Emails indexed, archived ones included.'
+        ))
@@ -0,0 +1,24 @@
+# Python
+from typing import Any
+
+# Django
+from django.core.management.base import (
+    BaseCommand,
+    CommandParser
+)
+
+# Local
+from main.counters import mailbox_counters
+
+
+class Command(BaseCommand):
+    help = 'Correct Redis mailbox counters that drifted from the database.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        fixed = mailbox_counters.reconcile(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{fixed} users had drifted counters.'
+        ))
@@ -0,0 +1,73 @@
+# Python
+from datetime import timedelta
+from typing import Any
+
+# Django
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser
+)
+from django.utils import timezone
+
+# Local
+from abstracts.utils import dispatch_task
+from main.delivery import replay_dead_letters
+from main.models import DeadLetter
+from main.tasks import deliver_post
+
+
+class Command(BaseCommand):
+    help = 'Queue dead-lettered Posts for delivery again.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('post_ids', nargs='*', type=int,
+                            help='Only these Posts.')
+        parser.add_argument('--all', action='store_true',
+                            help='Every dead letter.')
+        parser.add_argument('--since-hours', type=float,
+                            help='Only dead letters from the last N hours.')
+        parser.add_argument('--error-contains',
+                            help='Only dead letters whose error matches.')
+        parser.add_argument('--limit', type=int)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        queryset = DeadLetter.objects.order_by('id')
+        if options['post_ids']:
+            queryset = queryset.filter(post_id__in=options['post_ids'])
+        elif not (
+            options['all']
+            or options['since_hours']
+            or options['error_contains']
+        ):
+            raise CommandError(
+                'Pass Post ids, --all, --since-hours or --error-contains.'
+            )
+        if options['since_hours']:
+            queryset = queryset.filter(
+                created__gte=timezone.now() - timedelta(
+                    hours=options['since_hours']
+                )
+            )
+        if options['error_contains']:
+            queryset = queryset.filter(
+                last_error__icontains=options['error_contains']
+            )
+        if options['limit']:
+            queryset = queryset.filter(
+                id__in=list(
+                    queryset.values_list('id', flat=True)[:options['limit']]
+                )
+            )
+
+        if options['dry_run']:
+            self.stdout.write(f'{queryset.count()} dead letters match.')
+            return
+
+        post_ids = replay_dead_letters(queryset)
+        for post_id in post_ids:
+            dispatch_task(deliver_post, post_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(post_ids)} Posts queued for delivery.'
+        ))
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.1 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+def mark_existing_posts_sent(apps, schema_editor):
+    # Posts created before the delivery queue were sent inline.
+    Post = apps.get_model('main', 'Post')
+    Post.objects.update(status='sent')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='queued', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.RunPython(
+            mark_existing_posts_sent,
+            migrations.RunPython.noop
+        ),
+    ]
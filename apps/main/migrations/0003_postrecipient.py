@@ -0,0 +1,31 @@
+# Generated by Django 4.2.1 on 2026-10-17 16:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_post_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostRecipient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('sent', 'Sent'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('error', models.TextField(blank=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='main.post')),
+            ],
+            options={
+                'verbose_name': 'mail recipient',
+                'verbose_name_plural': 'mail recipients',
+                'ordering': ('id',),
+                'indexes': [models.Index(fields=['post', 'status'], name='main_postrecipient_status_idx')],
+            },
+        ),
+    ]
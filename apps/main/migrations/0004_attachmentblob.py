@@ -0,0 +1,38 @@
+# Generated by Django 4.2.1 on 2026-10-17 16:35
+
+from django.db import migrations, models
+import main.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_postrecipient'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttachmentBlob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'attachment blob',
+                'verbose_name_plural': 'attachment blobs',
+            },
+        ),
+        migrations.AlterField(
+            model_name='email',
+            name='attachment',
+            field=models.FileField(blank=True, max_length=255, null=True, storage=main.storage.get_attachment_storage, upload_to='email_attachments/'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='file',
+            field=models.FileField(blank=True, max_length=255, null=True, storage=main.storage.get_attachment_storage, upload_to='media/', verbose_name='file'),
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 4.2.1 on 2026-10-17 16:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 2000
+
+
+def backfill_mailbox_entries(apps, schema_editor):
+    # Mail sent before the mailbox table had no read tracking, it is
+    # all treated as read.
+    Email = apps.get_model('main', 'Email')
+    MailboxEntry = apps.get_model('main', 'MailboxEntry')
+    Recipients = Email.recipients.through
+    DeletedBy = Email.deleted_by.through
+
+    emails = Email.objects.order_by('id').values_list(
+        'id', 'sender_id', 'timestamp')
+    last_id = 0
+    while True:
+        batch = list(emails.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        ids = [email_id for email_id, _, _ in batch]
+        timestamps = {email_id: timestamp for email_id, _, timestamp in batch}
+        deleted = set(
+            DeletedBy.objects.filter(email_id__in=ids).values_list(
+                'email_id', 'customuser_id')
+        )
+
+        entries = [
+            MailboxEntry(
+                user_id=sender_id,
+                email_id=email_id,
+                folder='outbox',
+                is_read=True,
+                is_deleted=(email_id, sender_id) in deleted,
+                timestamp=timestamp
+            )
+            for email_id, sender_id, timestamp in batch
+        ]
+        entries.extend(
+            MailboxEntry(
+                user_id=user_id,
+                email_id=email_id,
+                folder='inbox',
+                is_read=True,
+                is_deleted=(email_id, user_id) in deleted,
+                timestamp=timestamps[email_id]
+            )
+            for email_id, user_id in Recipients.objects.filter(
+                email_id__in=ids).values_list('email_id', 'customuser_id')
+        )
+        MailboxEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('main', '0005_delivery_attempts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailboxEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('folder', models.CharField(choices=[('inbox', 'Inbox'), ('outbox', 'Outbox')], max_length=6)),
+                ('is_read', models.BooleanField(default=False)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('timestamp', models.DateTimeField()),
+                ('email', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mailbox_entries', to='main.email')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mailbox_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'mailbox entry',
+                'verbose_name_plural': 'mailbox entries',
+                'ordering': ('-timestamp', '-id'),
+                'indexes': [models.Index(condition=models.Q(('is_deleted', False)), fields=['user', 'folder', '-timestamp', '-id'], include=('email', 'is_read'), name='main_mailboxentry_listing_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='mailboxentry',
+            constraint=models.UniqueConstraint(fields=('user', 'email', 'folder'), name='main_mailboxentry_unique'),
+        ),
+        migrations.RunPython(
+            backfill_mailbox_entries,
+            migrations.RunPython.noop
+        ),
+    ]
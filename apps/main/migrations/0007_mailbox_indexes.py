@@ -0,0 +1,46 @@
+# Generated by Django 4.2.1 on 2026-10-17 16:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_mailboxentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='email',
+            index=models.Index(fields=['-timestamp', '-id'], name='main_email_listing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='email',
+            index=models.Index(fields=['sender', '-timestamp', '-id'], name='main_email_sender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-timestamp', '-id'], name='main_post_listing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['sender', '-timestamp', '-id'], name='main_post_sender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['recipient', '-timestamp', '-id'], name='main_post_recipient_idx'),
+        ),
+        # Auto-created M2M tables only have (email, user) unique and
+        # single column indexes. "Mail of user X" lookups get index-only
+        # scans from (user, email).
+        migrations.RunSQL(
+            'CREATE INDEX main_email_recipients_user_idx '
+            'ON main_email_recipients (customuser_id, email_id)',
+            'DROP INDEX main_email_recipients_user_idx',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX main_email_deleted_by_user_idx '
+            'ON main_email_deleted_by (customuser_id, email_id)',
+            'DROP INDEX main_email_deleted_by_user_idx',
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.1 on 2026-10-17 17:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import main.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('main', '0007_mailbox_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('recipient', models.EmailField(max_length=254)),
+                ('additional_recipient', models.EmailField(blank=True, max_length=254)),
+                ('subject', models.CharField(max_length=100)),
+                ('message', models.TextField()),
+                ('file', models.FileField(blank=True, max_length=255, null=True, storage=main.storage.get_attachment_storage, upload_to='media/')),
+                ('timestamp', models.DateTimeField()),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('sending', 'Sending'), ('retrying', 'Waiting to retry'), ('sent', 'Sent'), ('failed', 'Failed'), ('dead', 'Undeliverable')], max_length=10)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('sender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_posts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'archived mail',
+                'verbose_name_plural': 'archived mails',
+                'ordering': ('-id',),
+                'indexes': [models.Index(fields=['sender', '-timestamp', '-id'], name='main_postarchive_sender_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='EmailArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('subject', models.CharField(max_length=100)),
+                ('body', models.TextField(blank=True)),
+                ('timestamp', models.DateTimeField()),
+                ('attachment', models.FileField(blank=True, max_length=255, null=True, storage=main.storage.get_attachment_storage, upload_to='email_attachments/')),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('deleted_by', models.ManyToManyField(blank=True, related_name='deleted_archived_emails', to=settings.AUTH_USER_MODEL)),
+                ('recipients', models.ManyToManyField(related_name='archived_emails_received', to=settings.AUTH_USER_MODEL)),
+                ('sender', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_emails_sent', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_emails', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'archived internal_mail',
+                'verbose_name_plural': 'archived internal_mails',
+                'ordering': ('-id',),
+                'indexes': [models.Index(fields=['sender', '-timestamp', '-id'], name='main_emailarchive_sender_idx')],
+            },
+        ),
+    ]
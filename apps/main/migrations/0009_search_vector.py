@@ -0,0 +1,97 @@
+# Generated by Django 4.2.1 on 2026-10-17 17:04
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+# table -> (column, weight) that make up its search_vector. Email bodies
+# are stored encrypted, only the subject is searchable there.
+SEARCH_COLUMNS = {
+    'main_post': (('subject', 'A'), ('message', 'B')),
+    'main_postarchive': (('subject', 'A'), ('message', 'B')),
+    'main_email': (('subject', 'A'),),
+    'main_emailarchive': (('subject', 'A'),),
+}
+
+
+def get_vector_sql(columns, prefix=''):
+    return ' || '.join(
+        f"setweight(to_tsvector('simple', coalesce({prefix}{column}, '')), "
+        f"'{weight}')"
+        for column, weight in columns
+    )
+
+
+def create_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, columns in SEARCH_COLUMNS.items():
+        names = ', '.join(column for column, _ in columns)
+        schema_editor.execute(
+            f"""
+            CREATE FUNCTION {table}_search_vector() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector := {get_vector_sql(columns, 'NEW.')};
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+            """
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER {table}_search_vector_trg '
+            f'BEFORE INSERT OR UPDATE OF {names} ON {table} '
+            f'FOR EACH ROW EXECUTE FUNCTION {table}_search_vector()'
+        )
+        schema_editor.execute(
+            f'UPDATE {table} SET search_vector = {get_vector_sql(columns)}'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX {table}_search_idx '
+            f'ON {table} USING gin (search_vector)'
+        )
+
+
+def drop_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in SEARCH_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_search_idx')
+        schema_editor.execute(
+            f'DROP TRIGGER IF EXISTS {table}_search_vector_trg ON {table}'
+        )
+        schema_editor.execute(
+            f'DROP FUNCTION IF EXISTS {table}_search_vector()'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_mail_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='email',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='emailarchive',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='postarchive',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # Kept up to date by the database so bulk_create, update() and
+        # raw SQL writes are covered too. GIN indexes live here and not
+        # in Meta.indexes, SQLite can not create them.
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+    ]
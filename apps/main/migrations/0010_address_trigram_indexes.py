@@ -0,0 +1,47 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# icontains compiles to UPPER("column"::text) LIKE UPPER('%...%') on
+# PostgreSQL, the indexes are built on that same expression.
+TRIGRAM_INDEXES = {
+    'auths_customuser_email_trgm_idx': ('auths_customuser', 'email'),
+    'main_post_recipient_trgm_idx': ('main_post', 'recipient'),
+    'main_post_additional_recipient_trgm_idx': (
+        'main_post', 'additional_recipient'
+    ),
+    'main_postarchive_recipient_trgm_idx': ('main_postarchive', 'recipient'),
+    'main_postarchive_additional_recipient_trgm_idx': (
+        'main_postarchive', 'additional_recipient'
+    ),
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, (table, column) in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX {name} ON {table} '
+            f'USING gin (UPPER({column}::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auths', '0001_initial'),
+        ('main', '0009_search_vector'),
+    ]
+
+    operations = [
+        # no-op outside PostgreSQL
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
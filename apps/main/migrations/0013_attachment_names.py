@@ -0,0 +1,72 @@
+# Generated by Django 4.2.1 on 2026-10-17 17:44
+
+import os
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+ATTACHMENT_FIELDS = (
+    ('Post', 'file', 'file_name'),
+    ('PostArchive', 'file', 'file_name'),
+    ('Email', 'attachment', 'attachment_name'),
+    ('EmailArchive', 'attachment', 'attachment_name'),
+)
+
+
+def get_display_name(stored_name):
+    filename = os.path.basename(stored_name)
+    if stored_name.startswith('blobs/'):
+        # Deduplicated blobs are named after their first uploader's
+        # file, which may not be this row's, only the extension is kept.
+        return 'attachment' + os.path.splitext(filename)[1]
+    return filename
+
+
+def backfill_attachment_names(apps, schema_editor):
+    for model_name, field, name_field in ATTACHMENT_FIELDS:
+        model = apps.get_model('main', model_name)
+        rows = model.objects.exclude(**{f'{field}__isnull': True}).exclude(
+            **{field: ''}).filter(**{name_field: ''}).order_by('id')
+        last_id = 0
+        while True:
+            batch = list(rows.filter(id__gt=last_id).only('id', field)[
+                :BATCH_SIZE])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            for obj in batch:
+                setattr(obj, name_field,
+                        get_display_name(getattr(obj, field).name))
+            model.objects.bulk_update(batch, (name_field,))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='email',
+            name='attachment_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='emailarchive',
+            name='attachment_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='file_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='postarchive',
+            name='file_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.RunPython(
+            backfill_attachment_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.1 on 2026-10-17 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_attachment_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='heartbeat',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('status', 'sending')), fields=['heartbeat'], name='main_post_sending_idx'),
+        ),
+    ]
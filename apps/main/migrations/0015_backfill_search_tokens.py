@@ -0,0 +1,64 @@
+# Generated by Django 4.2.1 on 2026-10-17 19:02
+
+from django.conf import settings
+from django.db import migrations
+
+from main.codecs import get_cipher
+from main.search import (
+    get_token_digests,
+    tokenize
+)
+
+BATCH_SIZE = 500
+
+
+def backfill_search_tokens(apps, schema_editor):
+    # Mail sent before 0011 has no SearchTokens, its bodies could not be
+    # found. Same tokens as main.indexing.build_tokens, for the sender
+    # and every recipient.
+    Email = apps.get_model('main', 'Email')
+    SearchToken = apps.get_model('main', 'SearchToken')
+    Recipients = Email.recipients.through
+    cipher = get_cipher()
+
+    emails = Email.objects.order_by('id').values_list(
+        'id', 'sender_id', 'body')
+    last_id = 0
+    while True:
+        batch = list(emails.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        participants = {
+            email_id: {sender_id} for email_id, sender_id, _ in batch
+        }
+        for email_id, user_id in Recipients.objects.filter(
+            email_id__in=list(participants)
+        ).values_list('email_id', 'customuser_id'):
+            participants[email_id].add(user_id)
+
+        bodies = cipher.decrypt_many(body for _, _, body in batch)
+        tokens = []
+        for (email_id, _, _), body in zip(batch, bodies):
+            words = tokenize(body, limit=settings.MAIL_SEARCH_MAX_WORDS)
+            tokens.extend(
+                SearchToken(user_id=user_id, email_id=email_id, digest=digest)
+                for user_id in participants[email_id]
+                for digest in get_token_digests(user_id, words)
+            )
+        SearchToken.objects.bulk_create(
+            tokens, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_post_heartbeat'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_search_tokens,
+            migrations.RunPython.noop
+        ),
+    ]
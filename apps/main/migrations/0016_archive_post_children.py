@@ -0,0 +1,63 @@
+# Generated by Django 4.2.1 on 2026-10-17 17:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_backfill_search_tokens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostRecipientArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('email', models.EmailField(max_length=254)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('sent', 'Sent'), ('failed', 'Failed')], max_length=10)),
+                ('error', models.TextField(blank=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='main.postarchive')),
+            ],
+            options={
+                'verbose_name': 'archived mail recipient',
+                'verbose_name_plural': 'archived mail recipients',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.CreateModel(
+            name='DeliveryAttemptArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('number', models.PositiveSmallIntegerField()),
+                ('started_at', models.DateTimeField()),
+                ('duration_ms', models.PositiveIntegerField()),
+                ('succeeded', models.BooleanField(default=False)),
+                ('transient', models.BooleanField(default=False)),
+                ('error', models.TextField(blank=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='delivery_attempts', to='main.postarchive')),
+            ],
+            options={
+                'verbose_name': 'archived delivery attempt',
+                'verbose_name_plural': 'archived delivery attempts',
+                'ordering': ('post', 'number'),
+            },
+        ),
+        migrations.CreateModel(
+            name='DeadLetterArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('attempts', models.PositiveSmallIntegerField()),
+                ('last_error', models.TextField(blank=True)),
+                ('created', models.DateTimeField()),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='dead_letter', to='main.postarchive')),
+            ],
+            options={
+                'verbose_name': 'archived dead letter',
+                'verbose_name_plural': 'archived dead letters',
+                'ordering': ('-id',),
+            },
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.1 on 2026-10-17 17:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from main.codecs import get_cipher
+from main.search import (
+    get_token_digests,
+    tokenize
+)
+
+BATCH_SIZE = 500
+
+
+def backfill_archived_search_tokens(apps, schema_editor):
+    # Emails archived so far lost their SearchTokens with the Email row,
+    # index their bodies again, like 0015 did for the live ones.
+    EmailArchive = apps.get_model('main', 'EmailArchive')
+    SearchTokenArchive = apps.get_model('main', 'SearchTokenArchive')
+    Recipients = EmailArchive.recipients.through
+    cipher = get_cipher()
+
+    emails = EmailArchive.objects.order_by('id').values_list(
+        'id', 'sender_id', 'body')
+    last_id = 0
+    while True:
+        batch = list(emails.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        participants = {
+            email_id: {sender_id} for email_id, sender_id, _ in batch
+        }
+        for email_id, user_id in Recipients.objects.filter(
+            emailarchive_id__in=list(participants)
+        ).values_list('emailarchive_id', 'customuser_id'):
+            participants[email_id].add(user_id)
+
+        bodies = cipher.decrypt_many(body for _, _, body in batch)
+        tokens = []
+        for (email_id, _, _), body in zip(batch, bodies):
+            words = tokenize(body, limit=settings.MAIL_SEARCH_MAX_WORDS)
+            tokens.extend(
+                SearchTokenArchive(
+                    user_id=user_id, email_id=email_id, digest=digest)
+                for user_id in participants[email_id]
+                for digest in get_token_digests(user_id, words)
+            )
+        SearchTokenArchive.objects.bulk_create(
+            tokens, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('main', '0016_archive_post_children'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTokenArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=32)),
+                ('email', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='main.emailarchive')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_search_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'archived search token',
+                'verbose_name_plural': 'archived search tokens',
+                'ordering': ('-id',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchtokenarchive',
+            constraint=models.UniqueConstraint(fields=('user', 'digest', 'email'), name='main_searchtokenarchive_unique'),
+        ),
+        migrations.RunPython(
+            backfill_archived_search_tokens,
+            migrations.RunPython.noop
+        ),
+    ]
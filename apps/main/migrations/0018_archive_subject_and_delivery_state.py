@@ -0,0 +1,65 @@
+# Generated by Django 4.2.1 on 2026-10-17 18:19
+
+from django.db import migrations, models
+
+# Archive tables whose search_vector trigger (migration 0009) reads the
+# subject. PostgreSQL can not change the type of a column a trigger
+# names, the triggers are dropped around the AlterFields.
+TRIGGER_COLUMNS = {
+    'main_postarchive': 'subject, message',
+    'main_emailarchive': 'subject',
+}
+
+
+def drop_archive_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TRIGGER_COLUMNS:
+        schema_editor.execute(
+            f'DROP TRIGGER IF EXISTS {table}_search_vector_trg ON {table}'
+        )
+
+
+def create_archive_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, names in TRIGGER_COLUMNS.items():
+        schema_editor.execute(
+            f'CREATE TRIGGER {table}_search_vector_trg '
+            f'BEFORE INSERT OR UPDATE OF {names} ON {table} '
+            f'FOR EACH ROW EXECUTE FUNCTION {table}_search_vector()'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0017_searchtokenarchive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postarchive',
+            name='attempt_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='postarchive',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.RunPython(drop_archive_triggers, create_archive_triggers),
+        # as wide as main_email.subject and main_post.subject (0001),
+        # longer subjects aborted the archive batch
+        migrations.AlterField(
+            model_name='emailarchive',
+            name='subject',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='postarchive',
+            name='subject',
+            field=models.CharField(max_length=250),
+        ),
+        migrations.RunPython(create_archive_triggers, drop_archive_triggers),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.1 on 2026-10-17 18:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0018_archive_subject_and_delivery_state'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('status', 'queued')), fields=['timestamp'], name='main_post_queued_idx'),
+        ),
+    ]
@@ -0,0 +1,102 @@
+# Python
+import base64
+import mimetypes
+import os
+import re
+import uuid
+from email.mime.base import MIMEBase
+from typing import (
+    IO,
+    Iterator
+)
+
+# Django
+from django.core.mail import EmailMessage
+
+# 57 raw bytes encode to one 76 character base64 line (RFC 2045).
+BASE64_LINE_BYTES = 57
+STREAM_CHUNK_LINES = 1024
+
+_LEADING_PERIOD = re.compile(br'(?m)^\.')
+
+
+def dot_stuff(data: bytes) -> bytes:
+    """Escape lines starting with '.' for the SMTP DATA phase."""
+    return _LEADING_PERIOD.sub(b'..', data)
+
+
+def iter_base64(file: IO[bytes]) -> Iterator[bytes]:
+    """Base64 encode a binary file chunk by chunk, CRLF line endings."""
+    chunk_size = BASE64_LINE_BYTES * STREAM_CHUNK_LINES
+    while True:
+        data = file.read(chunk_size)
+        if not data:
+            return
+        yield base64.encodebytes(data).replace(b'\n', b'\r\n')
+
+
+def _placeholder_part(filename: str, marker: str) -> MIMEBase:
+    content_type, _ = mimetypes.guess_type(filename)
+    maintype, subtype = (
+        content_type or 'application/octet-stream'
+    ).split('/', 1)
+    part = MIMEBase(maintype, subtype)
+    part.set_payload(marker)
+    part['Content-Transfer-Encoding'] = 'base64'
+    try:
+        filename.encode('ascii')
+    except UnicodeEncodeError:
+        part.add_header(
+            'Content-Disposition',
+            'attachment',
+            filename=('utf-8', '', filename)
+        )
+    else:
+        part.add_header(
+            'Content-Disposition',
+            'attachment',
+            filename=filename
+        )
+    return part
+
+
+def iter_message_bytes(
+    mail: EmailMessage,
+    attachments: list[IO[bytes]],
+    filenames: list[str] | None = None
+) -> Iterator[bytes]:
+    """Render `mail` with file attachments streamed from disk.
+
+    `filenames` are the names the recipients see, the base names of the
+    files by default.
+
+    Django renders the message with a short placeholder payload per
+    attachment, the placeholders are then replaced on the fly by the
+    base64 encoded file contents. Peak memory is one encoded chunk
+    instead of several copies of every attachment.
+
+    Chunks are CRLF terminated and dot-stuffed, ready for SMTP DATA.
+    """
+    if filenames is None:
+        filenames = [os.path.basename(file.name) for file in attachments]
+    markers: list[str] = []
+    for filename in filenames:
+        marker = f'attachment-{uuid.uuid4().hex}'
+        markers.append(marker)
+        mail.attach(_placeholder_part(filename, marker))
+
+    rendered = mail.message().as_bytes(linesep='\r\n')
+    for marker, file in zip(markers, attachments):
+        head, rendered = rendered.split(marker.encode('ascii'), 1)
+        yield dot_stuff(head)
+
+        previous = None
+        for chunk in iter_base64(file):
+            if previous is not None:
+                yield previous
+            previous = chunk
+        if previous is not None:
+            # The rendered message already has the line break
+            # that follows the payload.
+            yield previous[:-2]
+    yield dot_stuff(rendered)
@@ -1,19 +1,46 @@
+# Python
+import os
+import uuid
+
 # Django
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
-from django.db.models import Q
+from django.db.models import (
+    Count,
+    Q
+)
 
 # Local
 from auths.models import CustomUser
+from .search import (
+    full_text_search,
+    get_token_digests,
+    tokenize
+)
+from .storage import get_attachment_storage
+
+
+class PostQuerySet(models.QuerySet):
+    def for_listing(self, with_body=True):
+        """Sender joined in, body deferred unless the page shows it."""
+        queryset = self.select_related('sender').defer('search_vector')
+        if not with_body:
+            queryset = queryset.defer('message')
+        return queryset
 
+    def full_text(self, keyword):
+        return full_text_search(self, keyword, ('message', 'subject'))
 
-class PostManager(models.Manager):
-    def search(self, keyword, sender=None, recipient=None):
-        queryset = self.get_queryset()
+
+class PostManager(models.Manager.from_queryset(PostQuerySet)):
+    def archived(self):
+        """Posts moved to PostArchive by main.archive."""
+        return PostArchive.objects.all()
+
+    def search(self, keyword, sender=None, recipient=None, archived=False):
+        queryset = self.archived() if archived else self.get_queryset()
         if keyword:
-            queryset = queryset.filter(
-                Q(message__icontains=keyword) |
-                Q(subject__icontains=keyword)
-            )
+            queryset = queryset.full_text(keyword)
         if sender:
             queryset = queryset.filter(sender__email__icontains=sender)
         if recipient:
@@ -25,6 +52,21 @@ class PostManager(models.Manager):
 
 
 class Post(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_SENDING = 'sending'
+    STATUS_RETRYING = 'retrying'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_RETRYING, 'Waiting to retry'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_DEAD, 'Undeliverable'),
+    )
+
     sender = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     recipient = models.EmailField()
     additional_recipient = models.EmailField(blank=True)
@@ -33,10 +75,28 @@ class Post(models.Model):
     file = models.FileField(
         verbose_name="file",
         upload_to="media/",
+        storage=get_attachment_storage,
+        max_length=255,
         null=True,
         blank=True
     )
+    # name the file was uploaded with, the stored name is its hash
+    file_name = models.CharField(max_length=255, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_QUEUED
+    )
+    sent_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempt_count = models.PositiveSmallIntegerField(default=0)
+    # last sign of life of the worker sending it (or of the sweep that
+    # dispatched it again), stale 'queued' and 'sending' Posts are
+    # picked up again, see main.delivery and main.campaigns
+    heartbeat = models.DateTimeField(null=True, blank=True)
+    # maintained by a database trigger, see migration 0009
+    search_vector = SearchVectorField(null=True, editable=False)
 
     objects = PostManager()
 
@@ -44,10 +104,49 @@ class Post(models.Model):
     def get_inbox_messages(cls, user):
         return cls.objects.filter(recipient=user)
 
+    def get_file_name(self) -> str:
+        """Name of the attachment as uploaded."""
+        return self.file_name or os.path.basename(self.file.name)
+
+    def get_recipient_list(self) -> list[str]:
+        recipients = [self.recipient]
+        if self.additional_recipient:
+            recipients.append(self.additional_recipient)
+        return recipients
+
     class Meta:
         ordering = (
             "-id",
         )
+        indexes = (
+            # PostOutboxView keyset pages and timestamp range scans
+            models.Index(
+                fields=("-timestamp", "-id"),
+                name="main_post_listing_idx"
+            ),
+            # the same pages filtered by sender
+            models.Index(
+                fields=("sender", "-timestamp", "-id"),
+                name="main_post_sender_idx"
+            ),
+            # Post.get_inbox_messages
+            models.Index(
+                fields=("recipient", "-timestamp", "-id"),
+                name="main_post_recipient_idx"
+            ),
+            # the few Posts being sent, checked for stale heartbeats
+            models.Index(
+                fields=("heartbeat",),
+                name="main_post_sending_idx",
+                condition=Q(status="sending")
+            ),
+            # the few Posts waiting for a worker, checked for lost tasks
+            models.Index(
+                fields=("timestamp",),
+                name="main_post_queued_idx",
+                condition=Q(status="queued")
+            ),
+        )
         verbose_name = "mail"
         verbose_name_plural = "mails"
 
@@ -56,18 +155,187 @@ class Post(models.Model):
         return f"Sender: {self.sender}, Recipient: {self.recipient}, Additional Recipient: {self.additional_recipient}, Subject: {self.subject}, Message: {self.message}, Time: {timestamp_str}"
 
 
-class EmailManager(models.Manager):
-    def search(self, keyword, sender=None, recipients=None):
-        queryset = self.get_queryset()
-        if keyword:
-            queryset = queryset.filter(
-                Q(body__icontains=keyword) |
-                Q(subject__icontains=keyword)
+class DeliveryAttempt(models.Model):
+    """One SMTP send attempt of a Post."""
+
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="delivery_attempts")
+    number = models.PositiveSmallIntegerField()
+    started_at = models.DateTimeField()
+    duration_ms = models.PositiveIntegerField()
+    succeeded = models.BooleanField(default=False)
+    transient = models.BooleanField(default=False)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = (
+            "post",
+            "number",
+        )
+        verbose_name = "delivery attempt"
+        verbose_name_plural = "delivery attempts"
+
+    def __str__(self) -> str:
+        result = "ok" if self.succeeded else self.error
+        return f"Post {self.post_id} #{self.number}: {result}"
+
+
+class DeadLetter(models.Model):
+    """Post given up on after its last delivery attempt."""
+
+    post = models.OneToOneField(
+        Post, on_delete=models.CASCADE, related_name="dead_letter")
+    attempts = models.PositiveSmallIntegerField()
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = (
+            "-id",
+        )
+        verbose_name = "dead letter"
+        verbose_name_plural = "dead letters"
+
+    def __str__(self) -> str:
+        return f"Post {self.post_id} after {self.attempts} attempts"
+
+
+class AttachmentBlob(models.Model):
+    """One stored attachment file shared by every mail that uploaded it."""
+
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "attachment blob"
+        verbose_name_plural = "attachment blobs"
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+class PostRecipient(models.Model):
+    """Delivery status of one recipient of a bulk Post."""
+
+    STATUS_QUEUED = 'queued'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="deliveries")
+    email = models.EmailField()
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_QUEUED
+    )
+    error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = (
+            "id",
+        )
+        indexes = (
+            models.Index(
+                fields=("post", "status"),
+                name="main_postrecipient_status_idx"
+            ),
+        )
+        verbose_name = "mail recipient"
+        verbose_name_plural = "mail recipients"
+
+    def __str__(self) -> str:
+        return f"{self.email}: {self.status}"
+
+
+class EmailQuerySet(models.QuerySet):
+    def for_listing(self, with_body=True):
+        """Sender/user joined in and recipients prefetched in one query,
+        body deferred unless the page shows it."""
+        queryset = self.select_related('sender', 'user').prefetch_related(
+            models.Prefetch(
+                'recipients',
+                queryset=CustomUser.objects.only('id', 'email')
             )
+        )
+        queryset = queryset.defer('search_vector')
+        if not with_body:
+            queryset = queryset.defer('body')
+        return queryset
+
+    def full_text(self, keyword, user=None):
+        """Subjects through search_vector. Bodies are stored encrypted,
+        with `user` they are matched through that user's SearchTokens."""
+        body_match = None
+        if user is not None:
+            tokens = (
+                SearchTokenArchive if self.model is EmailArchive
+                else SearchToken
+            )
+            # Evaluated first: one user's matches are few, and an id
+            # list ORs with the GIN index where a subquery would force
+            # a scan of the Email table.
+            body_match = Q(pk__in=list(tokens.objects.matching(
+                user.id, keyword)))
+        return full_text_search(self, keyword, ('subject',), body_match)
+
+    def visible_to(self, user):
+        """Mail `user` has not deleted.
+
+        Live mail through the user's mailbox entries, like the listings,
+        semi-joined so mail to oneself comes back once. Archived mail
+        has no mailbox entries, deleted_by is moved along with it.
+        """
+        if self.model is EmailArchive:
+            return self.exclude(deleted_by=user)
+        return self.filter(pk__in=MailboxEntry.objects.filter(
+            user=user, is_deleted=False
+        ).values('email'))
+
+    def with_recipient_like(self, address):
+        """Mail with a recipient whose address contains `address`.
+
+        A semi-join on the recipients table instead of a join: users
+        are matched once through the trigram index on their address and
+        each Email comes back once however many recipients match.
+        """
+        through = self.model.recipients.through
+        return self.filter(pk__in=through.objects.filter(
+            customuser__email__icontains=address
+        ).values(self.model.recipients.field.m2m_field_name()))
+
+
+class EmailManager(models.Manager.from_queryset(EmailQuerySet)):
+    def archived(self):
+        """Emails moved to EmailArchive by main.archive."""
+        return EmailArchive.objects.all()
+
+    def search(
+        self,
+        keyword,
+        sender=None,
+        recipients=None,
+        archived=False,
+        user=None
+    ):
+        queryset = self.archived() if archived else self.get_queryset()
+        if user is not None:
+            queryset = queryset.visible_to(user)
+        if keyword:
+            queryset = queryset.full_text(keyword, user=user)
         if sender:
             queryset = queryset.filter(sender__email__icontains=sender)
         if recipients:
-            queryset = queryset.filter(recipients__email__icontains=recipients)
+            queryset = queryset.with_recipient_like(recipients)
         return queryset
 
 
@@ -82,9 +350,14 @@ class Email(models.Model):
     body = models.TextField(blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
     attachment = models.FileField(
-        upload_to="email_attachments/", blank=True, null=True)
+        upload_to="email_attachments/", storage=get_attachment_storage,
+        max_length=255, blank=True, null=True)
+    # name the file was uploaded with, the stored name is its hash
+    attachment_name = models.CharField(max_length=255, blank=True)
     deleted_by = models.ManyToManyField(
         CustomUser, blank=True, related_name="deleted_emails")
+    # maintained by a database trigger, see migration 0009
+    search_vector = SearchVectorField(null=True, editable=False)
 
     objects = EmailManager()
 
@@ -97,16 +370,33 @@ class Email(models.Model):
 
     @classmethod
     def get_inbox_messages(cls, user):
-        return cls.objects.filter(recipients=user).exclude(deleted_by=user)
+        return cls.objects.for_listing().filter(
+            mailbox_entries__user=user,
+            mailbox_entries__folder=MailboxEntry.FOLDER_INBOX,
+            mailbox_entries__is_deleted=False)
 
     @classmethod
     def get_outbox_messages(cls, user):
-        return cls.objects.filter(sender=user).exclude(deleted_by=user)
+        return cls.objects.for_listing().filter(
+            mailbox_entries__user=user,
+            mailbox_entries__folder=MailboxEntry.FOLDER_OUTBOX,
+            mailbox_entries__is_deleted=False)
 
     class Meta:
         ordering = (
             "-id",
         )
+        indexes = (
+            # admin listing and timestamp range scans
+            models.Index(
+                fields=("-timestamp", "-id"),
+                name="main_email_listing_idx"
+            ),
+            models.Index(
+                fields=("sender", "-timestamp", "-id"),
+                name="main_email_sender_idx"
+            ),
+        )
         verbose_name = "internal_mail"
         verbose_name_plural = "internal_mails"
 
@@ -115,3 +405,407 @@ class Email(models.Model):
         recipients = ", ".join(
             [user.email for user in self.recipients.all()])
         return f"Sender: {sender}, Recipients: {recipients}, Subject: {self.subject}"
+
+
+class MailboxEntryQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Email, its sender/user and recipients loaded with the page.
+        The body is left to main.cache.body_cache, which loads it for
+        the bodies it does not have."""
+        return self.select_related(
+            'email__sender', 'email__user'
+        ).prefetch_related(
+            models.Prefetch(
+                'email__recipients',
+                queryset=CustomUser.objects.only('id', 'email')
+            )
+        ).defer('email__body', 'email__search_vector')
+
+    def fan_out(self, email, recipient_ids):
+        """Inbox entry per recipient of `email`."""
+        return self.bulk_create(
+            (
+                MailboxEntry(
+                    user_id=recipient_id,
+                    email=email,
+                    folder=MailboxEntry.FOLDER_INBOX,
+                    timestamp=email.timestamp
+                )
+                for recipient_id in recipient_ids
+            ),
+            ignore_conflicts=True
+        )
+
+
+class MailboxEntry(models.Model):
+    """One Email as it shows up in one user's inbox or outbox.
+
+    Listings filter and order on this table alone instead of joining
+    the recipients M2M and anti-joining deleted_by.
+    """
+
+    FOLDER_INBOX = 'inbox'
+    FOLDER_OUTBOX = 'outbox'
+    FOLDER_CHOICES = (
+        (FOLDER_INBOX, 'Inbox'),
+        (FOLDER_OUTBOX, 'Outbox'),
+    )
+
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="mailbox_entries")
+    email = models.ForeignKey(
+        Email, on_delete=models.CASCADE, related_name="mailbox_entries")
+    folder = models.CharField(max_length=6, choices=FOLDER_CHOICES)
+    is_read = models.BooleanField(default=False)
+    is_deleted = models.BooleanField(default=False)
+    # copy of Email.timestamp, so the listing index can order by it
+    timestamp = models.DateTimeField()
+
+    objects = MailboxEntryQuerySet.as_manager()
+
+    @classmethod
+    def get_folder(cls, user, folder):
+        return cls.objects.for_listing().filter(
+            user=user, folder=folder, is_deleted=False)
+
+    class Meta:
+        ordering = (
+            "-timestamp",
+            "-id",
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=("user", "email", "folder"),
+                name="main_mailboxentry_unique"
+            ),
+        )
+        indexes = (
+            # Serves the whole listing: equality on user/folder, rows
+            # already in page order, deleted entries left out.
+            models.Index(
+                fields=("user", "folder", "-timestamp", "-id"),
+                include=("email", "is_read"),
+                condition=Q(is_deleted=False),
+                name="main_mailboxentry_listing_idx"
+            ),
+        )
+        verbose_name = "mailbox entry"
+        verbose_name_plural = "mailbox entries"
+
+    def __str__(self) -> str:
+        return f"{self.user_id} {self.folder}: {self.email_id}"
+
+
+class SearchTokenQuerySet(models.QuerySet):
+    def matching(self, user_id, keyword):
+        """Ids of the Emails of `user_id` whose body has every word of
+        `keyword`."""
+        digests = get_token_digests(user_id, tokenize(keyword))
+        if not digests:
+            return self.none().values_list('email', flat=True)
+        # index only scan of main_searchtoken_unique
+        return self.filter(
+            user_id=user_id, digest__in=digests
+        ).values('email').annotate(
+            matched=Count('digest')
+        ).filter(matched=len(digests)).values_list('email', flat=True)
+
+
+class SearchToken(models.Model):
+    """One word of an Email body, blind indexed for one participant.
+
+    `digest` is an HMAC of the word under a key derived for `user`
+    (main.search.get_token_digests): the words themselves are not
+    stored and equal words of different users do not share a digest.
+    Written by main.indexing when the mail is sent.
+    """
+
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="search_tokens")
+    email = models.ForeignKey(
+        Email, on_delete=models.CASCADE, related_name="search_tokens")
+    digest = models.CharField(max_length=32)
+
+    objects = SearchTokenQuerySet.as_manager()
+
+    class Meta:
+        ordering = (
+            "-id",
+        )
+        constraints = (
+            # also the lookup index: (user, digest) -> email
+            models.UniqueConstraint(
+                fields=("user", "digest", "email"),
+                name="main_searchtoken_unique"
+            ),
+        )
+        verbose_name = "search token"
+        verbose_name_plural = "search tokens"
+
+    def __str__(self) -> str:
+        return f"{self.user_id}: {self.email_id}"
+
+
+class PostArchive(models.Model):
+    """A Post older than MAIL_ARCHIVE_AFTER_DAYS, moved out of the hot
+    table. Same ids and field names, so PostQuerySet works on it."""
+
+    id = models.BigIntegerField(primary_key=True)
+    sender = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="archived_posts")
+    recipient = models.EmailField()
+    additional_recipient = models.EmailField(blank=True)
+    # as wide as main_post.subject in the database, see migration 0001
+    subject = models.CharField(max_length=250)
+    message = models.TextField()
+    file = models.FileField(
+        upload_to="media/", storage=get_attachment_storage,
+        max_length=255, null=True, blank=True)
+    file_name = models.CharField(max_length=255, blank=True)
+    timestamp = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=Post.STATUS_CHOICES)
+    # why the last delivery failed, kept for diagnosis
+    error = models.TextField(blank=True)
+    attempt_count = models.PositiveSmallIntegerField(default=0)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    # maintained by a database trigger, see migration 0009
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        ordering = (
+            "-id",
+        )
+        indexes = (
+            models.Index(
+                fields=("sender", "-timestamp", "-id"),
+                name="main_postarchive_sender_idx"
+            ),
+        )
+        verbose_name = "archived mail"
+        verbose_name_plural = "archived mails"
+
+    def __str__(self) -> str:
+        return f"Sender: {self.sender}, Recipient: {self.recipient}, Subject: {self.subject}"
+
+
+class PostRecipientArchive(models.Model):
+    """A PostRecipient of an archived Post, moved with it."""
+
+    id = models.BigIntegerField(primary_key=True)
+    post = models.ForeignKey(
+        PostArchive, on_delete=models.CASCADE, related_name="deliveries")
+    email = models.EmailField()
+    status = models.CharField(
+        max_length=10, choices=PostRecipient.STATUS_CHOICES)
+    error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = (
+            "id",
+        )
+        verbose_name = "archived mail recipient"
+        verbose_name_plural = "archived mail recipients"
+
+    def __str__(self) -> str:
+        return f"{self.email}: {self.status}"
+
+
+class DeliveryAttemptArchive(models.Model):
+    """A DeliveryAttempt of an archived Post, moved with it."""
+
+    id = models.BigIntegerField(primary_key=True)
+    post = models.ForeignKey(
+        PostArchive, on_delete=models.CASCADE,
+        related_name="delivery_attempts")
+    number = models.PositiveSmallIntegerField()
+    started_at = models.DateTimeField()
+    duration_ms = models.PositiveIntegerField()
+    succeeded = models.BooleanField(default=False)
+    transient = models.BooleanField(default=False)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = (
+            "post",
+            "number",
+        )
+        verbose_name = "archived delivery attempt"
+        verbose_name_plural = "archived delivery attempts"
+
+    def __str__(self) -> str:
+        result = "ok" if self.succeeded else self.error
+        return f"Post {self.post_id} #{self.number}: {result}"
+
+
+class DeadLetterArchive(models.Model):
+    """The DeadLetter of an archived Post, moved with it. Archived Posts
+    are not replayed."""
+
+    id = models.BigIntegerField(primary_key=True)
+    post = models.OneToOneField(
+        PostArchive, on_delete=models.CASCADE, related_name="dead_letter")
+    attempts = models.PositiveSmallIntegerField()
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField()
+
+    class Meta:
+        ordering = (
+            "-id",
+        )
+        verbose_name = "archived dead letter"
+        verbose_name_plural = "archived dead letters"
+
+    def __str__(self) -> str:
+        return f"Post {self.post_id} after {self.attempts} attempts"
+
+
+class EmailArchive(models.Model):
+    """An Email older than MAIL_ARCHIVE_AFTER_DAYS, moved out of the hot
+    table. Same ids and field names, so EmailQuerySet works on it."""
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="archived_emails")
+    sender = models.ForeignKey(
+        CustomUser, on_delete=models.PROTECT,
+        related_name="archived_emails_sent")
+    recipients = models.ManyToManyField(
+        CustomUser, related_name="archived_emails_received")
+    # as wide as main_email.subject in the database, see migration 0001
+    subject = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    timestamp = models.DateTimeField()
+    attachment = models.FileField(
+        upload_to="email_attachments/", storage=get_attachment_storage,
+        max_length=255, blank=True, null=True)
+    # name the file was uploaded with, the stored name is its hash
+    attachment_name = models.CharField(max_length=255, blank=True)
+    deleted_by = models.ManyToManyField(
+        CustomUser, blank=True, related_name="deleted_archived_emails")
+    archived_at = models.DateTimeField(auto_now_add=True)
+    # maintained by a database trigger, see migration 0009
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = EmailQuerySet.as_manager()
+
+    class Meta:
+        ordering = (
+            "-id",
+        )
+        indexes = (
+            models.Index(
+                fields=("sender", "-timestamp", "-id"),
+                name="main_emailarchive_sender_idx"
+            ),
+        )
+        verbose_name = "archived internal_mail"
+        verbose_name_plural = "archived internal_mails"
+
+    def __str__(self) -> str:
+        return f"Sender: {self.sender}, Subject: {self.subject}"
+
+
+class SearchTokenArchive(models.Model):
+    """A SearchToken of an archived Email, moved with it, so archived
+    bodies stay searchable."""
+
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE,
+        related_name="archived_search_tokens")
+    email = models.ForeignKey(
+        EmailArchive, on_delete=models.CASCADE, related_name="search_tokens")
+    digest = models.CharField(max_length=32)
+
+    objects = SearchTokenQuerySet.as_manager()
+
+    class Meta:
+        ordering = (
+            "-id",
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=("user", "digest", "email"),
+                name="main_searchtokenarchive_unique"
+            ),
+        )
+        verbose_name = "archived search token"
+        verbose_name_plural = "archived search tokens"
+
+    def __str__(self) -> str:
+        return f"{self.user_id}: {self.email_id}"
+
+
+def get_export_path(instance, filename):
+    # unguessable, the file is only served through ExportJobDownloadView
+    return f"exports/{uuid.uuid4().hex}/{filename}"
+
+
+class ExportJob(models.Model):
+    """Mail export built in the background, see main.exports."""
+
+    KIND_INBOX = 'inbox'
+    KIND_OUTBOX = 'outbox'
+    KIND_POSTS = 'posts'
+    KIND_CHOICES = (
+        (KIND_INBOX, 'Inbox'),
+        (KIND_OUTBOX, 'Outbox'),
+        (KIND_POSTS, 'External outbox'),
+    )
+    FORMAT_CHOICES = (
+        ('xlsx', 'Excel'),
+        ('csv', 'CSV'),
+        ('ndjson', 'NDJSON'),
+    )
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="export_jobs")
+    kind = models.CharField(max_length=6, choices=KIND_CHOICES)
+    file_format = models.CharField(max_length=6, choices=FORMAT_CHOICES)
+    status = models.CharField(
+        max_length=7,
+        choices=STATUS_CHOICES,
+        default=STATUS_QUEUED
+    )
+    # rows written so far, of `total` counted when the job starts
+    rows = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    file = models.FileField(
+        upload_to=get_export_path, max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    # last sign of life of the worker writing it, stale jobs are failed
+    # or dispatched again, see main.exports.requeue_stale_exports
+    heartbeat = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    # the file is deleted after this, see main.exports.purge_expired_exports
+    expires = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = (
+            "-id",
+        )
+        indexes = (
+            models.Index(
+                fields=("expires",),
+                name="main_exportjob_expires_idx"
+            ),
+        )
+        verbose_name = "export job"
+        verbose_name_plural = "export jobs"
+
+    def __str__(self) -> str:
+        return f"{self.get_kind_display()} export of {self.user}"
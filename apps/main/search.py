@@ -0,0 +1,164 @@
+# Python
+import hashlib
+import hmac
+import json
+import re
+from typing import Iterable
+
+# Django
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank
+)
+from django.db import connections
+from django.db.models import (
+    F,
+    FloatField,
+    Q,
+    QuerySet
+)
+from django.db.models.functions import (
+    Cast,
+    Upper
+)
+
+# Local
+from auths.models import CustomUser
+
+# Must match the configuration the search_vector triggers use
+# (main/migrations/0009_search_vector.py). 'simple' does not stem, mail
+# here is written in more than one language.
+SEARCH_CONFIG = 'simple'
+
+_PREFIX_TERM = re.compile(r'(\w+)\*')
+_WORD = re.compile(r'\w+')
+# longer words are indexed and searched by their first characters
+MAX_WORD_LENGTH = 32
+
+
+def build_search_query(keyword: str) -> SearchQuery | None:
+    """tsquery for a search box input.
+
+    Web search syntax ("exact phrase", or, -excluded) plus prefix terms
+    written with a trailing star: `meet*` matches meeting, meetings.
+    """
+    prefixes = _PREFIX_TERM.findall(keyword)
+    rest = _PREFIX_TERM.sub(' ', keyword).strip()
+
+    query = None
+    if rest:
+        query = SearchQuery(
+            rest, config=SEARCH_CONFIG, search_type='websearch'
+        )
+    if prefixes:
+        # \w only, nothing that could break out of the raw syntax
+        prefix_query = SearchQuery(
+            ' & '.join(f'{term}:*' for term in prefixes),
+            config=SEARCH_CONFIG,
+            search_type='raw'
+        )
+        query = prefix_query if query is None else query & prefix_query
+    return query
+
+
+def full_text_search(
+    queryset: QuerySet,
+    keyword: str,
+    fallback_fields: tuple[str, ...],
+    extra: Q | None = None
+) -> QuerySet:
+    """Rows matching `keyword`, best match first.
+
+    Uses the maintained search_vector column and its GIN index on
+    PostgreSQL, icontains over `fallback_fields` elsewhere (SQLite in
+    local tests). Rows matching `extra` are returned as well.
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        keyword = _PREFIX_TERM.sub(r'\1', keyword).replace('"', '').strip()
+        condition = Q()
+        for field in fallback_fields:
+            condition |= Q(**{f'{field}__icontains': keyword})
+        if extra is not None:
+            condition |= extra
+        return queryset.filter(condition)
+
+    query = build_search_query(keyword)
+    if query is None:
+        return queryset.filter(extra) if extra is not None else queryset.none()
+    condition = Q(search_vector=query)
+    if extra is not None:
+        condition |= extra
+    # ts_rank() is a real, as double precision it survives the round
+    # trip through a keyset pagination cursor exactly
+    return queryset.filter(condition).annotate(
+        rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+    ).order_by('-rank', '-timestamp', '-id')
+
+
+def count_results(queryset: QuerySet, cap: int) -> tuple[int, bool]:
+    """Number of rows of `queryset` and whether it is exact.
+
+    Counts at most `cap` + 1 rows. Past `cap` it returns the planner's
+    row estimate on PostgreSQL, `cap` elsewhere, so a broad search costs
+    no more than a narrow one to count.
+    """
+    queryset = queryset.order_by().values('pk')
+    counted = queryset[:cap + 1].count()
+    if counted <= cap:
+        return counted, True
+    if connections[queryset.db].vendor == 'postgresql':
+        plan = json.loads(queryset.explain(format='json'))
+        return max(int(plan[0]['Plan']['Plan Rows']), counted), False
+    return cap, False
+
+
+def tokenize(text: str, limit: int | None = None) -> list[str]:
+    """Distinct lower-cased words of `text` in order of appearance,
+    one-character words left out."""
+    words = dict.fromkeys(
+        word[:MAX_WORD_LENGTH]
+        for word in _WORD.findall(text.casefold())
+        if len(word) > 1
+    )
+    return list(words)[:limit]
+
+
+def get_token_digests(user_id: int, words: Iterable[str]) -> list[str]:
+    """Blind index digests of `words` for one user.
+
+    HMAC-SHA256 under a key derived from MAIL_SEARCH_INDEX_KEY and the
+    user id, so the same word gives unrelated digests for different
+    users. Truncated to 128 bits.
+    """
+    user_key = hmac.new(
+        settings.MAIL_SEARCH_INDEX_KEY.encode(),
+        f'user:{user_id}'.encode(),
+        hashlib.sha256
+    ).digest()
+    return [
+        hmac.new(user_key, word.encode(), hashlib.sha256).hexdigest()[:32]
+        for word in words
+    ]
+
+
+def autocomplete_recipients(prefix: str, limit: int) -> list[dict]:
+    """Active users whose address starts with `prefix`, at most `limit`.
+
+    Served by the UPPER(email) prefix index (auths migration 0002) and
+    cached for MAIL_AUTOCOMPLETE_TIMEOUT seconds, the same prefixes
+    come back with every keystroke of every user.
+    """
+    prefix = prefix.strip().casefold()
+    digest = hashlib.md5(prefix.encode()).hexdigest()
+    key = f'mail:autocomplete:{limit}:{digest}'
+    results = cache.get(key)
+    if results is None:
+        results = list(
+            CustomUser.objects.filter(
+                is_active=True, email__istartswith=prefix
+            ).order_by(Upper('email')).values('id', 'email')[:limit]
+        )
+        cache.set(key, results, settings.MAIL_AUTOCOMPLETE_TIMEOUT)
+    return results
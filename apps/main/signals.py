@@ -0,0 +1,145 @@
+# Python
+import os
+
+# Django
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_save
+)
+from django.dispatch import receiver
+
+# Local
+from .models import (
+    Post,
+    Email,
+    MailboxEntry,
+    PostArchive,
+    EmailArchive,
+    SearchToken
+)
+from .storage import attachment_storage
+from .cache import (
+    body_cache,
+    search_cache
+)
+from .counters import (
+    entry_deltas,
+    mailbox_counters
+)
+from .indexing import index_email
+
+
+def get_upload_name(file) -> str | None:
+    """Name of a file being uploaded, before storage replaces it with
+    the blob name; None when the file is not new."""
+    if file and not file._committed:
+        return os.path.basename(file.name)
+    return None
+
+
+@receiver(pre_save, sender=Post)
+def post_pre_save_receiver(sender, instance: Post, **kwargs):
+    name = get_upload_name(instance.file)
+    if name:
+        instance.file_name = name
+
+
+@receiver(pre_save, sender=Email)
+def email_pre_save_receiver(sender, instance: Email, **kwargs):
+    name = get_upload_name(instance.attachment)
+    if name:
+        instance.attachment_name = name
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted_receiver(sender, instance: Post, **kwargs):
+    if instance.file:
+        attachment_storage.release(instance.file.name)
+
+
+@receiver(post_delete, sender=Email)
+def email_deleted_receiver(sender, instance: Email, **kwargs):
+    body_cache.delete(instance.id)
+    if instance.attachment:
+        attachment_storage.release(instance.attachment.name)
+
+
+@receiver(post_delete, sender=PostArchive)
+def post_archive_deleted_receiver(sender, instance: PostArchive, **kwargs):
+    if instance.file:
+        attachment_storage.release(instance.file.name)
+
+
+@receiver(post_delete, sender=EmailArchive)
+def email_archive_deleted_receiver(
+    sender, instance: EmailArchive, **kwargs
+):
+    if instance.attachment:
+        attachment_storage.release(instance.attachment.name)
+
+
+@receiver(post_save, sender=Email)
+def email_saved_receiver(sender, instance: Email, created, **kwargs):
+    if not created:
+        return
+    MailboxEntry.objects.create(
+        user_id=instance.sender_id,
+        email=instance,
+        folder=MailboxEntry.FOLDER_OUTBOX,
+        is_read=True,
+        timestamp=instance.timestamp
+    )
+    mailbox_counters.apply_on_commit(entry_deltas(
+        [(instance.sender_id, MailboxEntry.FOLDER_OUTBOX, True)]
+    ))
+    search_cache.bump_on_commit([instance.sender_id])
+    index_email(instance, [instance.sender_id])
+
+
+@receiver(post_delete, sender=MailboxEntry)
+def mailbox_entry_deleted_receiver(
+    sender, instance: MailboxEntry, **kwargs
+):
+    search_cache.bump_on_commit([instance.user_id])
+    if instance.is_deleted:
+        return
+    mailbox_counters.apply_on_commit(entry_deltas(
+        [(instance.user_id, instance.folder, instance.is_read)], sign=-1
+    ))
+
+
+@receiver(m2m_changed, sender=Email.recipients.through)
+def email_recipients_changed_receiver(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    # Keeps the mailbox table and counters in step however recipients
+    # get set (EmailView, admin, shell).
+    if reverse:
+        return
+    if action == 'post_add':
+        MailboxEntry.objects.fan_out(instance, pk_set)
+        mailbox_counters.apply_on_commit(entry_deltas(
+            (user_id, MailboxEntry.FOLDER_INBOX, False)
+            for user_id in pk_set
+        ))
+        index_email(instance, pk_set)
+        search_cache.bump_on_commit(pk_set)
+    elif action == 'post_remove':
+        MailboxEntry.objects.filter(
+            email=instance,
+            folder=MailboxEntry.FOLDER_INBOX,
+            user_id__in=pk_set
+        ).delete()
+        SearchToken.objects.filter(
+            email=instance, user_id__in=pk_set
+        ).exclude(user_id=instance.sender_id).delete()
+    elif action == 'post_clear':
+        MailboxEntry.objects.filter(
+            email=instance,
+            folder=MailboxEntry.FOLDER_INBOX
+        ).delete()
+        SearchToken.objects.filter(
+            email=instance
+        ).exclude(user_id=instance.sender_id).delete()
@@ -0,0 +1,68 @@
+// Recipient picker of the compose form (main.forms.RecipientAutocompleteWidget).
+// Typing in the box above the select asks the autocomplete endpoint for
+// matching users, picking one adds it to the select as a selected option.
+document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('select[data-autocomplete-url]').forEach(function (select) {
+        var url = select.dataset.autocompleteUrl;
+        var minLength = parseInt(select.dataset.autocompleteMinLength, 10) || 1;
+        var input = document.createElement('input');
+        var list = document.createElement('ul');
+        var timer = null;
+        var request = 0;
+
+        input.type = 'text';
+        input.placeholder = 'Type an address';
+        input.autocomplete = 'off';
+        list.className = 'autocomplete-results';
+        select.parentNode.insertBefore(input, select);
+        select.parentNode.insertBefore(list, select);
+
+        function addRecipient(user) {
+            var option = select.querySelector('option[value="' + user.id + '"]');
+            if (!option) {
+                option = new Option(user.email, user.id);
+                select.add(option);
+            }
+            option.selected = true;
+            list.innerHTML = '';
+            input.value = '';
+        }
+
+        function show(results) {
+            list.innerHTML = '';
+            results.forEach(function (user) {
+                var item = document.createElement('li');
+                item.textContent = user.email;
+                item.addEventListener('mousedown', function (event) {
+                    event.preventDefault();
+                    addRecipient(user);
+                });
+                list.appendChild(item);
+            });
+        }
+
+        input.addEventListener('input', function () {
+            clearTimeout(timer);
+            var prefix = input.value.trim();
+            if (prefix.length < minLength) {
+                list.innerHTML = '';
+                return;
+            }
+            // wait for a pause in typing, ignore answers to older prefixes
+            timer = setTimeout(function () {
+                var current = ++request;
+                fetch(url + '?q=' + encodeURIComponent(prefix), {credentials: 'same-origin'})
+                    .then(function (response) { return response.json(); })
+                    .then(function (data) {
+                        if (current === request) {
+                            show(data.results);
+                        }
+                    });
+            }, 200);
+        });
+
+        input.addEventListener('blur', function () {
+            list.innerHTML = '';
+        });
+    });
+});
@@ -0,0 +1,172 @@
+# Python
+import hashlib
+import os
+import posixpath
+from collections import Counter
+from datetime import timedelta
+from typing import (
+    Any,
+    Iterable
+)
+
+# Django
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import (
+    IntegrityError,
+    transaction
+)
+from django.db.models import F
+from django.utils import timezone
+
+BLOB_DIR = 'blobs'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Deduplicating storage for mail attachments.
+
+    Files are keyed by the SHA-256 of their content and stored once as
+    blobs/<2 hex>/<sha256>, whatever `upload_to` the field asks for. The
+    uploaded filename is not part of it, rows keep their own in
+    Post.file_name / Email.attachment_name. Every save of an existing
+    blob only increments AttachmentBlob.ref_count and returns the stored
+    name; release() decrements it and removes the file once nobody
+    references it. Files of blobs whose row was rolled back are removed
+    by sweep_orphan_blobs().
+    """
+
+    def save(
+        self,
+        name: str | None,
+        content: Any,
+        max_length: int | None = None
+    ) -> str:
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in content.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+        sha256 = digest.hexdigest()
+
+        if self._acquire(sha256):
+            return self._blob_name(sha256)
+
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        blob_name = super()._save(self.get_blob_name(sha256), content)
+        Blob = apps.get_model('main', 'AttachmentBlob')
+        try:
+            with transaction.atomic():
+                Blob.objects.create(
+                    sha256=sha256,
+                    name=blob_name,
+                    size=size,
+                    ref_count=1
+                )
+        except IntegrityError:
+            # A concurrent upload of the same content won the race.
+            super().delete(blob_name)
+            self._acquire(sha256)
+            return self._blob_name(sha256)
+        return blob_name
+
+    def get_blob_name(self, sha256: str) -> str:
+        return posixpath.join(BLOB_DIR, sha256[:2], sha256)
+
+    def release(self, name: str) -> None:
+        """Drop one reference to `name`, delete the blob at zero."""
+        if not name:
+            return
+        Blob = apps.get_model('main', 'AttachmentBlob')
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                # Saved before deduplication, left as it always was.
+                return
+            if blob.ref_count > 1:
+                Blob.objects.filter(pk=blob.pk).update(
+                    ref_count=F('ref_count') - 1
+                )
+                return
+            blob.delete()
+        transaction.on_commit(lambda: self.delete(name))
+
+    def retain(self, names: Iterable[str]) -> None:
+        """Add one reference per occurrence of each name in `names`,
+        for rows copied elsewhere before the original is deleted."""
+        Blob = apps.get_model('main', 'AttachmentBlob')
+        for name, count in Counter(name for name in names if name).items():
+            Blob.objects.filter(name=name).update(
+                ref_count=F('ref_count') + count
+            )
+
+    def delete(self, name: str) -> None:
+        super().delete(name)
+        # Remove the now empty directory, of blobs stored under a
+        # per-blob directory before names were hash only.
+        if posixpath.dirname(name).count('/') > 1:
+            try:
+                os.rmdir(os.path.dirname(self.path(name)))
+            except OSError:
+                pass
+
+    def iter_blob_files(self) -> Iterable[str]:
+        """Names of every file under BLOB_DIR."""
+        if not self.exists(BLOB_DIR):
+            return
+        stack = [BLOB_DIR]
+        while stack:
+            directory = stack.pop()
+            directories, files = self.listdir(directory)
+            stack.extend(posixpath.join(directory, d) for d in directories)
+            for filename in files:
+                yield posixpath.join(directory, filename)
+
+    def sweep_orphan_blobs(self, min_age: int | None = None) -> int:
+        """Delete blob files without an AttachmentBlob row.
+
+        save() writes the file before the row, in the caller's
+        transaction; when that rolls back the file stays behind. Files
+        younger than `min_age` seconds (MAIL_BLOB_ORPHAN_MIN_AGE) are
+        kept, their transaction may still be open.
+        """
+        min_age = (
+            settings.MAIL_BLOB_ORPHAN_MIN_AGE if min_age is None else min_age
+        )
+        cutoff = timezone.now() - timedelta(seconds=min_age)
+        Blob = apps.get_model('main', 'AttachmentBlob')
+        swept = 0
+        for name in self.iter_blob_files():
+            if self.get_modified_time(name) > cutoff:
+                continue
+            if Blob.objects.filter(name=name).exists():
+                continue
+            self.delete(name)
+            swept += 1
+        return swept
+
+    def _acquire(self, sha256: str) -> bool:
+        Blob = apps.get_model('main', 'AttachmentBlob')
+        return bool(
+            Blob.objects.filter(sha256=sha256).update(
+                ref_count=F('ref_count') + 1
+            )
+        )
+
+    def _blob_name(self, sha256: str) -> str:
+        Blob = apps.get_model('main', 'AttachmentBlob')
+        return Blob.objects.values_list('name', flat=True).get(sha256=sha256)
+
+
+attachment_storage = ContentAddressedStorage()
+
+
+def get_attachment_storage() -> ContentAddressedStorage:
+    return attachment_storage
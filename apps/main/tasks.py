@@ -0,0 +1,83 @@
+# Third party
+from celery import shared_task
+
+# Local
+from abstracts.utils import dispatch_task
+from . import (
+    archive,
+    campaigns,
+    deletion,
+    delivery,
+    exports
+)
+from .counters import mailbox_counters
+from .storage import attachment_storage
+
+
+@shared_task(name='main.deliver_post')
+def deliver_post(post_id: int) -> str | None:
+    return delivery.deliver_post(
+        post_id,
+        retry=lambda countdown: dispatch_task(
+            deliver_post, post_id, countdown=countdown
+        )
+    )
+
+
+@shared_task(name='main.requeue_stale_deliveries')
+def requeue_stale_deliveries() -> list[int]:
+    post_ids = delivery.requeue_stale_deliveries()
+    for post_id in post_ids:
+        dispatch_task(deliver_post, post_id)
+    return post_ids
+
+
+@shared_task(name='main.send_campaign')
+def send_campaign(post_id: int) -> dict[str, int]:
+    return campaigns.send_campaign(post_id)
+
+
+@shared_task(name='main.resume_stale_campaigns')
+def resume_stale_campaigns() -> list[int]:
+    post_ids = campaigns.resume_stale_campaigns()
+    for post_id in post_ids:
+        dispatch_task(send_campaign, post_id)
+    return post_ids
+
+
+@shared_task(name='main.reconcile_mailbox_counters')
+def reconcile_mailbox_counters() -> int:
+    return mailbox_counters.reconcile()
+
+
+@shared_task(name='main.purge_deleted_emails')
+def purge_deleted_emails() -> int:
+    return deletion.purge_deleted_emails()
+
+
+@shared_task(name='main.archive_old_mail')
+def archive_old_mail() -> dict[str, int]:
+    return archive.archive_old_mail()
+
+
+@shared_task(name='main.export_mail')
+def export_mail(job_id: int) -> dict:
+    return exports.run_export_job(job_id)
+
+
+@shared_task(name='main.requeue_stale_exports')
+def requeue_stale_exports() -> list[int]:
+    job_ids = exports.requeue_stale_exports()
+    for job_id in job_ids:
+        dispatch_task(export_mail, job_id)
+    return job_ids
+
+
+@shared_task(name='main.purge_expired_exports')
+def purge_expired_exports() -> int:
+    return exports.purge_expired_exports()
+
+
+@shared_task(name='main.sweep_orphan_blobs')
+def sweep_orphan_blobs() -> int:
+    return attachment_storage.sweep_orphan_blobs()
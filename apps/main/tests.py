@@ -1,3 +1,1247 @@
-from django.test import TestCase
+# Python
+import csv
+import io
+import json
+import os
+import shutil
+import smtplib
+import socket
+import tempfile
+from datetime import timedelta
+from email import message_from_bytes
+from unittest import (
+    mock,
+    skipIf,
+    skipUnless
+)
 
-# Create your tests here.
+# Django
+from django.core.files.base import ContentFile
+from django.core.mail import EmailMessage
+from django.db import connection
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    override_settings
+)
+from django.utils import timezone
+
+# Third party
+import openpyxl
+from aiosmtpd.controller import Controller
+from django_redis import get_redis_connection
+from fakeredis import FakeConnection
+
+# Local
+from abstracts.mixins import QueryBudgetExceeded
+from abstracts.paginators import (
+    CursorPaginator,
+    IdListPaginator
+)
+from auths.models import CustomUser
+from main import backends
+from main.archive import archive_posts
+from main.backends import (
+    PooledEmailBackend,
+    SMTPPoolTimeout
+)
+from main.cache import search_cache
+from main.campaigns import (
+    create_campaign,
+    resume_stale_campaigns,
+    send_campaign
+)
+from main.codecs import (
+    BaseCipher,
+    CaesarCipher,
+    get_cipher
+)
+from main.counters import (
+    FIELDS,
+    mailbox_counters
+)
+from main.deletion import (
+    purge_deleted_emails,
+    soft_delete
+)
+from main.delivery import (
+    build_post_message,
+    deliver_post,
+    get_retry_delay,
+    replay_dead_letters,
+    requeue_stale_deliveries
+)
+from main.exports import (
+    Export,
+    post_export,
+    purge_expired_exports,
+    requeue_stale_exports,
+    run_export_job
+)
+from main.models import (
+    AttachmentBlob,
+    DeadLetter,
+    DeliveryAttempt,
+    Email,
+    ExportJob,
+    Post,
+    PostArchive,
+    PostRecipient
+)
+from main.search import full_text_search
+from main.storage import attachment_storage
+from main.views import InboxMessagesView
+
+
+def fake_redis_cache(db):
+    return {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': f'redis://fake-redis:6379/{db}',
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'CONNECTION_POOL_KWARGS': {'connection_class': FakeConnection},
+        }
+    }
+
+
+# Every alias on an in-memory Redis server: the search cache, mailbox
+# counters and bodies work as in production, nothing reaches a real
+# server and no server is needed.
+TEST_CACHES = {
+    'default': fake_redis_cache(0),
+    'mail_bodies': fake_redis_cache(1),
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class MailTestCase(TestCase):
+    """TestCase on the fake Redis, emptied before every test."""
+
+    def setUp(self):
+        super().setUp()
+        get_redis_connection().flushall()
+
+
+def send_email(sender, recipients, subject='Subject', body='Body'):
+    """Internal mail as EmailView stores it, the signals add the
+    mailbox entries and search tokens."""
+    email = Email.objects.create(
+        user=sender,
+        sender=sender,
+        subject=subject,
+        body=get_cipher().encrypt(body)
+    )
+    email.recipients.add(*recipients)
+    return email
+
+
+def create_post(sender, **kwargs):
+    fields = {
+        'recipient': 'someone@example.com',
+        'subject': 'Subject',
+        'message': 'Message',
+    }
+    fields.update(kwargs)
+    return Post.objects.create(sender=sender, **fields)
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@override_settings(QUERY_BUDGET_ENFORCE=True)
+class QueryBudgetTests(MailTestCase):
+    """Listing and search pages stay within their query budgets
+    whatever the number of messages on the page."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = CustomUser.objects.create_user(
+            'alice@example.com', 'password')
+        cls.bob = CustomUser.objects.create_user(
+            'bob@example.com', 'password')
+        for number in range(12):
+            send_email(
+                cls.alice, [cls.bob],
+                subject=f'Report {number}',
+                body=f'quarterly numbers {number}'
+            )
+
+    def test_inbox(self):
+        self.client.force_login(self.bob)
+        response = self.client.get('/inbox/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['inbox_messages']), 5)
+
+        response = self.client.get(
+            '/inbox/',
+            {'cursor': response.context['inbox_messages'].next_cursor}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_outbox(self):
+        self.client.force_login(self.alice)
+        response = self.client.get('/outbox/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'quarterly numbers 11')
+
+    def test_search(self):
+        self.client.force_login(self.alice)
+        for _ in range(2):
+            # a miss, then a hit of the search result cache
+            response = self.client.get(
+                '/inbox_search/', {'keyword': 'quarterly'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['results_count'], 12)
+
+    def test_budget_overrun_fails(self):
+        self.client.force_login(self.bob)
+        with mock.patch.object(InboxMessagesView, 'query_budget', 2):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/inbox/')
+
+    @override_settings(QUERY_BUDGET_ENFORCE=False)
+    def test_budget_not_enforced_when_off(self):
+        self.client.force_login(self.bob)
+        with mock.patch.object(InboxMessagesView, 'query_budget', 2):
+            response = self.client.get('/inbox/')
+        self.assertEqual(response.status_code, 200)
+
+
+class PostViewTests(MailTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            'sender@example.com', 'password')
+
+    def test_lost_dispatch_still_shows_success(self):
+        self.client.force_login(self.user)
+        with mock.patch(
+            'abstracts.utils.dispatch_task',
+            side_effect=ConnectionError('broker down')
+        ), self.assertLogs('abstracts.utils', 'ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/mail/', {
+                    'recipient': 'someone@example.com',
+                    'additional_recipient': '',
+                    'subject': 'Subject',
+                    'message': '<b>Hello</b>',
+                })
+
+        self.assertTemplateUsed(response, 'main/success_mail.html')
+        post = Post.objects.get()
+        self.assertEqual(post.status, Post.STATUS_QUEUED)
+        self.assertEqual(post.message, 'Hello')
+
+
+class RecordingHandler:
+    """aiosmtpd handler keeping the messages it accepted, refusing
+    recipients whose address starts with 'bad'."""
+
+    def __init__(self):
+        self.messages = []
+        self.recipients = []
+
+    async def handle_RCPT(
+        self, server, session, envelope, address, rcpt_options
+    ):
+        if address.startswith('bad'):
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope.content)
+        self.recipients.append(envelope.rcpt_tos)
+        return '250 OK'
+
+
+class SMTPServerMixin:
+    """A local SMTP server per test, its connection pools closed after."""
+
+    def setUp(self):
+        super().setUp()
+        self.handler = RecordingHandler()
+        self.port = get_free_port()
+        self.server = Controller(
+            self.handler, hostname='127.0.0.1', port=self.port)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+    def tearDown(self):
+        with backends._pools_lock:
+            pools = [
+                backends._pools.pop(key) for key in list(backends._pools)
+                if key[1] == self.port
+            ]
+        for pool in pools:
+            pool.close_all()
+        super().tearDown()
+
+
+class PooledEmailBackendTests(SMTPServerMixin, SimpleTestCase):
+    """PooledEmailBackend against a local SMTP server."""
+
+    def get_backend(self):
+        return PooledEmailBackend(
+            host='127.0.0.1',
+            port=self.port,
+            username='',
+            password='',
+            use_tls=False
+        )
+
+    def get_message(self, to='to@example.com'):
+        return EmailMessage(
+            'Subject', 'Body', 'from@example.com', [to])
+
+    def get_metrics(self):
+        return backends.get_pool_metrics()[f'@127.0.0.1:{self.port}']
+
+    def test_connection_is_reused(self):
+        for _ in range(3):
+            self.get_backend().send_messages([self.get_message()])
+
+        self.assertEqual(len(self.handler.messages), 3)
+        metrics = self.get_metrics()
+        self.assertEqual(metrics['created'], 1)
+        self.assertEqual(metrics['reused'], 2)
+        self.assertEqual(metrics['idle'], 1)
+        self.assertEqual(metrics['in_use'], 0)
+
+    def test_send_stream(self):
+        backend = self.get_backend()
+        backend.open()
+        try:
+            refused = backend.send_stream(
+                'from@example.com',
+                ['to@example.com', 'bad@example.com'],
+                [b'Subject: Streamed\r\n\r\n', b'Line\r\n..dotted\r\n']
+            )
+        finally:
+            backend.close()
+
+        self.assertEqual(list(refused), ['bad@example.com'])
+        self.assertIn(b'.dotted', self.handler.messages[0])
+        self.assertEqual(self.get_metrics()['discarded'], 0)
+
+    def test_refused_recipients_keep_connection(self):
+        backend = self.get_backend()
+        backend.open()
+        try:
+            with self.assertRaises(smtplib.SMTPRecipientsRefused):
+                backend.send_stream(
+                    'from@example.com', ['bad@example.com'], [b'\r\n'])
+        finally:
+            backend.close()
+
+        metrics = self.get_metrics()
+        self.assertEqual(metrics['discarded'], 0)
+        self.assertEqual(metrics['idle'], 1)
+
+    def test_failed_stream_discards_connection(self):
+        def chunks():
+            yield b'Subject: Broken\r\n\r\n'
+            raise ValueError('attachment unreadable')
+
+        backend = self.get_backend()
+        backend.open()
+        try:
+            with self.assertRaises(ValueError):
+                backend.send_stream(
+                    'from@example.com', ['to@example.com'], chunks())
+        finally:
+            backend.close()
+
+        metrics = self.get_metrics()
+        self.assertEqual(metrics['discarded'], 1)
+        self.assertEqual(metrics['idle'], 0)
+        self.assertEqual(self.handler.messages, [])
+
+        # the next send gets a fresh connection
+        self.get_backend().send_messages([self.get_message()])
+        self.assertEqual(len(self.handler.messages), 1)
+        self.assertEqual(self.get_metrics()['created'], 2)
+
+    @override_settings(EMAIL_POOL_SIZE=1, EMAIL_POOL_TIMEOUT=0.1)
+    def test_exhausted_pool_times_out(self):
+        holder = self.get_backend()
+        holder.open()
+        try:
+            with self.assertRaises(SMTPPoolTimeout):
+                self.get_backend().open()
+        finally:
+            holder.close()
+
+        self.assertEqual(self.get_metrics()['wait_timeouts'], 1)
+        self.assertTrue(self.get_backend().open())
+
+
+class CampaignTests(SMTPServerMixin, MailTestCase):
+    """Bulk sends through PooledEmailBackend."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root,
+            EMAIL_BACKEND='main.backends.PooledEmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.port,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+            EMAIL_USE_TLS=False,
+            EMAIL_USE_SSL=False
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = CustomUser.objects.create_user(
+            'bulk@example.com', 'password')
+
+    def test_attachment_is_streamed_per_recipient(self):
+        content = os.urandom(200 * 1024)
+        recipients = ['one@example.com', 'two@example.com']
+        post = create_campaign(
+            self.user, recipients, 'Report', 'See attached',
+            file=ContentFile(content, name='report.bin')
+        )
+
+        with mock.patch(
+            'main.campaigns.build_post_message', wraps=build_post_message
+        ) as build:
+            progress = send_campaign(post.id, rate=0)
+
+        self.assertEqual(progress['sent'], 2)
+        # the attachment was never read whole into a message
+        self.assertEqual(
+            [call.kwargs.get('with_attachment') for call in build.mock_calls],
+            [False]
+        )
+        self.assertEqual(
+            self.handler.recipients, [[address] for address in recipients])
+        for raw in self.handler.messages:
+            message = message_from_bytes(raw)
+            self.assertEqual(message['To'], 'undisclosed-recipients:;')
+            attachment = next(
+                part for part in message.walk()
+                if part.get_filename() == 'report.bin'
+            )
+            self.assertEqual(attachment.get_payload(decode=True), content)
+
+
+class CursorPaginatorTests(MailTestCase):
+    """Keyset pages over (timestamp, id): every row exactly once, in
+    order, forwards and backwards."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            'pages@example.com', 'password')
+        cls.posts = [create_post(cls.user) for _ in range(7)]
+        # rows 2 to 5 share a timestamp, only the id tells them apart
+        now = timezone.now()
+        for index, post in enumerate(cls.posts):
+            Post.objects.filter(id=post.id).update(
+                timestamp=now - timedelta(minutes=min(index, 2)))
+
+    def get_queryset(self):
+        return Post.objects.all()
+
+    def get_expected_ids(self):
+        return list(
+            self.get_queryset().order_by('-timestamp', '-id')
+            .values_list('id', flat=True)
+        )
+
+    def walk(self, paginator):
+        pages = [paginator.get_page(None)]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        return pages
+
+    def test_pages_cover_every_row_once(self):
+        pages = self.walk(CursorPaginator(self.get_queryset(), 3))
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(
+            [post.id for page in pages for post in page],
+            self.get_expected_ids()
+        )
+        self.assertFalse(pages[0].has_previous())
+        self.assertTrue(pages[-1].has_previous())
+
+    def test_exact_multiple_has_no_empty_last_page(self):
+        queryset = self.get_queryset().exclude(id=self.posts[-1].id)
+        pages = self.walk(CursorPaginator(queryset, 3))
+
+        self.assertEqual([len(page) for page in pages], [3, 3])
+        self.assertIsNone(pages[-1].next_cursor)
+
+    def test_previous_cursor_returns_the_previous_page(self):
+        paginator = CursorPaginator(self.get_queryset(), 3)
+        pages = self.walk(paginator)
+
+        for previous, page in zip(pages, pages[1:]):
+            back = paginator.get_page(page.previous_cursor)
+            self.assertEqual(
+                [post.id for post in back],
+                [post.id for post in previous]
+            )
+        first = paginator.get_page(pages[1].previous_cursor)
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+
+    def test_single_page(self):
+        page = CursorPaginator(self.get_queryset(), 7).get_page(None)
+
+        self.assertEqual(len(page), 7)
+        self.assertFalse(page.has_other_pages())
+
+    def test_empty_queryset(self):
+        page = CursorPaginator(Post.objects.none(), 3).get_page(None)
+
+        self.assertEqual(len(page), 0)
+        self.assertIsNone(page.next_cursor)
+        self.assertIsNone(page.previous_cursor)
+
+    def test_invalid_cursor_gives_first_page(self):
+        paginator = CursorPaginator(self.get_queryset(), 3)
+        first = [post.id for post in paginator.get_page(None)]
+
+        for cursor in ('', 'garbage', 'W10', 'WyJ4Il0'):
+            self.assertEqual(
+                [post.id for post in paginator.get_page(cursor)], first)
+
+    def test_id_list_pages(self):
+        ids = self.get_expected_ids()
+        paginator = IdListPaginator(ids, self.get_queryset(), 3)
+        pages = self.walk(paginator)
+
+        self.assertEqual(
+            [post.id for page in pages for post in page], ids)
+        back = paginator.get_page(pages[-1].previous_cursor)
+        self.assertEqual(
+            [post.id for post in back], [post.id for post in pages[1]])
+
+    def test_id_list_cursor_of_unknown_id_gives_first_page(self):
+        ids = self.get_expected_ids()
+        cursor = IdListPaginator(ids, self.get_queryset(), 3).encode_cursor(
+            ids[3], reverse=False)
+        paginator = IdListPaginator(ids[4:], self.get_queryset(), 3)
+
+        self.assertEqual(
+            [post.id for post in paginator.get_page(cursor)], ids[4:7])
+
+
+class CaesarCipherTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        for shift in (0, 3, 25, 26, 29, -3):
+            cipher = CaesarCipher(shift)
+            for text in (
+                'Hello, World!',
+                'xyz XYZ abc 0123456789',
+                'Привет, мир: naïve café ☕',
+                '',
+            ):
+                self.assertEqual(cipher.decrypt(cipher.encrypt(text)), text)
+
+    def test_shifts_ascii_letters_only(self):
+        cipher = CaesarCipher(3)
+
+        self.assertEqual(cipher.encrypt('abc xyz ABC XYZ'), 'def abc DEF ABC')
+        self.assertEqual(cipher.encrypt('1, 2. é!'), '1, 2. é!')
+
+    def test_decrypt_many(self):
+        cipher = CaesarCipher(7)
+        texts = ['first body', 'Second BODY', '']
+
+        self.assertEqual(
+            cipher.decrypt_many(cipher.encrypt(text) for text in texts),
+            texts
+        )
+
+    def test_base_cipher_is_abstract(self):
+        class EncryptOnly(BaseCipher):
+            def encrypt(self, plaintext):
+                return plaintext
+
+        with self.assertRaises(TypeError):
+            BaseCipher()
+        with self.assertRaises(TypeError):
+            EncryptOnly()
+
+    def test_get_cipher_follows_the_setting(self):
+        default = get_cipher()
+        with override_settings(MAIL_CIPHER={
+            'BACKEND': 'main.codecs.CaesarCipher',
+            'OPTIONS': {'shift': 1},
+        }):
+            self.assertEqual(get_cipher().encrypt('abc'), 'bcd')
+        self.assertEqual(get_cipher().shift, default.shift)
+
+
+class AttachmentStorageTests(MailTestCase):
+    """Attachments are stored once per content and removed with their
+    last reference."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            'files@example.com', 'password')
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def create_post(self, content, name):
+        return create_post(self.user, file=ContentFile(content, name=name))
+
+    def test_same_content_is_stored_once(self):
+        first = self.create_post(b'%PDF invoice', 'invoice.pdf')
+        second = self.create_post(b'%PDF invoice', 'copy of invoice.pdf')
+        other = self.create_post(b'%PDF receipt', 'receipt.pdf')
+
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertNotEqual(first.file.name, other.file.name)
+        self.assertTrue(first.file.name.startswith('blobs/'))
+        self.assertEqual(
+            AttachmentBlob.objects.get(name=first.file.name).ref_count, 2)
+        self.assertEqual(
+            AttachmentBlob.objects.get(name=other.file.name).ref_count, 1)
+        # each row keeps the name it was uploaded with
+        self.assertEqual(first.get_file_name(), 'invoice.pdf')
+        self.assertEqual(second.get_file_name(), 'copy of invoice.pdf')
+        self.assertEqual(len(list(attachment_storage.iter_blob_files())), 2)
+
+    def test_blob_is_deleted_with_its_last_reference(self):
+        first = self.create_post(b'shared', 'a.txt')
+        second = self.create_post(b'shared', 'b.txt')
+        name = first.file.name
+        path = attachment_storage.path(name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(AttachmentBlob.objects.get(name=name).ref_count, 1)
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(AttachmentBlob.objects.filter(name=name).exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_sweep_removes_files_without_a_row(self):
+        kept = self.create_post(b'kept', 'kept.txt')
+        orphan = attachment_storage.save(None, ContentFile(b'orphan', 'x'))
+        AttachmentBlob.objects.filter(name=orphan).delete()
+
+        # too young, its transaction could still be open
+        self.assertEqual(attachment_storage.sweep_orphan_blobs(), 0)
+        self.assertEqual(attachment_storage.sweep_orphan_blobs(min_age=0), 1)
+        self.assertFalse(attachment_storage.exists(orphan))
+        self.assertTrue(attachment_storage.exists(kept.file.name))
+
+
+@override_settings(
+    MAIL_RETRY_MAX_ATTEMPTS=3,
+    MAIL_RETRY_BASE_DELAY=30,
+    MAIL_RETRY_MAX_DELAY=3600
+)
+class DeliveryTests(MailTestCase):
+    """Retries of transient failures and the dead letter table."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            'delivery@example.com', 'password')
+
+    def setUp(self):
+        super().setUp()
+        self.post = create_post(self.user)
+        self.retry = mock.Mock()
+
+    def deliver(self, error=None):
+        return self.deliver_id(self.post.id, error)
+
+    def deliver_id(self, post_id, error=None):
+        with mock.patch('main.delivery.send_post', side_effect=error):
+            return deliver_post(post_id, retry=self.retry)
+
+    def test_success(self):
+        self.assertEqual(self.deliver(), Post.STATUS_SENT)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.status, Post.STATUS_SENT)
+        self.assertIsNotNone(self.post.sent_at)
+        self.assertTrue(self.post.delivery_attempts.get().succeeded)
+        self.retry.assert_not_called()
+
+    def test_claimed_post_is_not_sent_twice(self):
+        self.deliver()
+
+        self.assertIsNone(self.deliver())
+        self.assertEqual(self.post.delivery_attempts.count(), 1)
+
+    def test_transient_error_is_retried(self):
+        status = self.deliver(smtplib.SMTPServerDisconnected('gone'))
+
+        self.assertEqual(status, Post.STATUS_RETRYING)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.status, Post.STATUS_RETRYING)
+        attempt = self.post.delivery_attempts.get()
+        self.assertTrue(attempt.transient)
+        self.assertEqual(attempt.error, 'gone')
+        (countdown,), _ = self.retry.call_args
+        self.assertTrue(15 <= countdown <= 30)
+
+    def test_dead_letter_after_last_attempt(self):
+        error = smtplib.SMTPResponseException(451, b'Try again later')
+        statuses = [self.deliver(error) for _ in range(3)]
+
+        self.assertEqual(statuses, [
+            Post.STATUS_RETRYING, Post.STATUS_RETRYING, Post.STATUS_DEAD
+        ])
+        self.assertEqual(self.retry.call_count, 2)
+        dead_letter = DeadLetter.objects.get(post=self.post)
+        self.assertEqual(dead_letter.attempts, 3)
+        self.assertIn('Try again later', dead_letter.last_error)
+        self.assertEqual(
+            list(self.post.delivery_attempts.values_list(
+                'number', flat=True)),
+            [1, 2, 3]
+        )
+
+    def test_permanent_error_is_not_retried(self):
+        error = smtplib.SMTPRecipientsRefused(
+            {'someone@example.com': (550, b'No such user')})
+
+        self.assertEqual(self.deliver(error), Post.STATUS_DEAD)
+        self.retry.assert_not_called()
+        self.assertFalse(self.post.delivery_attempts.get().transient)
+        self.assertTrue(DeadLetter.objects.filter(post=self.post).exists())
+
+    def test_replay_dead_letters(self):
+        self.deliver(smtplib.SMTPDataError(554, b'Rejected'))
+
+        post_ids = replay_dead_letters(DeadLetter.objects.all())
+
+        self.assertEqual(post_ids, [self.post.id])
+        self.assertFalse(DeadLetter.objects.exists())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.status, Post.STATUS_QUEUED)
+        self.assertEqual(self.post.attempt_count, 0)
+        self.assertEqual(self.deliver(), Post.STATUS_SENT)
+
+    def test_retry_delay_is_capped(self):
+        for attempt in range(1, 20):
+            backoff = min(3600, 30 * 2 ** (attempt - 1))
+            delay = get_retry_delay(attempt)
+            self.assertGreaterEqual(delay, backoff / 2)
+            self.assertLessEqual(delay, backoff)
+
+    def test_stale_sending_posts_are_recovered(self):
+        stale = timezone.now() - timedelta(hours=1)
+        retried = create_post(
+            self.user, status=Post.STATUS_SENDING, attempt_count=1,
+            heartbeat=stale)
+        given_up = create_post(
+            self.user, status=Post.STATUS_SENDING, attempt_count=3,
+            heartbeat=stale)
+        running = create_post(
+            self.user, status=Post.STATUS_SENDING, attempt_count=1,
+            heartbeat=timezone.now())
+
+        self.assertEqual(requeue_stale_deliveries(stale_after=600), [
+            retried.id
+        ])
+        statuses = dict(Post.objects.filter(
+            id__in=[retried.id, given_up.id, running.id]
+        ).values_list('id', 'status'))
+        self.assertEqual(statuses, {
+            retried.id: Post.STATUS_RETRYING,
+            given_up.id: Post.STATUS_DEAD,
+            running.id: Post.STATUS_SENDING,
+        })
+        self.assertTrue(DeadLetter.objects.filter(post=given_up).exists())
+        self.assertEqual(
+            DeliveryAttempt.objects.filter(
+                post__in=[retried, given_up], transient=True
+            ).count(),
+            2
+        )
+
+    def test_lost_queued_posts_are_dispatched_again(self):
+        old = timezone.now() - timedelta(hours=1)
+        lost = create_post(self.user)
+        swept = create_post(self.user)
+        bulk = create_post(self.user)
+        PostRecipient.objects.create(post=bulk, email='bulk@example.com')
+        Post.objects.filter(id__in=[lost.id, bulk.id]).update(timestamp=old)
+        Post.objects.filter(id=swept.id).update(timestamp=old, heartbeat=old)
+
+        self.assertEqual(
+            sorted(requeue_stale_deliveries(stale_after=600)),
+            sorted([lost.id, swept.id])
+        )
+        # dispatched again, not before another stale_after
+        self.assertEqual(requeue_stale_deliveries(stale_after=600), [])
+        lost.refresh_from_db()
+        self.assertEqual(lost.status, Post.STATUS_QUEUED)
+        self.assertIsNotNone(lost.heartbeat)
+        self.assertEqual(lost.delivery_attempts.count(), 0)
+
+        # whoever runs first claims it, the other task is a no-op
+        self.assertEqual(self.deliver_id(lost.id), Post.STATUS_SENT)
+        self.assertIsNone(self.deliver_id(lost.id))
+
+    def test_lost_campaigns_are_resumed(self):
+        old = timezone.now() - timedelta(hours=1)
+        queued = create_post(self.user)
+        sending = create_post(self.user, status=Post.STATUS_SENDING)
+        fresh = create_post(self.user)
+        for post in (queued, sending, fresh):
+            PostRecipient.objects.create(post=post, email='bulk@example.com')
+        Post.objects.filter(id__in=[queued.id, sending.id]).update(
+            timestamp=old, heartbeat=old)
+
+        self.assertEqual(
+            sorted(resume_stale_campaigns(stale_after=600)),
+            sorted([queued.id, sending.id])
+        )
+        self.assertEqual(resume_stale_campaigns(stale_after=600), [])
+        sending.refresh_from_db()
+        self.assertEqual(sending.status, Post.STATUS_QUEUED)
+
+
+class ArchiveTests(MailTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            'archive@example.com', 'password')
+
+    def test_failed_post_keeps_its_diagnosis(self):
+        subject = 'Long subject ' * 19
+        post = create_post(
+            self.user, subject=subject, status=Post.STATUS_DEAD,
+            error='550 No such user', attempt_count=2)
+        DeadLetter.objects.create(
+            post=post, attempts=2, last_error='550 No such user')
+
+        moved = archive_posts(
+            timezone.now() + timedelta(seconds=1),
+            batch_size=10,
+            max_batches=1
+        )
+
+        self.assertEqual(moved, 1)
+        self.assertFalse(Post.objects.filter(id=post.id).exists())
+        archived = PostArchive.objects.get(id=post.id)
+        self.assertEqual(archived.subject, subject)
+        self.assertEqual(archived.error, '550 No such user')
+        self.assertEqual(archived.attempt_count, 2)
+        self.assertEqual(archived.dead_letter.attempts, 2)
+
+
+@override_settings(EXPORT_QUERY_CHUNK_SIZE=2, EXPORT_CHUNK_SIZE=64)
+class ExportFormatTests(MailTestCase):
+    """Every format holds the same rows, read and written in chunks."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            'formats@example.com', 'password')
+        cls.posts = [
+            create_post(
+                cls.user,
+                recipient=f'to{number}@example.com',
+                subject=f'Subject, "{number}"'
+            )
+            for number in range(3)
+        ]
+
+    def render(self, file_format):
+        progress = mock.Mock()
+        content = b''.join(post_export.render(
+            Post.objects.for_listing().order_by('id'),
+            file_format,
+            progress
+        ))
+        self.assertEqual(
+            progress.call_args_list, [mock.call(2), mock.call(3)])
+        return content
+
+    def test_csv(self):
+        rows = list(csv.reader(io.StringIO(self.render('csv').decode())))
+
+        self.assertEqual(rows[0], post_export.headers)
+        self.assertEqual(
+            [row[:4] for row in rows[1:]],
+            [
+                [post.recipient, '', self.user.email, post.subject]
+                for post in self.posts
+            ]
+        )
+
+    def test_ndjson(self):
+        rows = [
+            json.loads(line)
+            for line in self.render('ndjson').decode().splitlines()
+        ]
+
+        self.assertEqual(
+            [(row['recipient'], row['subject']) for row in rows],
+            [(post.recipient, post.subject) for post in self.posts]
+        )
+        self.assertEqual(
+            list(rows[0]),
+            [column.path for column in post_export.columns]
+        )
+
+    def test_xlsx(self):
+        workbook = openpyxl.load_workbook(io.BytesIO(self.render('xlsx')))
+        rows = list(workbook.active.iter_rows(values_only=True))
+
+        self.assertEqual(list(rows[0]), post_export.headers)
+        self.assertEqual(
+            [row[:4] for row in rows[1:]],
+            [
+                (post.recipient, None, self.user.email, post.subject)
+                for post in self.posts
+            ]
+        )
+
+
+class ExportJobTests(MailTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            'exports@example.com', 'password')
+        for number in range(3):
+            send_email(cls.user, [cls.user], subject=f'Export {number}')
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def create_job(self, **kwargs):
+        return ExportJob.objects.create(
+            user=self.user,
+            kind=ExportJob.KIND_OUTBOX,
+            file_format='csv',
+            **kwargs
+        )
+
+    def test_stale_jobs_are_failed_or_dispatched_again(self):
+        old = timezone.now() - timedelta(hours=1)
+        dead = self.create_job(status=ExportJob.STATUS_RUNNING)
+        running = self.create_job(status=ExportJob.STATUS_RUNNING)
+        lost = self.create_job()
+        waiting = self.create_job()
+        ExportJob.objects.filter(id=dead.id).update(heartbeat=old)
+        ExportJob.objects.filter(id=running.id).update(
+            heartbeat=timezone.now())
+        ExportJob.objects.filter(id__in=[dead.id, lost.id]).update(
+            created=old)
+
+        self.assertEqual(requeue_stale_exports(stale_after=600), [lost.id])
+        # dispatched again, not before another stale_after
+        self.assertEqual(requeue_stale_exports(stale_after=600), [])
+
+        dead.refresh_from_db()
+        self.assertEqual(dead.status, ExportJob.STATUS_FAILED)
+        self.assertTrue(dead.error)
+        self.assertIsNotNone(dead.expires)
+        statuses = dict(ExportJob.objects.filter(
+            id__in=[running.id, lost.id, waiting.id]
+        ).values_list('id', 'status'))
+        self.assertEqual(statuses, {
+            running.id: ExportJob.STATUS_RUNNING,
+            lost.id: ExportJob.STATUS_QUEUED,
+            waiting.id: ExportJob.STATUS_QUEUED,
+        })
+
+    def test_done_job_keeps_its_file_until_it_expires(self):
+        job = self.create_job()
+
+        self.assertEqual(
+            run_export_job(job.id),
+            {'status': ExportJob.STATUS_DONE, 'rows': 3, 'total': 3}
+        )
+        job.refresh_from_db()
+        self.assertTrue(job.file.name.endswith('outbox_messages.csv'))
+        self.assertEqual(job.file.read().decode().count('Export'), 3)
+        job.file.close()
+        self.assertGreater(job.expires, job.finished)
+        # claimed already, a duplicate task does nothing
+        with mock.patch.object(Export, 'render') as render:
+            run_export_job(job.id)
+        render.assert_not_called()
+
+        self.assertEqual(purge_expired_exports(), 0)
+        ExportJob.objects.filter(id=job.id).update(expires=timezone.now())
+        self.assertEqual(purge_expired_exports(), 1)
+        self.assertFalse(ExportJob.objects.exists())
+        self.assertFalse(job.file.storage.exists(job.file.name))
+
+    def test_failed_job_expires_without_a_file(self):
+        job = self.create_job()
+
+        with mock.patch.object(
+            Export, 'render', side_effect=OSError('No space left')
+        ), self.assertRaises(OSError):
+            run_export_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.STATUS_FAILED)
+        self.assertEqual(job.error, 'No space left')
+        self.assertFalse(job.file)
+        self.assertIsNotNone(job.expires)
+
+
+class MailboxCounterTests(MailTestCase):
+    """The counters follow every change of the mailbox entries without
+    being rebuilt from the database."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = CustomUser.objects.create_user(
+            'alice@example.com', 'password')
+        cls.bob = CustomUser.objects.create_user(
+            'bob@example.com', 'password')
+
+    def setUp(self):
+        super().setUp()
+        # built now, later reads only see the increments
+        for user in (self.alice, self.bob):
+            mailbox_counters.get(user.id)
+
+    def send(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return send_email(self.alice, [self.bob])
+
+    def assertCounters(self, user, **expected):
+        counters = mailbox_counters.get(user.id)
+        self.assertEqual(counters, {**dict.fromkeys(FIELDS, 0), **expected})
+        self.assertEqual(counters, mailbox_counters.count([user.id])[user.id])
+
+    def test_send(self):
+        self.send()
+        self.assertCounters(self.alice, outbox_total=1)
+        self.assertCounters(self.bob, inbox_total=1, inbox_unread=1)
+
+    def test_read(self):
+        self.send()
+        self.client.force_login(self.bob)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get('/inbox/')
+        self.assertCounters(self.bob, inbox_total=1)
+
+    def test_delete(self):
+        email = self.send()
+        with self.captureOnCommitCallbacks(execute=True):
+            soft_delete(self.bob, [email.id])
+        self.assertCounters(self.alice, outbox_total=1)
+        self.assertCounters(self.bob)
+
+    def test_purge(self):
+        email = self.send()
+        with self.captureOnCommitCallbacks(execute=True):
+            soft_delete(self.alice, [email.id])
+            soft_delete(self.bob, [email.id])
+            self.assertEqual(purge_deleted_emails(pause=0), 1)
+        self.assertCounters(self.alice)
+        self.assertCounters(self.bob)
+
+    def test_reconcile_fixes_drift(self):
+        self.send()
+        mailbox_counters.apply({(self.bob.id, 'inbox_total'): 5})
+
+        self.assertEqual(mailbox_counters.reconcile(), 1)
+        self.assertCounters(self.bob, inbox_total=1, inbox_unread=1)
+
+
+class DeletionTests(MailTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = CustomUser.objects.create_user(
+            'alice@example.com', 'password')
+        cls.bob = CustomUser.objects.create_user(
+            'bob@example.com', 'password')
+        cls.carol = CustomUser.objects.create_user(
+            'carol@example.com', 'password')
+
+    def test_soft_delete_is_per_user(self):
+        email = send_email(self.alice, [self.bob, self.carol])
+
+        self.assertEqual(soft_delete(self.bob, [email.id]), 1)
+        # deleted already, and mail of someone else
+        self.assertEqual(soft_delete(self.bob, [email.id]), 0)
+        other = send_email(self.alice, [self.carol])
+        self.assertEqual(soft_delete(self.bob, [other.id]), 0)
+
+        self.assertEqual(list(email.deleted_by.all()), [self.bob])
+        deleted = dict(email.mailbox_entries.values_list(
+            'user_id', 'is_deleted'))
+        self.assertEqual(deleted, {
+            self.alice.id: False,
+            self.bob.id: True,
+            self.carol.id: False,
+        })
+
+    def test_purge_only_mail_everyone_deleted(self):
+        everyone = send_email(self.alice, [self.bob, self.carol])
+        recipients = send_email(self.alice, [self.bob, self.carol])
+        nobody = send_email(self.alice, [self.bob])
+        for user in (self.alice, self.bob, self.carol):
+            soft_delete(user, [everyone.id])
+        for user in (self.bob, self.carol):
+            soft_delete(user, [recipients.id])
+
+        self.assertEqual(purge_deleted_emails(pause=0), 1)
+        self.assertEqual(purge_deleted_emails(pause=0), 0)
+        self.assertEqual(
+            set(Email.objects.values_list('id', flat=True)),
+            {recipients.id, nobody.id}
+        )
+
+    def test_purge_stops_after_max_batches(self):
+        emails = [send_email(self.alice, [self.bob]) for _ in range(3)]
+        for user in (self.alice, self.bob):
+            soft_delete(user, [email.id for email in emails])
+
+        self.assertEqual(
+            purge_deleted_emails(batch_size=2, max_batches=1, pause=0), 2)
+        self.assertEqual(purge_deleted_emails(batch_size=2, pause=0), 1)
+        self.assertFalse(Email.objects.exists())
+
+
+class FullTextSearchTests(MailTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            'search@example.com', 'password')
+
+    def create_post(self, subject, message, minutes_ago):
+        post = create_post(self.user, subject=subject, message=message)
+        Post.objects.filter(id=post.id).update(
+            timestamp=timezone.now() - timedelta(minutes=minutes_ago))
+        return post
+
+    @skipIf(connection.vendor == 'postgresql', 'ranked on PostgreSQL')
+    def test_fallback_lists_newest_first(self):
+        march = self.create_post('Invoice for March', 'Attached', 30)
+        lunch = self.create_post('Lunch', 'and the invoice', 20)
+        self.create_post('Lunch', 'tomorrow', 15)
+        reminder = self.create_post('Invoice reminder', 'Overdue', 10)
+
+        queryset = full_text_search(
+            Post.objects.all(), 'invoice*', ('message', 'subject'))
+        self.assertNotIn('rank', queryset.query.annotations)
+
+        self.client.force_login(self.user)
+        response = self.client.get(
+            '/external_search/', {'keyword': '"invoice*"'})
+        self.assertEqual(
+            [post.id for post in response.context['search_results']],
+            [reminder.id, lunch.id, march.id]
+        )
+
+    @skipUnless(connection.vendor == 'postgresql', 'needs search_vector')
+    def test_rank_pages_cover_every_match_once(self):
+        for number in range(4):
+            self.create_post('invoice invoice', 'invoice', number)
+            self.create_post('Invoice', 'Attached', number)
+            self.create_post('Lunch', 'tomorrow', number)
+        queryset = full_text_search(
+            Post.objects.all(), 'invoice', ('message', 'subject'))
+
+        paginator = CursorPaginator(queryset, 3, ('rank', 'id'))
+        pages = [paginator.get_page(None)]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+
+        ranked = list(queryset.order_by('-rank', '-id'))
+        self.assertEqual(len({post.rank for post in ranked}), 2)
+        self.assertEqual(
+            [post.id for page in pages for post in page],
+            [post.id for post in ranked]
+        )
+
+
+class SearchResultCacheTests(MailTestCase):
+    """Cached results are served until the user's mailbox changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = CustomUser.objects.create_user(
+            'alice@example.com', 'password')
+        cls.bob = CustomUser.objects.create_user(
+            'bob@example.com', 'password')
+
+    def test_hit_until_the_version_changes(self):
+        compute = mock.Mock(return_value={'ids': [1]})
+        params = {'keyword': 'report'}
+
+        for _ in range(2):
+            self.assertEqual(
+                search_cache.get_or_set(self.alice.id, params, compute),
+                {'ids': [1]}
+            )
+        self.assertEqual(compute.call_count, 1)
+
+        search_cache.bump([self.alice.id])
+        search_cache.get_or_set(self.alice.id, params, compute)
+        self.assertEqual(compute.call_count, 2)
+        self.assertEqual(
+            search_cache.get_metrics(),
+            {'hits': 1, 'misses': 2, 'hit_rate': 0.3333}
+        )
+
+    def test_versions_are_per_user(self):
+        compute = mock.Mock(return_value={'ids': []})
+        params = {'keyword': 'report'}
+        for user in (self.alice, self.bob):
+            search_cache.get_or_set(user.id, params, compute)
+
+        search_cache.bump([self.bob.id])
+        for user in (self.alice, self.bob):
+            search_cache.get_or_set(user.id, params, compute)
+        self.assertEqual(compute.call_count, 3)
+
+    def search(self):
+        response = self.client.get('/inbox_search/', {'keyword': 'report'})
+        return [email.id for email in response.context['search_results']]
+
+    def test_send_and_delete_are_not_served_stale(self):
+        # the search page covers the mail the user sent
+        self.client.force_login(self.alice)
+        with self.captureOnCommitCallbacks(execute=True):
+            first = send_email(self.alice, [self.bob], subject='Report')
+        self.assertEqual(self.search(), [first.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second = send_email(self.alice, [self.bob], subject='Report')
+        self.assertEqual(self.search(), [second.id, first.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            soft_delete(self.alice, [second.id])
+        self.assertEqual(self.search(), [first.id])
+        self.assertEqual(search_cache.get_metrics()['hits'], 0)
+        self.assertEqual(self.search(), [first.id])
+        self.assertEqual(search_cache.get_metrics()['hits'], 1)
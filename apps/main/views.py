@@ -2,44 +2,92 @@
 import os
 import bleach
 import html
+import json
 import subprocess
+from typing import Callable
 
 # Django
-from django.views.decorators.cache import cache_page
+from django.views.decorators.cache import (
+    cache_control,
+    cache_page
+)
 from django.utils.decorators import method_decorator
-from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.paginator import Paginator
-from django.core.mail import EmailMessage
-from django.shortcuts import get_object_or_404
+from django.contrib.auth.mixins import (
+    LoginRequiredMixin,
+    UserPassesTestMixin
+)
+from django.db import transaction
+from django.db.models import QuerySet
+from django.conf import settings
+from django.shortcuts import (
+    get_object_or_404,
+    redirect
+)
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.core.serializers.json import DjangoJSONEncoder
 from django.http import HttpResponse
 from django.views.generic import View
 from django.http import (
+    FileResponse,
+    Http404,
     HttpRequest,
-    HttpResponse
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse
 )
 
 # Local
 from settings import base
 from auths.forms import PhotoForm
-from abstracts.mixins import HttpResponseMixin
+from abstracts.mixins import (
+    HttpResponseMixin,
+    QueryBudgetMixin
+)
+from abstracts.paginators import (
+    CursorPage,
+    CursorPaginator,
+    IdListPaginator
+)
 from abstracts.decorators import perfomance_counter
+from abstracts.utils import dispatch_task_on_commit
 from .forms import (
     PostForm,
-    EmailForm
+    EmailForm,
+    BulkPostForm
 )
 from .models import (
     Post,
     Email,
+    ExportJob,
+    MailboxEntry
+)
+from .tasks import (
+    deliver_post,
+    export_mail,
+    send_campaign
+)
+from .campaigns import (
+    parse_recipients,
+    create_campaign,
+    get_campaign_progress
 )
+from .backends import get_pool_metrics
 
 # Utils
-from .utils import (
-    copy_to_excel,
-    copy_outbox_to_excel,
-    copy_outbox_external_to_excel,
-    process_and_save_photo,
-    encrypt_caesar,
-    decrypt_caesar
+from .utils import process_and_save_photo
+from .exports import FORMATS
+from .codecs import get_cipher
+from .cache import (
+    body_cache,
+    search_cache
+)
+from .counters import mailbox_counters
+from .deletion import soft_delete
+from .search import (
+    autocomplete_recipients,
+    count_results
 )
 
 
@@ -58,7 +106,7 @@ class PostView(LoginRequiredMixin, HttpResponseMixin, View):
 
         return self.get_http_response(
             request=request,
-            template_name='main\index.html',
+            template_name='main/index.html',
             context={
                 'ctx_title': 'Mail',
                 'ctx_form': self.form()
@@ -87,19 +135,6 @@ class PostView(LoginRequiredMixin, HttpResponseMixin, View):
                 attach = request.FILES.get('file')
 
                 try:
-                    recipients = [recipient]
-                    if additional_recipient:
-                        recipients.append(additional_recipient)
-
-                    mail = EmailMessage(
-                        subject, content, base.EMAIL_HOST_USER, recipients)
-
-                    if attach:
-                        mail.attach(attach.name, attach.read(),
-                                    attach.content_type)
-
-                    mail.send()
-
                     mail_model = Post(
                         sender=current_user,
                         recipient=recipient,
@@ -109,29 +144,35 @@ class PostView(LoginRequiredMixin, HttpResponseMixin, View):
                         file=attach if attach else None
                     )
                     mail_model.save()
-
-                    return self.get_http_response(
-                        request=request,
-                        template_name='main\success_mail.html',
-                        context={
-                            'ctx_title': 'Mail',
-                            'current_user': current_user,
-                            'posts': 'and added to outbox'
-                        }
-                    )
-
                 except Exception as e:
                     return self.get_http_response(
                         request=request,
-                        template_name='main\error.html',
+                        template_name='main/error.html',
                         context={
                             'ctx_title': 'Error',
                         }
                     )
 
+                # The SMTP send happens in a worker, the request only
+                # stores the queued Post. It is committed at this point:
+                # a lost dispatch is logged, not shown to the user (who
+                # would send it again), and requeue_stale_deliveries
+                # dispatches it later.
+                dispatch_task_on_commit(deliver_post, mail_model.id)
+
+                return self.get_http_response(
+                    request=request,
+                    template_name='main/success_mail.html',
+                    context={
+                        'ctx_title': 'Mail',
+                        'current_user': current_user,
+                        'posts': 'and added to outbox'
+                    }
+                )
+
             return self.get_http_response(
                 request=request,
-                template_name='main\success_mail.html',
+                template_name='main/success_mail.html',
                 context={
                     'ctx_title': 'Mail',
                     'posts': 'An error'
@@ -139,10 +180,46 @@ class PostView(LoginRequiredMixin, HttpResponseMixin, View):
             )
 
 
-class PostOutboxView(LoginRequiredMixin, HttpResponseMixin, View):
+class ExportMixin:
+    """POST queues an ExportJob of the mail of the view, in the format of
+    the `format` field (xlsx by default), and shows its progress page.
+
+    The file is written by the export_mail task, the page polls
+    ExportJobStatusView until it can be downloaded.
+    """
+
+    export_kind: str
+
+    def get_export_response(self, request: HttpRequest) -> HttpResponse:
+        file_format = request.POST.get('format', 'xlsx')
+        if file_format not in FORMATS:
+            return JsonResponse(
+                {'error': 'Unknown export format.'}, status=400)
+        job = ExportJob.objects.create(
+            user=request.user,
+            kind=self.export_kind,
+            file_format=file_format
+        )
+        # a lost dispatch is retried by requeue_stale_exports
+        dispatch_task_on_commit(export_mail, job.id)
+        return self.get_http_response(
+            request=request,
+            template_name='main/export_job.html',
+            context={
+                'ctx_title': 'Export',
+                'job': job
+            }
+        )
+
+
+class PostOutboxView(QueryBudgetMixin, ExportMixin, LoginRequiredMixin, HttpResponseMixin, View):
     """View outbox for Post model."""
 
+    # session, user, page and one spare
+    query_budget = 4
+
     form = PostForm
+    export_kind = ExportJob.KIND_POSTS
 
     def get(
         self,
@@ -150,15 +227,14 @@ class PostOutboxView(LoginRequiredMixin, HttpResponseMixin, View):
         *args: tuple,
         **kwargs: dict
     ) -> HttpResponse:
-        inbox_messages = Post.objects.all()
-        # pagination showing 5 messages per page
+        inbox_messages = Post.objects.for_listing()
+        # keyset pagination showing 5 messages per page
         messages_per_page = 5
-        paginator = Paginator(inbox_messages, messages_per_page)
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        paginator = CursorPaginator(inbox_messages, messages_per_page)
+        page_obj = paginator.get_page(request.GET.get('cursor'))
         return self.get_http_response(
             request=request,
-            template_name='main\main_post.html',
+            template_name='main/main_post.html',
             context={
                 'ctx_title': 'Mail Outbox',
                 'posts': page_obj
@@ -171,20 +247,172 @@ class PostOutboxView(LoginRequiredMixin, HttpResponseMixin, View):
         *args: tuple,
         **kwargs: dict
     ) -> HttpResponse:
-        messages = Post.objects.all()
-        copy_outbox_external_to_excel(messages)
+        return self.get_export_response(request)
+
+
+class SearchResultsMixin:
+    """Search over GET, so result pages can be cached and bookmarked.
+
+    Results come in keyset pages, are counted exactly only up to
+    MAIL_SEARCH_COUNT_CAP and can be fetched whole as streamed NDJSON
+    with ?format=ndjson.
+    """
+
+    # columns of the streamed rows
+    stream_fields: tuple[str, ...] = ()
+
+    def get_page_size(self, request: HttpRequest) -> int:
+        try:
+            size = int(request.GET.get('size', settings.MAIL_SEARCH_PAGE_SIZE))
+        except ValueError:
+            size = settings.MAIL_SEARCH_PAGE_SIZE
+        return max(1, min(size, settings.MAIL_SEARCH_MAX_PAGE_SIZE))
+
+    def get_ordering(self, queryset: QuerySet) -> tuple[str, str]:
+        # best match first when the search is ranked, newest otherwise
+        if 'rank' in queryset.query.annotations:
+            return ('rank', 'id')
+        return ('timestamp', 'id')
+
+    def get_results_context(
+        self,
+        request: HttpRequest,
+        queryset: QuerySet
+    ) -> dict:
+        paginator = CursorPaginator(
+            queryset,
+            self.get_page_size(request),
+            self.get_ordering(queryset)
+        )
+        count, count_is_exact = count_results(
+            queryset, settings.MAIL_SEARCH_COUNT_CAP)
+        return self.get_page_context(
+            request,
+            paginator.get_page(request.GET.get('cursor')),
+            count,
+            count_is_exact
+        )
+
+    def get_cached_results_context(
+        self,
+        request: HttpRequest,
+        params: dict,
+        search: Callable[[], QuerySet],
+        rows: QuerySet
+    ) -> dict:
+        """Like get_results_context(), over the result ids kept in
+        search_cache. `search` only runs on a cache miss and the result
+        is capped at MAIL_SEARCH_COUNT_CAP rows, beyond that it can be
+        streamed. A page loads its `rows` by id."""
+        result = search_cache.get_or_set(
+            request.user.id, params, lambda: self.get_result_ids(search()))
+        paginator = IdListPaginator(
+            result['ids'], rows, self.get_page_size(request))
+        return self.get_page_context(
+            request,
+            paginator.get_page(request.GET.get('cursor')),
+            result['count'],
+            result['exact']
+        )
+
+    def get_result_ids(self, queryset: QuerySet) -> dict:
+        cap = settings.MAIL_SEARCH_COUNT_CAP
+        count, count_is_exact = count_results(queryset, cap)
+        key, pk = self.get_ordering(queryset)
+        ids = queryset.order_by(f'-{key}', f'-{pk}').values_list(
+            'pk', flat=True)[:cap]
+        return {'ids': list(ids), 'count': count, 'exact': count_is_exact}
+
+    def get_page_context(
+        self,
+        request: HttpRequest,
+        page_obj: CursorPage,
+        count: int,
+        count_is_exact: bool
+    ) -> dict:
+        query = request.GET.copy()
+        query.pop('cursor', None)
+        return {
+            'search_results': page_obj,
+            'results_count': count,
+            'results_count_exact': count_is_exact,
+            'search_query': query.urlencode(),
+        }
+
+    def get_stream_response(
+        self,
+        queryset: QuerySet
+    ) -> StreamingHttpResponse:
+        rows = queryset.values(*self.stream_fields)[
+            :settings.MAIL_SEARCH_STREAM_MAX_RESULTS
+        ].iterator(chunk_size=500)
+        return StreamingHttpResponse(
+            (
+                json.dumps(self.get_stream_row(row), cls=DjangoJSONEncoder)
+                + '\n'
+                for row in rows
+            ),
+            content_type='application/x-ndjson'
+        )
+
+    def get_stream_row(self, row: dict) -> dict:
+        return row
+
+
+@method_decorator(cache_control(private=True, max_age=60), name='dispatch')
+class OutboxSeachView(QueryBudgetMixin, SearchResultsMixin, LoginRequiredMixin, HttpResponseMixin, View):
+    """View for searching emails by keywords."""
+
+    # session, user, count, count estimate, page and one spare
+    query_budget = 6
+
+    stream_fields = (
+        'id',
+        'sender__email',
+        'recipient',
+        'additional_recipient',
+        'subject',
+        'message',
+        'timestamp',
+    )
+
+    def get(
+        self,
+        request: HttpRequest,
+        *args: tuple,
+        **kwargs: dict
+    ) -> HttpResponse:
+        keyword = request.GET.get('keyword', '')
+        sender = request.GET.get('sender', '')
+        recipient = request.GET.get('recipient', '')
+        archived = bool(request.GET.get('archived'))
+        context = {
+            'ctx_title': 'Search by keyword',
+            'keyword': keyword,
+            'sender': sender,
+            'recipient': recipient,
+            'archived': archived
+        }
+        if keyword or sender or recipient:
+            search_results = Post.objects.search(
+                keyword, sender, recipient, archived=archived)
+            if request.GET.get('format') == 'ndjson':
+                return self.get_stream_response(search_results)
+            context['ctx_title'] = 'Search result'
+            context.update(self.get_results_context(
+                request, search_results.for_listing()))
         return self.get_http_response(
             request=request,
-            template_name='main\copy-to-excel-internal.html',
-            context={
-                'ctx_title': 'Save to Excel',
-                'inbox_messages': messages
-            }
+            template_name='main/external_search.html',
+            context=context
         )
 
 
-class OutboxSeachView(LoginRequiredMixin, HttpResponseMixin, View):
-    """View for searching emails by keywords."""
+class BulkPostView(LoginRequiredMixin, HttpResponseMixin, View):
+    """Send one Post to a list of recipients in the background."""
+
+    form = BulkPostForm
+    template_name = 'main/bulk_post.html'
 
     def get(
         self,
@@ -194,9 +422,10 @@ class OutboxSeachView(LoginRequiredMixin, HttpResponseMixin, View):
     ) -> HttpResponse:
         return self.get_http_response(
             request=request,
-            template_name='main\external_search.html',
+            template_name=self.template_name,
             context={
-                'ctx_title': 'Search by keyword',
+                'ctx_title': 'Bulk mail',
+                'ctx_form': self.form()
             }
         )
 
@@ -206,23 +435,134 @@ class OutboxSeachView(LoginRequiredMixin, HttpResponseMixin, View):
         *args: tuple,
         **kwargs: dict
     ) -> HttpResponse:
-        keyword = request.POST.get('keyword')
-        sender = request.POST.get('sender')
-        recipient = request.POST.get('recipient')
-        search_results = Post.objects.search(keyword, sender, recipient)
+        form = self.form(request.POST, request.FILES)
+        if not form.is_valid():
+            return self.get_http_response(
+                request=request,
+                template_name=self.template_name,
+                context={
+                    'ctx_title': 'Bulk mail',
+                    'ctx_form': form
+                }
+            )
+
+        recipients, invalid_recipients = parse_recipients(
+            text=form.cleaned_data['recipients'],
+            csv_file=form.cleaned_data['recipients_file']
+        )
+        if not recipients:
+            form.add_error(None, 'No valid recipients found.')
+            return self.get_http_response(
+                request=request,
+                template_name=self.template_name,
+                context={
+                    'ctx_title': 'Bulk mail',
+                    'ctx_form': form
+                }
+            )
+
+        content = bleach.clean(
+            form.cleaned_data['message'], tags=[], strip=True)
+        post = create_campaign(
+            sender=request.user,
+            recipients=recipients,
+            subject=form.cleaned_data['subject'],
+            message=html.unescape(content),
+            file=form.cleaned_data['file']
+        )
+        # a lost dispatch is resumed by resume_stale_campaigns
+        dispatch_task_on_commit(send_campaign, post.id)
         return self.get_http_response(
             request=request,
-            template_name='main\external_search.html',
+            template_name=self.template_name,
             context={
-                'ctx_title': 'Search result',
-                'search_results': search_results,
-                'keyword': keyword,
-                'sender': sender,
-                'recipient': recipient
+                'ctx_title': 'Bulk mail',
+                'post': post,
+                'recipients_count': len(recipients),
+                'invalid_recipients': invalid_recipients
+            }
+        )
+
+
+class BulkPostStatusView(LoginRequiredMixin, View):
+    """Progress of a bulk Post, queried while it is being sent."""
+
+    def get(
+        self,
+        request: HttpRequest,
+        post_id: int,
+        *args: tuple,
+        **kwargs: dict
+    ) -> JsonResponse:
+        post = get_object_or_404(
+            Post.objects.only('id', 'status', 'sent_at', 'error'),
+            id=post_id,
+            sender=request.user
+        )
+        return JsonResponse(
+            {
+                'id': post.id,
+                'status': post.status,
+                'sent_at': post.sent_at,
+                'error': post.error,
+                'progress': get_campaign_progress(post.id)
+            }
+        )
+
+
+class ExportJobStatusView(LoginRequiredMixin, View):
+    """Progress of an ExportJob, polled by its page until it is done."""
+
+    def get(
+        self,
+        request: HttpRequest,
+        job_id: int,
+        *args: tuple,
+        **kwargs: dict
+    ) -> JsonResponse:
+        job = get_object_or_404(ExportJob, id=job_id, user=request.user)
+        download_url = None
+        if job.status == ExportJob.STATUS_DONE:
+            download_url = reverse('export_download', args=(job.id,))
+        return JsonResponse(
+            {
+                'id': job.id,
+                'status': job.status,
+                'rows': job.rows,
+                'total': job.total,
+                'error': job.error,
+                'expires': job.expires,
+                'download_url': download_url
             }
         )
 
 
+class ExportJobDownloadView(LoginRequiredMixin, View):
+    """File of a finished ExportJob, to its owner, until it expires."""
+
+    def get(
+        self,
+        request: HttpRequest,
+        job_id: int,
+        *args: tuple,
+        **kwargs: dict
+    ) -> FileResponse:
+        job = get_object_or_404(
+            ExportJob,
+            id=job_id,
+            user=request.user,
+            status=ExportJob.STATUS_DONE,
+            expires__gt=timezone.now()
+        )
+        if not job.file or not job.file.storage.exists(job.file.name):
+            raise Http404('The export file is gone.')
+        return FileResponse(
+            job.file.open('rb'),
+            as_attachment=True,
+            filename=os.path.basename(job.file.name)
+        )
+
+
 @method_decorator(cache_page(60 * 1), name='dispatch')
 class EmailView(LoginRequiredMixin, HttpResponseMixin, View):
     """View special for Email model."""
@@ -237,7 +577,7 @@ class EmailView(LoginRequiredMixin, HttpResponseMixin, View):
     ) -> HttpResponse:
         return self.get_http_response(
             request=request,
-            template_name='main\internal_index.html',
+            template_name='main/internal_index.html',
             context={
                 'ctx_title': 'Internal Mail',
                 'ctx_form': self.form()
@@ -251,19 +591,22 @@ class EmailView(LoginRequiredMixin, HttpResponseMixin, View):
             content = bleach.clean(
                 form.cleaned_data['body'], tags=[], strip=True)
             content = html.unescape(content)
-            encrypt_content = encrypt_caesar(plaintext=content, shift=3)
+            encrypt_content = get_cipher().encrypt(content)
             email = form.save(commit=False)
             email.user = request.user
             email.sender = request.user
             email.body = encrypt_content
-            email.save()
-
             recipients = form.cleaned_data['recipients']
-            email.recipients.set(recipients)
+            # recipients.set() fans out to MailboxEntry (main.signals)
+            with transaction.atomic():
+                email.save()
+                email.recipients.set(recipients)
+            # write-through, the plain text is at hand already
+            body_cache.set(email.id, content)
 
             return self.get_http_response(
                 request=request,
-                template_name='main\success_internal_mail.html',
+                template_name='main/success_internal_mail.html',
                 context={
                     'ctx_title': 'Mail sended',
                     'ctx_form': self.form()
@@ -273,7 +616,7 @@ class EmailView(LoginRequiredMixin, HttpResponseMixin, View):
             form = EmailForm()
         return self.get_http_response(
             request=request,
-            template_name='main\error.html',
+            template_name='main/error.html',
             context={
                 'ctx_title': 'Error',
             }
@@ -293,14 +636,54 @@ class SelectEmailView(LoginRequiredMixin, HttpResponseMixin, View):
     ) -> HttpResponse:
         return self.get_http_response(
             request=request,
-            template_name='main\select_mail.html',
+            template_name='main/select_mail.html',
             context={
                 'ctx_title': 'Select Mail',
-                'user': request.user
+                'user': request.user,
+                'ctx_counters': mailbox_counters.get(request.user.id)
             }
         )
 
 
+class MailboxCountersView(LoginRequiredMixin, View):
+    """Total and unread counts of the user's inbox and outbox."""
+
+    def get(
+        self,
+        request: HttpRequest,
+        *args: tuple,
+        **kwargs: dict
+    ) -> JsonResponse:
+        return JsonResponse(mailbox_counters.get(request.user.id))
+
+
+@method_decorator(
+    cache_control(private=True, max_age=settings.MAIL_AUTOCOMPLETE_TIMEOUT),
+    name='dispatch'
+)
+class RecipientAutocompleteView(LoginRequiredMixin, View):
+    """Users whose address starts with ?q=, for the compose form."""
+
+    def get(
+        self,
+        request: HttpRequest,
+        *args: tuple,
+        **kwargs: dict
+    ) -> JsonResponse:
+        prefix = request.GET.get('q', '').strip()
+        try:
+            limit = int(request.GET.get(
+                'limit', settings.MAIL_AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            limit = settings.MAIL_AUTOCOMPLETE_LIMIT
+        limit = max(1, min(limit, settings.MAIL_AUTOCOMPLETE_MAX_LIMIT))
+
+        results = []
+        if len(prefix) >= settings.MAIL_AUTOCOMPLETE_MIN_LENGTH:
+            results = autocomplete_recipients(prefix, limit)
+        return JsonResponse({'results': results})
+
+
 class SuccessEmailView(LoginRequiredMixin, HttpResponseMixin, View):
     """View special if user sends an email."""
 
@@ -312,7 +695,7 @@ class SuccessEmailView(LoginRequiredMixin, HttpResponseMixin, View):
     ) -> HttpResponse:
         return self.get_http_response(
             request=request,
-            template_name='main\success_mail.html',
+            template_name='main/success_mail.html',
             context={
                 'ctx_title': 'Mail Sended',
             }
@@ -330,16 +713,22 @@ class SuccessInternalEmailView(LoginRequiredMixin, HttpResponseMixin, View):
     ) -> HttpResponse:
         return self.get_http_response(
             request=request,
-            template_name='main\success_internal_mail.html',
+            template_name='main/success_internal_mail.html',
             context={
                 'ctx_title': 'Mail Sended',
             }
         )
 
 
-class InboxMessagesView(LoginRequiredMixin, HttpResponseMixin, View):
+class InboxMessagesView(QueryBudgetMixin, ExportMixin, LoginRequiredMixin, HttpResponseMixin, View):
     """Get inbox messages from user."""
 
+    # session, user, page, recipients prefetch, mark read, bodies not
+    # in the body cache and one spare
+    query_budget = 7
+
+    export_kind = ExportJob.KIND_INBOX
+
     def get(
         self,
         request: HttpRequest,
@@ -347,25 +736,27 @@ class InboxMessagesView(LoginRequiredMixin, HttpResponseMixin, View):
         **kwargs: dict
     ) -> HttpResponse:
         user = request.user
-        inbox_messages = Email.get_inbox_messages(user)
-        decrypted_messages = []
-
-        for message in inbox_messages:
-            decrypted_body = decrypt_caesar(ciphertext=message.body, shift=3)
-            decrypted_messages.append(decrypted_body)
+        entries = MailboxEntry.get_folder(user, MailboxEntry.FOLDER_INBOX)
 
+        # keyset page over the mailbox table, bodies from the body cache
         messages_per_page = 5
-        messages_with_decryption = list(
-            zip(inbox_messages, decrypted_messages))
-
-        # paginator = Paginator(inbox_messages, messages_per_page)
-        paginator = Paginator(messages_with_decryption, messages_per_page)
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        paginator = CursorPaginator(entries, messages_per_page)
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+        page_messages = [entry.email for entry in page_obj]
+        messages_with_decryption = list(zip(
+            page_messages, body_cache.get_many(page_messages)
+        ))
+        # the page shows full bodies, so showing it reads them
+        unread = [entry.id for entry in page_obj if not entry.is_read]
+        if unread:
+            marked = MailboxEntry.objects.filter(
+                id__in=unread, is_read=False).update(is_read=True)
+            mailbox_counters.apply_on_commit(
+                {(user.id, 'inbox_unread'): -marked})
 
         return self.get_http_response(
             request=request,
-            template_name='main\internal_inbox.html',
+            template_name='main/internal_inbox.html',
             context={
                 'ctx_title': 'Mail Inbox',
                 'inbox_messages': page_obj,
@@ -379,63 +770,87 @@ class InboxMessagesView(LoginRequiredMixin, HttpResponseMixin, View):
         *args: tuple,
         **kwargs: dict
     ) -> HttpResponse:
-        user = request.user
-        inbox_messages = Email.get_inbox_messages(user)
-        copy_to_excel(inbox_messages)
-        return self.get_http_response(
-            request=request,
-            template_name='main\copy-to-excel.html',
-            context={
-                'ctx_title': 'Mail Inbox',
-                'inbox_messages': inbox_messages
-            }
-        )
+        return self.get_export_response(request)
 
 
-class OutboxInternalSeachView(LoginRequiredMixin, HttpResponseMixin, View):
+@method_decorator(cache_control(private=True, max_age=60), name='dispatch')
+class OutboxInternalSeachView(QueryBudgetMixin, SearchResultsMixin, LoginRequiredMixin, HttpResponseMixin, View):
     """View for searching emails by keywords."""
 
-    def get(
-        self,
-        request: HttpRequest,
-        *args: tuple,
-        **kwargs: dict
-    ) -> HttpResponse:
-        return self.get_http_response(
-            request=request,
-            template_name='main\internal_search.html',
-            context={
-                'ctx_title': 'Search by keyword',
-            }
-        )
+    # session, user, body matches, count, count estimate, ids, page,
+    # recipients prefetch, bodies not in the body cache and one spare
+    # (cache hits skip three to six)
+    query_budget = 10
 
-    def post(
+    stream_fields = (
+        'id',
+        'sender__email',
+        'subject',
+        'body',
+        'timestamp',
+    )
+
+    def get(
         self,
         request: HttpRequest,
         *args: tuple,
         **kwargs: dict
     ) -> HttpResponse:
-        keyword = request.POST.get('keyword')
-        recipients = request.POST.get('recipients')
+        keyword = request.GET.get('keyword', '')
+        recipients = request.GET.get('recipients', '')
         current_user_email = request.user.email
-        search_results = Email.objects.search(
-            keyword, sender=current_user_email, recipients=recipients)
+        archived = bool(request.GET.get('archived'))
+        context = {
+            'ctx_title': 'Search by keyword',
+            'keyword': keyword,
+            'sender': current_user_email,
+            'recipients': recipients,
+            'archived': archived
+        }
+        if keyword or recipients:
+            def search() -> QuerySet:
+                return Email.objects.search(
+                    keyword, sender=current_user_email,
+                    recipients=recipients, archived=archived,
+                    user=request.user)
+
+            if request.GET.get('format') == 'ndjson':
+                return self.get_stream_response(search())
+            rows = Email.objects.archived() if archived else Email.objects
+            context.update(self.get_cached_results_context(
+                request,
+                {
+                    'keyword': keyword,
+                    'recipients': recipients,
+                    'archived': archived,
+                },
+                search,
+                rows.for_listing(with_body=False)
+            ))
+            page_obj = context['search_results']
+            context['results_with_bodies'] = list(zip(
+                page_obj, body_cache.get_many(page_obj.object_list)
+            ))
         return self.get_http_response(
             request=request,
-            template_name='main\internal_search.html',
-            context={
-                'ctx_title': 'Search by keyword',
-                'search_results': search_results,
-                'keyword': keyword,
-                'sender': current_user_email,
-                'recipients': recipients
-            }
+            template_name='main/internal_search.html',
+            context=context
         )
 
+    def get_stream_row(self, row: dict) -> dict:
+        row['body'] = get_cipher().decrypt(row['body'])
+        return row
 
-class OutboxMessagesView(LoginRequiredMixin, HttpResponseMixin, View):
+
+class OutboxMessagesView(QueryBudgetMixin, ExportMixin, LoginRequiredMixin, HttpResponseMixin, View):
     """Get outbox messages from user."""
 
+    # session, user, page, recipients prefetch, bodies not in the body
+    # cache and one spare
+    query_budget = 6
+
+    export_kind = ExportJob.KIND_OUTBOX
+
     def get(
         self,
         request: HttpRequest,
@@ -443,26 +858,20 @@ class OutboxMessagesView(LoginRequiredMixin, HttpResponseMixin, View):
         **kwargs: dict
     ) -> HttpResponse:
         user = request.user
-        outbox_messages = Email.get_outbox_messages(user)
-        decrypted_messages = []
-        print(outbox_messages)
-        for message in outbox_messages:
-            decrypted_body = decrypt_caesar(ciphertext=message.body, shift=3)
-            decrypted_messages.append(decrypted_body)
+        entries = MailboxEntry.get_folder(user, MailboxEntry.FOLDER_OUTBOX)
 
+        # keyset page over the mailbox table, bodies from the body cache
         messages_per_page = 10
-        messages_with_decryption = list(
-            zip(outbox_messages, decrypted_messages))
-        print(messages_with_decryption)
-
-        # paginator = Paginator(outbox_messages, messages_per_page)
-        paginator = Paginator(messages_with_decryption, messages_per_page)
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        paginator = CursorPaginator(entries, messages_per_page)
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+        page_messages = [entry.email for entry in page_obj]
+        messages_with_decryption = list(zip(
+            page_messages, body_cache.get_many(page_messages)
+        ))
 
         return self.get_http_response(
             request=request,
-            template_name='main\internal_outbox.html',
+            template_name='main/internal_outbox.html',
             context={
                 'ctx_title': 'Mail Outbox',
                 'outbox_messages': page_obj,
@@ -476,17 +885,7 @@ class OutboxMessagesView(LoginRequiredMixin, HttpResponseMixin, View):
         *args: tuple,
         **kwargs: dict
     ) -> HttpResponse:
-        user = request.user
-        outbox_messages = Email.get_outbox_messages(user)
-        copy_outbox_to_excel(outbox_messages)
-        return self.get_http_response(
-            request=request,
-            template_name='main\copy-to-excel-outbox.html',
-            context={
-                'ctx_title': 'Mail Outbox',
-                'inbox_messages': outbox_messages
-            }
-        )
+        return self.get_export_response(request)
 
 
 class EmailDeleteView(LoginRequiredMixin, HttpResponseMixin, View):
@@ -499,17 +898,49 @@ class EmailDeleteView(LoginRequiredMixin, HttpResponseMixin, View):
         *args: tuple,
         **kwargs: dict,
     ) -> HttpResponse:
-        email = get_object_or_404(Email, id=email_id)
-        email.delete()
+        # deleted for this user only, the other participants keep it
+        if not soft_delete(request.user, [email_id]):
+            raise Http404('No mail matches the given query.')
         return self.get_http_response(
             request=request,
-            template_name='main\delete_email.html',
+            template_name='main/delete_email.html',
             context={
                 'ctx_title': 'Mail Deleted',
             }
         )
 
 
+class EmailBulkDeleteView(LoginRequiredMixin, View):
+    """Delete many messages of the user at once."""
+
+    def post(
+        self,
+        request: HttpRequest,
+        *args: tuple,
+        **kwargs: dict,
+    ) -> HttpResponse:
+        try:
+            email_ids = [int(value) for value in request.POST.getlist('ids')]
+        except ValueError:
+            return JsonResponse({'error': 'Invalid id.'}, status=400)
+        if len(email_ids) > settings.MAIL_BULK_DELETE_MAX:
+            return JsonResponse(
+                {
+                    'error': f'At most {settings.MAIL_BULK_DELETE_MAX} '
+                             f'messages per request.'
+                },
+                status=400
+            )
+
+        deleted = soft_delete(request.user, email_ids)
+        next_url = request.POST.get('next')
+        if next_url and url_has_allowed_host_and_scheme(
+            next_url, allowed_hosts={request.get_host()}
+        ):
+            return redirect(next_url)
+        return JsonResponse({'deleted': deleted})
+
+
 class ChangePhotoView(LoginRequiredMixin, HttpResponseMixin, View):
     """Changing user's photo."""
 
@@ -521,7 +952,7 @@ class ChangePhotoView(LoginRequiredMixin, HttpResponseMixin, View):
     ) -> HttpResponse:
         return self.get_http_response(
             request=request,
-            template_name='main\photo_change.html',
+            template_name='main/photo_change.html',
             context={
                 'ctx_title': 'Change photo',
             }
@@ -542,7 +973,7 @@ class ChangePhotoView(LoginRequiredMixin, HttpResponseMixin, View):
             user.photo.save(photo.name, photo_file, save=True)
             return self.get_http_response(
                 request=request,
-                template_name='main\photo_change.html',
+                template_name='main/photo_change.html',
                 context={
                     'ctx_title': 'Change photo',
                     'form': form,
@@ -551,10 +982,40 @@ class ChangePhotoView(LoginRequiredMixin, HttpResponseMixin, View):
             )
         return self.get_http_response(
             request=request,
-            template_name='main\photo_change.html',
+            template_name='main/photo_change.html',
             context={
                 'ctx_title': 'Change photo',
                 'form': form,
                 'info': "An error occured, please check image size and format (JPG, PNG...)"
             }
         )
+
+
+class SearchCacheMetricsView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Hits and misses of the internal search cache (staff only)."""
+
+    def test_func(self) -> bool:
+        return self.request.user.is_staff
+
+    def get(
+        self,
+        request: HttpRequest,
+        *args: tuple,
+        **kwargs: dict
+    ) -> JsonResponse:
+        return JsonResponse(search_cache.get_metrics())
+
+
+class EmailPoolMetricsView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """SMTP connection pool metrics of this process (staff only)."""
+
+    def test_func(self) -> bool:
+        return self.request.user.is_staff
+
+    def get(
+        self,
+        request: HttpRequest,
+        *args: tuple,
+        **kwargs: dict
+    ) -> JsonResponse:
+        return JsonResponse({'pools': get_pool_metrics()})
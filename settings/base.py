@@ -9,11 +9,52 @@ from pathlib import Path
 from rest_framework import status
 
 # Third party
+from celery.schedules import crontab
 from decouple import config
 import mimetypes
 
 CELERY_BROKER_URL = 'redis://127.0.0.1:6379'
 CELERY_RESULT_BACKEND = 'redis://127.0.0.1:6379'
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_BEAT_SCHEDULE = {
+    'reconcile-mailbox-counters': {
+        'task': 'main.reconcile_mailbox_counters',
+        'schedule': 60 * 60,
+    },
+    'purge-deleted-emails': {
+        'task': 'main.purge_deleted_emails',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'archive-old-mail': {
+        'task': 'main.archive_old_mail',
+        'schedule': crontab(hour=4, minute=0),
+    },
+    'purge-expired-exports': {
+        'task': 'main.purge_expired_exports',
+        'schedule': 60 * 60,
+    },
+    'requeue-stale-exports': {
+        'task': 'main.requeue_stale_exports',
+        'schedule': 60 * 5,
+    },
+    'requeue-stale-deliveries': {
+        'task': 'main.requeue_stale_deliveries',
+        'schedule': 60 * 5,
+    },
+    'resume-stale-campaigns': {
+        'task': 'main.resume_stale_campaigns',
+        'schedule': 60 * 5,
+    },
+    'sweep-orphan-blobs': {
+        'task': 'main.sweep_orphan_blobs',
+        'schedule': crontab(hour=5, minute=0),
+    },
+}
+
+# 'celery' sends background tasks to the broker above,
+# 'local' runs them in an in-process thread pool (no broker needed).
+TASK_EXECUTOR = config('TASK_EXECUTOR', default='celery', cast=str)
+LOCAL_EXECUTOR_WORKERS = config('LOCAL_EXECUTOR_WORKERS', default=4, cast=int)
 
 mimetypes.add_type("application/javascript", ".js", True)
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -34,6 +75,7 @@ DJANGO_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework_simplejwt',
     'rest_framework',
     'django_extensions',
@@ -63,15 +105,112 @@ REST_FRAMEWORK = {
 # -------------------------------------------------------------
 # Email hosts
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_USE_TLS = True
+EMAIL_BACKEND = 'main.backends.PooledEmailBackend'
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
 EMAIL_HOST = config('EMAIL_HOST', cast=str)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', cast=str)
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', cast=str)
-EMAIL_PORT = 587
+EMAIL_PORT = config('EMAIL_PORT', default=587, cast=int)
+EMAIL_TIMEOUT = 30
+
+# SMTP connection pool (per process)
+EMAIL_POOL_SIZE = 5
+# seconds to wait for a free connection
+EMAIL_POOL_TIMEOUT = 30
+# idle connections older than this are closed, servers drop them anyway
+EMAIL_POOL_MAX_IDLE = 240
+# idle connections older than this are checked with NOOP before reuse
+EMAIL_POOL_HEALTHCHECK_AFTER = 5
+
+# Delivery retries: exponential backoff from BASE to MAX seconds,
+# after MAX_ATTEMPTS the Post goes to the dead letter table.
+MAIL_RETRY_MAX_ATTEMPTS = 5
+MAIL_RETRY_BASE_DELAY = 30
+MAIL_RETRY_MAX_DELAY = 60 * 60
+# seconds a Post may stay in 'queued' or 'sending' without a heartbeat
+# before its task or worker is assumed lost: a queued Post is
+# dispatched again, a sending one retried or dead-lettered, see
+# main.delivery
+MAIL_DELIVERY_STALE_AFTER = 60 * 10
+
+# Cipher of stored internal mail bodies, see main.codecs
+MAIL_CIPHER = {
+    'BACKEND': 'main.codecs.CaesarCipher',
+    'OPTIONS': {
+        'shift': 3,
+    },
+}
+
+# Attachment blobs without a row (their upload was rolled back) older
+# than this many seconds are deleted, see main.storage
+MAIL_BLOB_ORPHAN_MIN_AGE = 60 * 60 * 24
+
+# Deleting internal mail
+MAIL_BULK_DELETE_MAX = 500
+# purge of mail every participant deleted, see main.deletion
+MAIL_PURGE_BATCH_SIZE = 500
+MAIL_PURGE_MAX_BATCHES = 200
+# seconds between purge batches
+MAIL_PURGE_PAUSE = 0.5
+
+# Mail older than this moves to the archive tables, see main.archive
+MAIL_ARCHIVE_AFTER_DAYS = 365
+MAIL_ARCHIVE_BATCH_SIZE = 500
+MAIL_ARCHIVE_MAX_BATCHES = 200
+
+# Blind index of internal mail bodies, see main.search and main.indexing.
+# Changing the key needs `manage.py rebuild_search_tokens`.
+MAIL_SEARCH_INDEX_KEY = config(
+    'MAIL_SEARCH_INDEX_KEY', default=SECRET_KEY, cast=str
+)
+# distinct words indexed per body
+MAIL_SEARCH_MAX_WORDS = 2000
+MAIL_SEARCH_REBUILD_BATCH_SIZE = 500
+# Search result pages, see main.views.SearchResultsMixin
+MAIL_SEARCH_PAGE_SIZE = 20
+MAIL_SEARCH_MAX_PAGE_SIZE = 100
+# results are counted exactly up to this and estimated past it
+MAIL_SEARCH_COUNT_CAP = 1000
+# rows of one streamed (?format=ndjson) search result
+MAIL_SEARCH_STREAM_MAX_RESULTS = 50_000
+# Redis connection and lifetime of cached internal search results,
+# see main.cache.SearchResultCache
+MAIL_SEARCH_CACHE = 'default'
+MAIL_SEARCH_CACHE_TIMEOUT = 60 * 10
+# Recipient autocomplete of the compose form, see main.search
+MAIL_AUTOCOMPLETE_MIN_LENGTH = 2
+MAIL_AUTOCOMPLETE_LIMIT = 10
+MAIL_AUTOCOMPLETE_MAX_LIMIT = 25
+# seconds
+MAIL_AUTOCOMPLETE_TIMEOUT = 60
+
+# Mail exports, see main.exports
+# rows fetched per query, job progress is saved after each
+EXPORT_QUERY_CHUNK_SIZE = 2000
+# bytes per chunk written to the file
+EXPORT_CHUNK_SIZE = 64 * 1024
+# seconds a finished export stays downloadable in MEDIA_ROOT/exports
+EXPORT_JOB_EXPIRY = 60 * 60 * 24
+# seconds without a heartbeat after which a running export is failed
+# (its worker died) and a queued one dispatched again (its task was
+# lost), see main.exports.requeue_stale_exports
+EXPORT_JOB_STALE_AFTER = 60 * 10
+
+# Bulk sending
+BULK_SEND_BATCH_SIZE = 100
+# messages per second, 0 disables throttling
+BULK_SEND_RATE = 10
+# seconds without a heartbeat after which a bulk Post in 'queued' or
+# 'sending' is considered abandoned by its task or worker and resumed
+BULK_SEND_STALE_AFTER = 60 * 15
 
 # -------------------------------------------------------------
 
+# Views with QueryBudgetMixin raise when they exceed their query budget
+QUERY_BUDGET_ENFORCE = config(
+    'QUERY_BUDGET_ENFORCE', default='test' in sys.argv, cast=bool
+)
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -225,5 +364,30 @@ CACHES = {
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
         }
+    },
+    # decrypted mail bodies, see main.cache; a cache outage only
+    # means decrypting again
+    'mail_bodies': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'COMPRESSOR': 'django_redis.compressors.zlib.ZlibCompressor',
+            'IGNORE_EXCEPTIONS': True,
+        }
     }
 }
+
+# Redis connection of the per-user mailbox counters, see main.counters
+MAILBOX_COUNTERS_CACHE = 'default'
+
+# Mail body cache
+MAIL_BODY_CACHE = 'mail_bodies'
+MAIL_BODY_CACHE_TIMEOUT = 60 * 60 * 24
+# bytes, larger bodies are decrypted on every view
+MAIL_BODY_CACHE_MAX_SIZE = 64 * 1024
+# bytes, bound of all cached bodies together, the oldest are evicted
+# past it. The Redis server behind it should still run with maxmemory
+# and an allkeys-lru / volatile-lru policy, this only keeps the bodies
+# from crowding out the other caches sharing it.
+MAIL_BODY_CACHE_MAX_TOTAL_SIZE = 256 * 1024 * 1024
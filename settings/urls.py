@@ -20,16 +20,25 @@ from django.contrib.auth import views as auth_views
 from main.views import (
     PostView,
     PostOutboxView,
+    BulkPostView,
+    BulkPostStatusView,
+    ExportJobStatusView,
+    ExportJobDownloadView,
     EmailView,
     SelectEmailView,
+    MailboxCountersView,
+    RecipientAutocompleteView,
     SuccessEmailView,
     SuccessInternalEmailView,
     InboxMessagesView,
     OutboxMessagesView,
     EmailDeleteView,
+    EmailBulkDeleteView,
     ChangePhotoView,
     OutboxSeachView,
-    OutboxInternalSeachView
+    OutboxInternalSeachView,
+    EmailPoolMetricsView,
+    SearchCacheMetricsView
 )
 from auths.views import (
     RegistrationView,
@@ -45,13 +54,20 @@ urlpatterns = [
     path('', LoginView.as_view(), name='login'),
     path('mail/', PostView.as_view(), name='mail'),
     path('select/', SelectEmailView.as_view(), name='select'),
+    path('mailbox_counters/', MailboxCountersView.as_view(),
+         name='mailbox_counters'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('external_outbox/', PostOutboxView.as_view(), name='archive'),
+    path('bulk/', BulkPostView.as_view(), name='bulk_mail'),
+    path('bulk/<int:post_id>/status/', BulkPostStatusView.as_view(),
+         name='bulk_mail_status'),
     path('external_search/', OutboxSeachView.as_view(), name='external_search'),
     path('success_mail', SuccessEmailView.as_view(), name='success_mail'),
     path('success_internal_mail', SuccessInternalEmailView.as_view(),
          name='success_internal_mail'),
     path('internal/', EmailView.as_view(), name='internal_mail'),
+    path('recipients/autocomplete/', RecipientAutocompleteView.as_view(),
+         name='recipient_autocomplete'),
     path('inbox/', InboxMessagesView.as_view(), name='internal_inbox'),
     path('inbox_search/', OutboxInternalSeachView.as_view(), name='internal_search'),
     path('outbox/', OutboxMessagesView.as_view(), name='internal_outbox'),
@@ -61,14 +77,24 @@ urlpatterns = [
          name='copy-to-excel-outbox'),
     path('copy-to-excel-internal/', PostOutboxView.as_view(),
          name='copy-to-excel-internal'),
+    path('exports/<int:job_id>/status/', ExportJobStatusView.as_view(),
+         name='export_status'),
+    path('exports/<int:job_id>/download/', ExportJobDownloadView.as_view(),
+         name='export_download'),
     path('email/<int:email_id>/delete/',
          EmailDeleteView.as_view(), name='delete_email'),
+    path('email/delete/', EmailBulkDeleteView.as_view(),
+         name='bulk_delete_email'),
     path('change_photo/<str:email_id>/',
          ChangePhotoView.as_view(), name='change_photo'),
     path('change_password/', ChangePasswordView.as_view(), name='change_password'),
     path('default_password/', DefaultPasswordView.as_view(),
          name='default_password'),
     path('summernote/', include('django_summernote.urls')),
+    path('email_pool_metrics/', EmailPoolMetricsView.as_view(),
+         name='email_pool_metrics'),
+    path('search_cache_metrics/', SearchCacheMetricsView.as_view(),
+         name='search_cache_metrics'),
 
 
 ] + static(
@@ -0,0 +1,156 @@
+"""EXPLAIN ANALYZE of the address filters of Post/Email search, with and
+without the trigram indexes of main/migrations/0010_address_trigram_indexes.py.
+
+Seeds users, Posts and Emails into the configured PostgreSQL database
+inside a transaction that is rolled back at the end, nothing is kept.
+The database needs the pg_trgm extension (migrate creates it).
+
+Usage: python tools/benchmarks/address_search_plans.py [rows]
+       python tools/benchmarks/address_search_plans.py 10000000
+"""
+# Python
+import os
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / 'apps'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings.base')
+
+# Django
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import (  # noqa: E402
+    connection,
+    transaction
+)
+from django.db.models import QuerySet  # noqa: E402
+
+# Local
+from main.models import (  # noqa: E402
+    Email,
+    Post
+)
+
+TRIGRAM_INDEXES = (
+    'auths_customuser_email_trgm_idx',
+    'main_post_recipient_trgm_idx',
+    'main_post_additional_recipient_trgm_idx',
+)
+USERS = 100_000
+# user4242 and user42420 to user42429
+ADDRESS = 'user4242'
+
+
+class Rollback(Exception):
+    pass
+
+
+def seed(rows: int) -> None:
+    params = {'rows': rows, 'users': USERS}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO auths_customuser (password, email, is_active,
+                is_superuser, is_staff, date_joined, photo)
+            SELECT 'x', 'user' || g || '@bench' || g %% 50 || '.example.com',
+                true, false, false, now(), ''
+            FROM generate_series(1, %(users)s) g
+            """,
+            params
+        )
+        cursor.execute(
+            'SELECT min(id) FROM auths_customuser '
+            "WHERE email LIKE 'user%@bench%'"
+        )
+        params['first'] = cursor.fetchone()[0]
+        cursor.execute(
+            """
+            INSERT INTO main_post (sender_id, recipient,
+                additional_recipient, subject, message, timestamp,
+                status, error, attempt_count)
+            SELECT %(first)s + g %% %(users)s,
+                'user' || (g * 7 %% %(users)s) || '@external.example.org',
+                CASE WHEN g %% 3 = 0
+                    THEN 'user' || (g * 11 %% %(users)s) || '@cc.example.org'
+                    ELSE '' END,
+                'subject', 'message',
+                now() - g * interval '1 second', 'sent', '', 1
+            FROM generate_series(1, %(rows)s) g
+            """,
+            params
+        )
+        cursor.execute(
+            """
+            INSERT INTO main_email (sender_id, user_id, subject, body,
+                timestamp)
+            SELECT %(first)s + g %% %(users)s, %(first)s + g %% %(users)s,
+                'subject', 'body', now() - g * interval '1 second'
+            FROM generate_series(1, %(rows)s) g
+            """,
+            params
+        )
+        cursor.execute('ANALYZE main_email')
+        # two recipients per Email
+        cursor.execute(
+            """
+            INSERT INTO main_email_recipients (email_id, customuser_id)
+            SELECT id, %(first)s + id * 7 %% %(users)s FROM main_email
+            UNION ALL
+            SELECT id, %(first)s + (id * 13 + 1) %% %(users)s FROM main_email
+            """,
+            params
+        )
+        cursor.execute('ANALYZE')
+
+
+def get_queries() -> dict[str, QuerySet]:
+    return {
+        'posts by recipient': Post.objects.search('', recipient=ADDRESS),
+        'posts by sender': Post.objects.search('', sender=ADDRESS),
+        'emails by recipient': Email.objects.search('', recipients=ADDRESS),
+        'emails by recipient, joined (before)': Email.objects.filter(
+            recipients__email__icontains=ADDRESS
+        ),
+    }
+
+
+def explain() -> None:
+    for name, queryset in get_queries().items():
+        lines = queryset.explain(analyze=True).splitlines()
+        print(f'--- {name}')
+        print(f'    {lines[0].strip()}')
+        for line in lines[1:]:
+            if '->' in line or 'Execution Time' in line:
+                print(f'    {line.strip()}')
+
+
+def main() -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+        )
+        if cursor.fetchone() is None:
+            sys.exit('pg_trgm is not installed, run migrate first')
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    try:
+        with transaction.atomic():
+            seed(rows)
+            print(f'=== with trigram indexes, {rows} Posts and Emails')
+            explain()
+            with connection.cursor() as cursor:
+                for index in TRIGRAM_INDEXES:
+                    cursor.execute(f'DROP INDEX {index}')
+            print('=== without trigram indexes')
+            explain()
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Peak memory of sending a Post attachment, in-memory vs streamed.
+
+Usage: python tools/benchmarks/attachment_memory.py [size_mb]
+"""
+# Python
+import os
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(BASE_DIR / 'apps'))
+
+# Django
+from django.conf import settings
+
+settings.configure(DEFAULT_CHARSET='utf-8')
+
+from django.core.mail import EmailMessage  # noqa: E402
+
+# Local
+from main.mime import iter_message_bytes  # noqa: E402
+
+
+def make_mail() -> EmailMessage:
+    return EmailMessage(
+        'Report', 'See attachment.', 'from@example.com', ['to@example.com']
+    )
+
+
+def inline(path: str) -> int:
+    # What PostView used to do: read the upload, attach, render.
+    mail = make_mail()
+    with open(path, 'rb') as attach:
+        mail.attach(os.path.basename(path), attach.read(), 'application/pdf')
+    return len(mail.message().as_bytes(linesep='\r\n'))
+
+
+def streamed(path: str) -> int:
+    size = 0
+    with open(path, 'rb') as attach:
+        for chunk in iter_message_bytes(make_mail(), [attach]):
+            size += len(chunk)
+    return size
+
+
+def measure(func, path: str) -> tuple[int, int]:
+    tracemalloc.start()
+    size = func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, peak
+
+
+def main() -> None:
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    with tempfile.NamedTemporaryFile(suffix='.pdf') as upload:
+        for _ in range(size_mb):
+            upload.write(os.urandom(1024 * 1024))
+        upload.flush()
+
+        for func in (inline, streamed):
+            size, peak = measure(func, upload.name)
+            print(
+                f'{func.__name__:>8}: message {size / 2**20:7.1f} MB, '
+                f'peak {peak / 2**20:7.1f} MB'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Throughput of the old per-character Caesar loop vs main.codecs.
+
+Usage: python tools/benchmarks/cipher.py
+"""
+# Python
+import random
+import string
+import sys
+import timeit
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(BASE_DIR / 'apps'))
+
+# Local
+from main.codecs import CaesarCipher  # noqa: E402
+
+SIZES = (1024, 100 * 1024, 1024 * 1024)
+
+
+def loop_caesar(plaintext: str, shift: int) -> str:
+    """The implementation main.utils.encrypt_caesar used to have."""
+    encrypted_text = ""
+    for char in plaintext:
+        if char.isalpha():
+            start = ord('a') if char.islower() else ord('A')
+            encrypted_char = chr((ord(char) - start + shift) % 26 + start)
+            encrypted_text += encrypted_char
+        else:
+            encrypted_text += char
+    return encrypted_text
+
+
+def best_of(func, repeat: int = 5) -> float:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main() -> None:
+    cipher = CaesarCipher(3)
+    alphabet = string.ascii_letters + string.digits + ' .,\n'
+    for size in SIZES:
+        text = ''.join(random.choices(alphabet, k=size))
+        assert loop_caesar(text, 3) == cipher.encrypt(text)
+
+        loop = best_of(lambda: loop_caesar(text, 3))
+        table = best_of(lambda: cipher.encrypt(text))
+        print(
+            f'{size // 1024:>5} KB  loop {loop * 1000:9.3f} ms  '
+            f'table {table * 1000:8.3f} ms  x{loop / table:.0f}'
+        )
+
+    page = [
+        cipher.encrypt(''.join(random.choices(alphabet, k=4096)))
+        for _ in range(50)
+    ]
+    single = best_of(lambda: [cipher.decrypt(body) for body in page])
+    batch = best_of(lambda: cipher.decrypt_many(page))
+    print(
+        f'page of 50 x 4 KB  decrypt {single * 1000:.3f} ms  '
+        f'decrypt_many {batch * 1000:.3f} ms'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""Time and peak memory of the outbox export, in-memory workbook (what
+main.utils.copy_outbox_to_excel used to do) vs the streamed formats of
+main.exports.
+
+Seeds one user's outbox into the configured PostgreSQL database inside
+a transaction that is rolled back at the end, nothing is kept.
+
+Usage: python tools/benchmarks/excel_export.py [rows]
+       python tools/benchmarks/excel_export.py 1000000
+"""
+# Python
+import os
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+from pathlib import Path
+from typing import Callable
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / 'apps'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings.base')
+
+# Django
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import (  # noqa: E402
+    connection,
+    transaction
+)
+from django.db.models import QuerySet  # noqa: E402
+
+# Third party
+import openpyxl  # noqa: E402
+import pytz  # noqa: E402
+
+# Local
+from auths.models import CustomUser  # noqa: E402
+from main.models import Email  # noqa: E402
+from main.exports import (  # noqa: E402
+    FORMATS,
+    outbox_export
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+def seed(rows: int) -> CustomUser:
+    sender = CustomUser.objects.create(
+        email='export-sender@bench.example.com', password='x')
+    recipient = CustomUser.objects.create(
+        email='export-recipient@bench.example.com', password='x')
+    params = {
+        'rows': rows,
+        'sender': sender.id,
+        'recipient': recipient.id,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO main_email (sender_id, user_id, subject, body,
+                timestamp)
+            SELECT %(sender)s, %(sender)s, 'subject ' || g,
+                'wkh ergb ri phvvdjh ' || g, now() - g * interval '1 second'
+            FROM generate_series(1, %(rows)s) g
+            """,
+            params
+        )
+        cursor.execute(
+            """
+            INSERT INTO main_email_recipients (email_id, customuser_id)
+            SELECT id, %(recipient)s FROM main_email
+            WHERE sender_id = %(sender)s
+            """,
+            params
+        )
+        cursor.execute(
+            """
+            INSERT INTO main_mailboxentry (user_id, email_id, folder,
+                is_read, is_deleted, timestamp)
+            SELECT %(sender)s, id, 'outbox', true, false, timestamp
+            FROM main_email WHERE sender_id = %(sender)s
+            """,
+            params
+        )
+        cursor.execute('ANALYZE')
+    return sender
+
+
+def in_memory(messages: QuerySet) -> int:
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(outbox_export.headers)
+    for message in messages:
+        tz = pytz.timezone('Asia/Almaty')
+        sheet.append([
+            message.sender.email,
+            ', '.join(str(r) for r in message.recipients.all()),
+            message.subject,
+            message.body,
+            message.timestamp.astimezone(tz).replace(tzinfo=None),
+        ])
+    buffer = BytesIO()
+    workbook.save(buffer)
+    return buffer.tell()
+
+
+def get_streamed(file_format: str) -> Callable[[QuerySet], int]:
+    def streamed(messages: QuerySet) -> int:
+        return sum(
+            len(chunk)
+            for chunk in outbox_export.render(messages, file_format)
+        )
+    return streamed
+
+
+def measure(func: Callable, messages: QuerySet) -> tuple[int, float, int]:
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = func(messages)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+
+def main() -> None:
+    if connection.vendor != 'postgresql':
+        sys.exit('needs PostgreSQL, seeding uses generate_series')
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    try:
+        with transaction.atomic():
+            user = seed(rows)
+            print(f'=== outbox of {rows} Emails')
+            runs = {
+                **{
+                    file_format: get_streamed(file_format)
+                    for file_format in FORMATS
+                },
+                'in-memory xlsx': in_memory,
+            }
+            for name, func in runs.items():
+                size, elapsed, peak = measure(
+                    func,
+                    Email.get_outbox_messages(user)
+                    .order_by('-timestamp', '-id')
+                )
+                print(
+                    f'{name:>14}: file {size / 2**20:7.1f} MB, '
+                    f'{elapsed:7.1f} s, peak {peak / 2**20:8.1f} MB'
+                )
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == '__main__':
+    main()
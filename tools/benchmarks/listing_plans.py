@@ -0,0 +1,139 @@
+"""EXPLAIN ANALYZE of the mailbox list queries, with and without the
+indexes of main/migrations/0007_mailbox_indexes.py.
+
+Seeds users, Posts and Emails into the configured PostgreSQL database
+inside a transaction that is rolled back at the end, nothing is kept.
+
+Usage: python tools/benchmarks/listing_plans.py [rows]
+"""
+# Python
+import os
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / 'apps'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings.base')
+
+# Django
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import (  # noqa: E402
+    connection,
+    transaction
+)
+
+# Local
+from auths.models import CustomUser  # noqa: E402
+from main.explain import get_listing_queries  # noqa: E402
+
+NEW_INDEXES = (
+    'main_post_listing_idx',
+    'main_post_sender_idx',
+    'main_post_recipient_idx',
+    'main_email_listing_idx',
+    'main_email_sender_idx',
+    'main_email_recipients_user_idx',
+    'main_email_deleted_by_user_idx',
+)
+USERS = 1000
+
+
+class Rollback(Exception):
+    pass
+
+
+def seed(rows: int) -> CustomUser:
+    users = CustomUser.objects.bulk_create(
+        CustomUser(email=f'bench{i}@example.com', password='x')
+        for i in range(USERS)
+    )
+    first_id = min(user.id for user in users)
+    params = {'rows': rows, 'users': USERS, 'first': first_id}
+    with connection.cursor() as cursor:
+        # one row a minute going back from now, spread over the users
+        cursor.execute(
+            """
+            INSERT INTO main_post (sender_id, recipient,
+                additional_recipient, subject, message, timestamp,
+                status, error, attempt_count)
+            SELECT %(first)s + g %% %(users)s,
+                'bench' || (g * 7 %% %(users)s) || '@example.com',
+                '', 'subject', 'message',
+                now() - g * interval '1 minute', 'sent', '', 1
+            FROM generate_series(1, %(rows)s) g
+            """,
+            params
+        )
+        cursor.execute(
+            """
+            INSERT INTO main_email (sender_id, user_id, subject, body,
+                timestamp)
+            SELECT %(first)s + g %% %(users)s, %(first)s + g %% %(users)s,
+                'subject', 'body', now() - g * interval '1 minute'
+            FROM generate_series(1, %(rows)s) g
+            """,
+            params
+        )
+        cursor.execute(
+            """
+            INSERT INTO main_email_recipients (email_id, customuser_id)
+            SELECT id, %(first)s + id * 7 %% %(users)s FROM main_email
+            """,
+            params
+        )
+        # fresh statistics, or the joins below are planned as nested loops
+        cursor.execute('ANALYZE main_email, main_email_recipients')
+        cursor.execute(
+            """
+            INSERT INTO main_email_deleted_by (email_id, customuser_id)
+            SELECT email_id, customuser_id FROM main_email_recipients
+            WHERE email_id % 20 = 0
+            """
+        )
+        cursor.execute(
+            """
+            INSERT INTO main_mailboxentry (user_id, email_id, folder,
+                is_read, is_deleted, timestamp)
+            SELECT r.customuser_id, r.email_id, 'inbox', false,
+                r.email_id % 20 = 0, e.timestamp
+            FROM main_email_recipients r
+            JOIN main_email e ON e.id = r.email_id
+            """
+        )
+        cursor.execute('ANALYZE')
+    return users[0]
+
+
+def explain(user: CustomUser) -> None:
+    for name, queryset in get_listing_queries(user).items():
+        lines = queryset.explain(analyze=True).splitlines()
+        print(f'--- {name}')
+        print(f'    {lines[0].strip()}')
+        for line in lines[1:]:
+            if '->' in line or 'Execution Time' in line:
+                print(f'    {line.strip()}')
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    try:
+        with transaction.atomic():
+            user = seed(rows)
+            print(f'=== with indexes, {rows} Posts and Emails')
+            explain(user)
+            with connection.cursor() as cursor:
+                for index in NEW_INDEXES:
+                    cursor.execute(f'DROP INDEX {index}')
+            print('=== without indexes')
+            explain(user)
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == '__main__':
+    main()